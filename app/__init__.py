@@ -8,5 +8,15 @@ app = Flask(__name__)
 # Elle est récupérée depuis les variables d’environnement
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
+# Base locale (DATA_BACKEND=local) : l’application refuse de démarrer sans identifiants de connexion locale
+from app.client import DATA_BACKEND
+if DATA_BACKEND == "local":
+    from app.localdb import check_local_auth
+    check_local_auth()
+
+# Mesure de la durée des requêtes (histogrammes exposés sur /metrics et en-tête Server-Timing)
+from app.metrics import init_metrics
+init_metrics(app)
+
 # Importation des routes de l’application (après la création de l'app pour éviter les import circulaires)
 from app import routes
@@ -0,0 +1,40 @@
+from collections import defaultdict
+from app.filters import rpc_params
+
+
+# Regroupe les lignes (serie, cle, valeur) retournées par une fonction RPC en dictionnaires par série
+def group_series(rows):
+    series = defaultdict(dict)
+    for row in rows:
+        series[row["serie"]][row["cle"]] = row["valeur"] or 0
+    return series
+
+
+# Filtres applicables aux agrégats journaliers (jour, fournisseur, article, et mode de comparaison)
+ROLLUP_FILTERS = ("date_from", "date_to", "fournisseur", "article", "exact")
+
+
+# Séries du tableau de bord calculées par Postgres (voir sql/004_agregats_jour.sql)
+# Lues dans les agrégats journaliers (AchatsJour), sauf si un filtre porte sur MontantAchat : ce filtre
+# s'applique ligne par ligne, les séries sont alors calculées sur la table Achats.
+def fetch_achats_aggregates(supabase, filters):
+    if filters["montant_min"] is None and filters["montant_max"] is None:
+        params = rpc_params({key: filters[key] for key in ROLLUP_FILTERS})
+        rows = supabase.rpc("agregats_achats_jour", params).execute().data or []
+    else:
+        rows = supabase.rpc("agregats_achats", rpc_params(filters)).execute().data or []
+    return group_series(rows)
+
+
+# Série écart quantité par fournisseur et totaux calculés par Postgres sur les agrégats journaliers de AchatsBP
+def fetch_achats_bp_aggregates(supabase, filters):
+    rows = supabase.rpc("agregats_achats_bp", rpc_params(filters)).execute().data or []
+    return group_series(rows)
+
+
+# Bornes (min, max) de MontantAchat calculées par Postgres (voir sql/002_bornes_montant.sql)
+def fetch_montant_bounds(supabase):
+    rows = supabase.rpc("bornes_montant_achat", {}).execute().data or []
+    if not rows:
+        return 0, 0
+    return rows[0]["min_montant"] or 0, rows[0]["max_montant"] or 0
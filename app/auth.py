@@ -1,15 +1,89 @@
+import threading
+import time
 from functools import wraps
+from types import SimpleNamespace
 from flask import session, redirect, url_for, g
-from supabase import create_client, Client
 from dotenv import load_dotenv
+from app.client import get_client, DATA_BACKEND
+import jwt
 import os
 
 # Chargement des variables d’environnement depuis le fichier .env
 load_dotenv()
 
-# Récupération de l’URL et de la clé secrète de Supabase depuis les variables d’environnement
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+# Secret de signature des JWT Supabase (Settings > API) : permet de vérifier les tokens sans appel réseau
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+
+# Durée (en secondes) pendant laquelle un token vérifié reste en cache, et nombre maximal de tokens gardés
+TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', 300))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+
+# Cache des tokens vérifiés : token -> (utilisateur, date d’expiration de l’entrée)
+_token_cache = {}
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {"hits": 0, "misses": 0, "local": 0, "remote": 0}
+
+
+# Vérification locale du token (signature et expiration), sans appel à Supabase
+def verify_token_locally(token):
+    claims = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+    user = SimpleNamespace(id=claims.get("sub"), email=claims.get("email"), role=claims.get("role"))
+    return user, claims.get("exp")
+
+
+# Vérification du token par l’API Supabase (utilisée quand le secret JWT n’est pas configuré)
+def verify_token_remotely(token):
+    user = get_client().auth.get_user(token).user
+    # La signature vient d’être validée par Supabase : on lit seulement l’expiration
+    claims = jwt.decode(token, options={"verify_signature": False})
+    return user, claims.get("exp")
+
+
+# Vérifie un token en passant par le cache ; lève une exception si le token est invalide
+def verify_token(token):
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(token)
+        if entry is not None and entry[1] > now:
+            _token_cache_stats["hits"] += 1
+            return entry[0]
+        _token_cache_stats["misses"] += 1
+
+    # (avec la base locale, les tokens sont signés par LOCAL_JWT_SECRET et vérifiés par le client local)
+    if SUPABASE_JWT_SECRET and DATA_BACKEND != "local":
+        user, exp = verify_token_locally(token)
+        source = "local"
+    else:
+        user, exp = verify_token_remotely(token)
+        source = "remote"
+
+    # L’entrée expire au plus tard en même temps que le token lui-même
+    expires_at = now + TOKEN_CACHE_TTL
+    if exp is not None:
+        expires_at = min(expires_at, exp)
+
+    with _token_cache_lock:
+        _token_cache_stats[source] += 1
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            # Suppression des entrées expirées, puis des plus anciennes si le cache est toujours plein
+            for key in [key for key, (_, exp_at) in _token_cache.items() if exp_at <= now]:
+                del _token_cache[key]
+            while len(_token_cache) >= TOKEN_CACHE_SIZE:
+                del _token_cache[next(iter(_token_cache))]
+        _token_cache[token] = (user, expires_at)
+    return user
+
+
+# Retire un token du cache (à la déconnexion)
+def forget_token(token):
+    with _token_cache_lock:
+        _token_cache.pop(token, None)
+
+
+# Compteurs du cache des tokens (succès, échecs, vérifications locales et distantes)
+def token_cache_stats():
+    with _token_cache_lock:
+        return {**_token_cache_stats, "size": len(_token_cache)}
 
 
 # Fonction pour obtenir l’utilisateur actuellement connecté à partir du token stocké dans la session
@@ -17,19 +91,15 @@ def current_user():
     # Récupération du token d'authentification depuis la session
     token = session.get("access_token")
 
-    # Création d’une instance du client Supabase
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
     # Si aucun token n’est présent, aucun utilisateur n’est connecté
     if not token:
         return None
 
     try:
-        # Récupération des informations de l’utilisateur à partir du token
-        user = supabase.auth.get_user(token).user
-        return user
+        # Récupération des informations de l’utilisateur à partir du token (cache, puis vérification locale ou distante)
+        return verify_token(token)
     except Exception:
-        # En cas d’erreur (ex. token invalide), la session est supprimée et aucun utilisateur n’est retourné
+        # En cas d’erreur (ex. token invalide ou expiré), la session est supprimée et aucun utilisateur n’est retourné
         session.clear()
         return None
 
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+import os
+
+# Durée de vie (en secondes) des données de référence en cache
+REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', 3600))
+
+# Nombre de combinaisons de filtres dont les graphiques rendus sont gardés en cache
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', 128))
+
+
+# Cache en mémoire avec durée de vie (TTL), invalidation explicite et compteurs succès/échecs
+class TTLCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}  # clé -> (valeur, date d’expiration)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # Retourne la valeur en cache, ou l’obtient avec loader() si elle est absente ou expirée
+    def get(self, key, loader):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+
+        # Chargement hors du verrou pour ne pas bloquer les autres clés
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+        return value
+
+    # Vide le cache (toutes les clés)
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+# Cache en mémoire de taille bornée : les entrées les moins récemment utilisées sont supprimées (LRU)
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # Retourne la valeur associée à la clé, ou None si elle est absente
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._entries[key]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+# Cache des tables de référence (Produits, Fournisseurs) et des bornes de MontantAchat
+reference_cache = TTLCache(REFERENCE_CACHE_TTL)
+
+# Cache des graphiques et totaux du tableau de bord, par combinaison de filtres et version des données
+chart_cache = LRUCache(CHART_CACHE_SIZE)
+
+# Version des données : incrémentée à chaque chargement de nouvelles données par le pipeline
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+
+def data_version():
+    return _data_version
+
+
+# Invalide les caches après le chargement de nouvelles données (appelée via /cache/invalidate)
+def invalidate_caches():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+    reference_cache.invalidate()
+    chart_cache.invalidate()
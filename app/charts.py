@@ -0,0 +1,88 @@
+from bokeh.plotting import figure
+from bokeh.embed import components
+from bokeh.palettes import Category10
+from bokeh.models import HoverTool, CustomJSTickFormatter, ColumnDataSource
+from datetime import date
+from app.metrics import span
+
+# Format des graduations de l’axe Y : deux décimales, virgule décimale et espace comme séparateur de milliers
+JS_FORMAT_CODE = """
+    var num = tick.toFixed(2).replace('.', ',');
+    return num.replace(/\\B(?=(\\d{3})+(?!\\d))/g, " ");
+"""
+
+
+# Couleurs des barres (la palette Category10 est répétée si nécessaire)
+def get_colors(data_length):
+    if data_length == 0:
+        return []
+    palette = Category10[10]
+    return (palette * ((data_length // 10) + 1))[:data_length]
+
+
+# Graphique en barres d’une série {catégorie: valeur}
+def bar_chart(values, title, x_label, y_label):
+    names = list(values.keys())
+
+    p = figure(
+        x_range=names,
+        title=title,
+        toolbar_location=None, tools="hover",
+        sizing_mode='stretch_both'
+    )
+    p.vbar(
+        x=names,
+        top=list(values.values()),
+        width=0.9, color=get_colors(len(names))
+    )
+    p.title.text_font_size = '16pt'
+    p.xaxis.major_label_orientation = 1
+    p.background_fill_color = "#f9f9f9"
+    p.outline_line_color = None
+    p.yaxis.formatter = CustomJSTickFormatter(code=JS_FORMAT_CODE)
+    p.add_tools(
+        HoverTool(tooltips=[(x_label, "@x"), (y_label, "@top{(0.00 a)}")], formatters={"@top": "numeral"},
+                  mode='vline'))
+    return p
+
+
+# Graphique en courbe d’une série {date ISO: valeur}, dans l’ordre chronologique
+def time_chart(values, title, x_label, y_label):
+    days = sorted(values)
+    source = ColumnDataSource(data={
+        "x": [date.fromisoformat(day) for day in days],
+        "y": [values[day] for day in days],
+    })
+
+    p = figure(
+        x_axis_type="datetime",
+        title=title,
+        toolbar_location=None, tools="hover",
+        sizing_mode='stretch_both'
+    )
+    p.line(x="x", y="y", source=source, line_width=2, color=Category10[10][0])
+    p.scatter(x="x", y="y", source=source, size=5, color=Category10[10][0])
+    p.title.text_font_size = '16pt'
+    p.background_fill_color = "#f9f9f9"
+    p.outline_line_color = None
+    p.yaxis.formatter = CustomJSTickFormatter(code=JS_FORMAT_CODE)
+    p.add_tools(
+        HoverTool(tooltips=[(x_label, "@x{%d/%m/%Y}"), (y_label, "@y{(0.00 a)}")],
+                  formatters={"@x": "datetime", "@y": "numeral"}, mode='vline'))
+    return p
+
+
+# Construction des cinq graphiques du tableau de bord et génération de leur code HTML
+# Retourne un seul script et les cinq div (CA, écarts, quantités, écart Qt AchatsBP, CA par jour)
+def render_charts(series, seriesBP):
+    with span("bokeh_figures"):
+        p1 = bar_chart(series["ca_par_produit"], "Chiffre d'affaires par Produit", "Produit", "CA")
+        p2 = bar_chart(series["ecarts_par_fournisseur"], "Écarts par Fournisseur", "Fournisseur", "Écart")
+        p3 = bar_chart(series["qte_par_produit"], "Produits les Plus Vendus", "Produit", "Qté")
+        p4 = bar_chart(seriesBP["ecartqt_par_fournisseur"], "Écart Quantité par Fournisseur", "Fournisseur", "Écart Qt")
+        p5 = time_chart(series["ca_par_jour"], "Chiffre d'affaires par Jour", "Date", "CA")
+
+    # Un seul appel à components() pour les cinq graphiques
+    with span("bokeh_components"):
+        script, divs = components((p1, p2, p3, p4, p5))
+    return script, divs
@@ -0,0 +1,54 @@
+import threading
+from supabase import create_client, Client, ClientOptions
+from dotenv import load_dotenv
+import os
+
+# Chargement des variables d’environnement depuis le fichier .env
+load_dotenv()
+
+# Récupération de l’URL et de la clé secrète de Supabase depuis les variables d’environnement
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+
+# Source des données : "supabase" (par défaut) ou "local" (base SQLite chargée depuis data/normalizedSchema,
+# sans réseau, pour les tests de charge et le profilage ; voir app/localdb.py)
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'supabase')
+
+# Délai maximal (en secondes) d’une requête PostgREST, compté par le client HTTP pour chaque requête
+# (au-delà, les pages du tableau de bord répondent 504 : voir app/fanout.py)
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 30))
+
+# Client partagé par tout le processus et verrou protégeant sa création
+_client = None
+_client_lock = threading.Lock()
+
+
+# Retourne le client Supabase partagé (créé une seule fois par processus)
+# Le client PostgREST interne garde ses connexions HTTP ouvertes (keep-alive) et les réutilise d’une requête à l’autre.
+# Il ne doit pas servir à connecter un utilisateur (sign_in modifie l’en-tête Authorization du client) : voir login().
+def get_client() -> Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and DATA_BACKEND == "local":
+                from app.localdb import LocalClient
+                _client = LocalClient()
+            elif _client is None:
+                options = ClientOptions(
+                    postgrest_client_timeout=SUPABASE_TIMEOUT,
+                    auto_refresh_token=False,
+                    persist_session=False,
+                )
+                client = create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+                # Création immédiate du client PostgREST, partagé ensuite par les threads de requêtes
+                client.postgrest
+                _client = client
+    return _client
+
+
+# Client dédié à la connexion d’un utilisateur (sign_in modifie l’état du client : un nouveau client Supabase
+# est créé à chaque connexion ; la base locale, sans état, est partagée)
+def create_login_client() -> Client:
+    if DATA_BACKEND == "local":
+        return get_client()
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -0,0 +1,296 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from app.listing import iter_pages
+
+# Colonnes exportées (table Achats, dans l’ordre de la liste détaillée)
+EXPORT_COLUMNS = ['NumBonPese', 'DesignationArticle', 'DateBR', 'CodeFournisseur', 'NomBateau',
+                  'QteRecue', 'QteFacturee', 'Qualite', 'Moule', 'PU', 'MontantAchat']
+
+# Types des colonnes dans les fichiers Parquet
+PARQUET_SCHEMA = pa.schema([
+    ('NumBonPese', pa.string()),
+    ('DesignationArticle', pa.string()),
+    ('DateBR', pa.date32()),
+    ('CodeFournisseur', pa.string()),
+    ('NomBateau', pa.string()),
+    ('QteRecue', pa.float64()),
+    ('QteFacturee', pa.float64()),
+    ('Qualite', pa.string()),
+    ('Moule', pa.string()),
+    ('PU', pa.float64()),
+    ('MontantAchat', pa.float64()),
+])
+
+# Type MIME de chaque format d’export
+EXPORT_FORMATS = {
+    'csv': 'text/csv',  # (Flask ajoute charset=utf-8 aux types text/*)
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Formats envoyés directement en streaming (un fichier XLSX est une archive zip, complète seulement à la fin :
+# il n’est produit que par une tâche de fond)
+STREAM_FORMATS = ('csv', 'parquet')
+
+# Nombre maximal de lignes d’une feuille XLSX (en-tête compris)
+XLSX_MAX_ROWS = 1_048_576
+
+# Nombre de lignes lues dans la base à chaque lot
+EXPORT_CHUNK = int(os.getenv('EXPORT_CHUNK', 1000))
+
+# Nombre d’exports exécutés en même temps en tâche de fond (pool séparé de celui des requêtes du tableau de bord)
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+
+# Durée de conservation (en secondes) des tâches d’export et de leurs fichiers
+EXPORT_TTL = float(os.getenv('EXPORT_TTL', 3600))
+
+# Délai (en secondes) sans avancement après lequel une tâche en cours est considérée comme interrompue
+# (processus arrêté ou redémarré pendant l’export)
+EXPORT_STALE = float(os.getenv('EXPORT_STALE', 600))
+
+# Dossier des fichiers produits par les tâches d’export et de l’état des tâches (un fichier JSON par tâche)
+# L’état est lu dans ce dossier par tous les processus de l’application : avec plusieurs workers, ils doivent
+# partager ce dossier (même machine ou volume partagé).
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), "analyse-achats-exports"))
+
+# Identifiants de tâche (secrets.token_urlsafe) : seuls ces noms sont cherchés dans EXPORT_DIR
+JOB_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+logger = logging.getLogger(__name__)
+
+# Pool des exports en tâche de fond du processus
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+
+
+# Nom du fichier proposé au téléchargement
+def export_filename(fmt):
+    return f"achats-{time.strftime('%Y%m%d-%H%M%S')}.{fmt}"
+
+
+# Contenu CSV (UTF-8 avec BOM, pour Excel), un morceau par lot
+def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    yield '\ufeff'.encode() + buffer.getvalue().encode()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+# Fichier en écriture qui garde les octets écrits jusqu’à ce qu’ils soient envoyés (voir parquet_chunks)
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    # Octets écrits depuis le dernier appel
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# Lot de lignes -> table Arrow typée
+def rows_to_table(rows):
+    columns = {col: pa.array([row.get(col) for row in rows], type=pa.string() if col == 'DateBR' else field.type)
+               for col, field in zip(PARQUET_SCHEMA.names, PARQUET_SCHEMA)}
+    columns['DateBR'] = columns['DateBR'].cast(pa.date32())
+    return pa.table(columns, schema=PARQUET_SCHEMA)
+
+
+# Contenu Parquet, un groupe de lignes par lot (le pied de fichier est envoyé à la fin)
+def parquet_chunks(batches):
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, PARQUET_SCHEMA)
+    try:
+        for rows in batches:
+            writer.write_table(rows_to_table(rows))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# Contenu d’un export en streaming (formats de STREAM_FORMATS)
+def stream_export(fmt, supabase, filters):
+    batches = iter_pages(supabase, filters, EXPORT_CHUNK)
+    return csv_chunks(batches) if fmt == 'csv' else parquet_chunks(batches)
+
+
+# Écriture d’un fichier XLSX (openpyxl en mode écriture seule : les lignes ne sont pas gardées en mémoire)
+def write_xlsx(batches, path):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Achats")
+    sheet.append(EXPORT_COLUMNS)
+    count = 1
+    for rows in batches:
+        count += len(rows)
+        if count > XLSX_MAX_ROWS:
+            raise ValueError(f"Plus de {XLSX_MAX_ROWS - 1} lignes : trop pour une feuille XLSX (utiliser CSV ou Parquet)")
+        for row in rows:
+            sheet.append([row.get(col) for col in EXPORT_COLUMNS])
+    workbook.save(path)
+
+
+# Chemin d’un fichier de EXPORT_DIR
+def export_path(name):
+    return os.path.join(EXPORT_DIR, name)
+
+
+# Export en tâche de fond : le fichier est écrit dans EXPORT_DIR, puis téléchargé une fois la tâche terminée
+# L’état de la tâche est enregistré dans EXPORT_DIR/<id>.json à chaque étape : n’importe quel processus de
+# l’application peut le lire (voir get_job)
+class ExportJob:
+    def __init__(self, fmt, filters, owner, job_id=None):
+        self.id = job_id or secrets.token_urlsafe(16)
+        self.format = fmt
+        self.filters = filters
+        self.owner = owner
+        self.status = "en_attente"  # en_attente, en_cours, termine ou erreur
+        self.rows = 0
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+        self.finished = None
+        self.path = export_path(f"{self.id}.{fmt}")
+
+    def to_dict(self):
+        return {"id": self.id, "format": self.format, "status": self.status, "rows": self.rows,
+                "error": self.error, "created": self.created, "finished": self.finished}
+
+    # Enregistrement de l’état (écrit dans un fichier temporaire puis renommé : jamais lu à moitié écrit)
+    def save(self):
+        self.updated = time.time()
+        state = {**self.to_dict(), "owner": self.owner, "updated": self.updated}
+        partial = export_path(f"{self.id}.json.part")
+        with open(partial, "w") as f:
+            json.dump(state, f)
+        os.replace(partial, export_path(f"{self.id}.json"))
+
+    # Tâche relue depuis son fichier d’état, ou None si elle n’existe pas
+    @classmethod
+    def load(cls, job_id):
+        try:
+            with open(export_path(f"{job_id}.json")) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls(state["format"], None, state["owner"], job_id=job_id)
+        for key in ("status", "rows", "error", "created", "updated", "finished"):
+            setattr(job, key, state[key])
+        # Tâche en cours sans avancement depuis EXPORT_STALE secondes, ou jamais lancée après EXPORT_TTL secondes :
+        # le processus qui l’exécutait s’est arrêté
+        now = time.time()
+        if (job.status == "en_cours" and job.updated < now - EXPORT_STALE) or \
+                (job.status == "en_attente" and job.created < now - EXPORT_TTL):
+            job.status = "erreur"
+            job.error = "Export interrompu (redémarrage de l’application)"
+            job.finished = job.updated
+        return job
+
+    # Lots lus dans la base, en comptant les lignes exportées (avancement enregistré après chaque lot)
+    def _counted(self, batches):
+        for rows in batches:
+            self.rows += len(rows)
+            self.save()
+            yield rows
+
+    def run(self, supabase):
+        self.status = "en_cours"
+        self.save()
+        partial = self.path + ".part"
+        try:
+            batches = self._counted(iter_pages(supabase, self.filters, EXPORT_CHUNK))
+            if self.format == 'xlsx':
+                write_xlsx(batches, partial)
+            else:
+                chunks = csv_chunks(batches) if self.format == 'csv' else parquet_chunks(batches)
+                with open(partial, 'wb') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+            os.replace(partial, self.path)
+            self.status = "termine"
+        except Exception as e:
+            logger.exception("Échec de l’export %s", self.id)
+            self.error = str(e)
+            self.status = "erreur"
+            if os.path.exists(partial):
+                os.remove(partial)
+        finally:
+            self.finished = time.time()
+            self.save()
+
+
+# Suppression des fichiers de EXPORT_DIR plus anciens que EXPORT_TTL secondes : tâches terminées (état et
+# fichier produit), tâches interrompues et fichiers partiels ou sans tâche
+def purge_jobs():
+    limit = time.time() - EXPORT_TTL
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except FileNotFoundError:
+        return
+    expired = set()
+    for name in names:
+        job_id, _, extension = name.partition(".")
+        if extension == "json":
+            job = ExportJob.load(job_id)
+            if job is None:
+                expired.add(name)
+            elif job.finished is not None and job.finished < limit:
+                expired.update({name, f"{job_id}.{job.format}"})
+        elif extension.endswith(".part") or f"{job_id}.json" not in names:
+            try:
+                if os.path.getmtime(export_path(name)) < limit:
+                    expired.add(name)
+            except FileNotFoundError:
+                pass
+    for name in expired:
+        try:
+            os.remove(export_path(name))
+        except FileNotFoundError:
+            pass
+
+
+# Lance un export en tâche de fond et retourne la tâche
+def start_export(supabase, fmt, filters, owner):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    purge_jobs()
+    job = ExportJob(fmt, filters, owner)
+    job.save()
+    _executor.submit(job.run, supabase)
+    return job
+
+
+# Tâche d’export de l’utilisateur `owner` (lue dans EXPORT_DIR), ou None si elle n’existe pas (ou appartient à un
+# autre utilisateur) ; les tâches expirées sont supprimées au passage
+def get_job(job_id, owner):
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    purge_jobs()
+    job = ExportJob.load(job_id)
+    return job if job is not None and job.owner == owner else None
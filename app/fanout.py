@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from flask import has_app_context, current_app
+from postgrest.exceptions import APIError
+from app.client import SUPABASE_TIMEOUT
+from app.metrics import record_span
+import os
+
+# Nombre de requêtes Supabase exécutées en parallèle
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', 8))
+
+# Code d'erreur Postgres d'une requête annulée par statement_timeout
+STATEMENT_TIMEOUT_CODE = "57014"
+
+# Pool de threads partagé par toutes les requêtes HTTP du processus
+_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="supabase")
+
+
+# Requête Supabase interrompue par le délai du client HTTP (SUPABASE_TIMEOUT) ou par le statement_timeout de
+# Postgres : la page répond 504 (voir app/routes.py)
+class QueryTimeout(Exception):
+    pass
+
+
+# Exécute une requête en mesurant sa durée (le délai est compté à partir de son exécution, pas de sa mise en
+# file d'attente dans le pool)
+def _timed(name, fn):
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except httpx.TimeoutException as e:
+        raise QueryTimeout(f"La requête '{name}' a dépassé {SUPABASE_TIMEOUT} s") from e
+    except APIError as e:
+        if e.code != STATEMENT_TIMEOUT_CODE:
+            raise
+        raise QueryTimeout(f"La requête '{name}' a été annulée par Postgres (statement_timeout)") from e
+    return result, time.perf_counter() - start
+
+
+# Exécute en parallèle des requêtes indépendantes {nom: fonction sans argument}
+# Retourne {nom: résultat}. Chaque requête est bornée par le délai HTTP du client Supabase (SUPABASE_TIMEOUT,
+# voir app/client.py) : au-delà, QueryTimeout est levée. La durée de chaque requête est enregistrée comme étape
+# "supabase_<nom>" de la requête HTTP courante (voir app/metrics.py).
+def run_parallel(queries):
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed, name, fn) for name, fn in queries.items()}
+    results = {}
+    timings = {}
+    try:
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+    finally:
+        # Après un échec, les requêtes pas encore lancées sont abandonnées (celles en cours se terminent
+        # d'elles-mêmes, au plus tard au bout du délai HTTP)
+        for future in futures.values():
+            future.cancel()
+
+    if has_app_context():
+        for name, duration in timings.items():
+            record_span(f"supabase_{name}", duration)
+        current_app.logger.debug("Durées des requêtes : %s (total %.3f s)",
+                                 timings, time.perf_counter() - start)
+    return results
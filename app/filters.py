@@ -0,0 +1,91 @@
+import math
+from flask import request, abort
+
+# Filtres du tableau de bord, dans l’ordre de la clé de cache
+FILTER_KEYS = ("date_from", "date_to", "fournisseur", "article", "montant_min", "montant_max", "exact")
+
+
+# Montant lu dans la requête (None si absent) ; une valeur qui n’est pas un nombre est refusée (400)
+def get_montant(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        montant = float(value)
+        if not math.isfinite(montant):
+            raise ValueError(value)
+    except ValueError:
+        abort(400, description=f"Montant invalide : {name}")
+    return montant
+
+
+# Lecture des filtres du tableau de bord depuis la requête (formulaire ou URL)
+def get_filters():
+    return {
+        "date_from": request.args.get('date_from', '').strip() or None,
+        "date_to": request.args.get('date_to', '').strip() or None,
+        "fournisseur": request.args.get('fournisseur', '').strip() or None,
+        "article": request.args.get('article', '').strip() or None,
+        "montant_min": get_montant('montant_min'),
+        "montant_max": get_montant('montant_max'),
+        # Fournisseur et article choisis dans les listes déroulantes du formulaire (exact=1) : comparaison par
+        # égalité, qui utilise les index btree ; sinon (valeur saisie dans l’URL), recherche partielle
+        "exact": request.args.get('exact') == '1',
+    }
+
+
+# Retire les bornes de montant au plus égales au minimum ou au moins égales au maximum de MontantAchat
+# Les curseurs de montant envoient toujours une valeur : une borne qui ne restreint aucune ligne n’est pas un
+# filtre (les séries restent alors lues dans les agrégats journaliers, voir fetch_achats_aggregates)
+def drop_open_montant_bounds(filters, bounds):
+    low, high = bounds
+    if filters["montant_min"] is not None and filters["montant_min"] <= low:
+        filters["montant_min"] = None
+    if filters["montant_max"] is not None and filters["montant_max"] >= high:
+        filters["montant_max"] = None
+    return filters
+
+
+# Clé de cache des filtres : tuple dans un ordre fixe (les valeurs vides sont toutes None)
+def filters_key(filters):
+    return tuple(filters[key] for key in FILTER_KEYS)
+
+
+# Filtre sur une colonne texte : égalité pour une valeur exacte, sinon recherche partielle insensible à la casse
+def match_text(query, column, value, exact):
+    if exact:
+        return query.eq(column, value)
+    return query.filter(column, 'ilike', f'%{value}%')
+
+
+# Application des filtres à une requête sur la table Achats
+def filter_achats(query, filters):
+    if filters["date_from"]:
+        query = query.filter('DateBR', 'gte', filters["date_from"])
+    if filters["date_to"]:
+        query = query.filter('DateBR', 'lte', filters["date_to"])
+    if filters["fournisseur"]:
+        query = match_text(query, 'CodeFournisseur', filters["fournisseur"], filters["exact"])
+    if filters["article"]:
+        query = match_text(query, 'DesignationArticle', filters["article"], filters["exact"])
+    if filters["montant_min"] is not None:
+        query = query.gte('MontantAchat', filters["montant_min"])
+    if filters["montant_max"] is not None:
+        query = query.lte('MontantAchat', filters["montant_max"])
+    return query
+
+
+# Application des filtres à une requête sur la table AchatsBP (seuls la date et le fournisseur s'appliquent)
+def filter_achats_bp(query, filters):
+    if filters["date_from"]:
+        query = query.filter('DateBR', 'gte', filters["date_from"])
+    if filters["date_to"]:
+        query = query.filter('DateBR', 'lte', filters["date_to"])
+    if filters["fournisseur"]:
+        query = match_text(query, 'CodeFournisseur', filters["fournisseur"], filters["exact"])
+    return query
+
+
+# Paramètres des fonctions RPC d'agrégation (mêmes noms que les filtres, préfixés par p_)
+def rpc_params(filters):
+    return {f"p_{key}": value for key, value in filters.items()}
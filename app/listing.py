@@ -0,0 +1,111 @@
+from datetime import date
+from app.filters import filter_achats
+from app.metrics import record_rows
+import os
+import re
+
+# Nombre de lignes par page (par défaut et maximum autorisé) et taille des lots lus dans la base
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 200))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 5000))
+FETCH_CHUNK = int(os.getenv('FETCH_CHUNK', 500))
+
+# Numéros de bon de pesée acceptés dans un curseur
+CURSOR_BON_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+# Taille de page demandée, bornée entre 1 et MAX_PAGE_SIZE
+def get_page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+# Curseur "DateBR|NumBonPese" -> (DateBR, NumBonPese), ou None si absent
+# Le curseur vient de la requête : ValueError si la date n'est pas une date ISO ou si le numéro de bon
+# contient autre chose que des lettres, chiffres, tirets et soulignés
+def parse_cursor(value):
+    if not value:
+        return None
+    day, separator, bon = value.partition("|")
+    if not separator or not CURSOR_BON_PATTERN.fullmatch(bon):
+        raise ValueError(f"Curseur invalide : {value!r}")
+    return date.fromisoformat(day).isoformat(), bon
+
+
+# Valeur entre guillemets dans un filtre logique PostgREST (virgules, points et parenthèses n'y sont plus
+# interprétés)
+def quote_value(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+# Clé de pagination d'une ligne
+def row_key(row):
+    return row["DateBR"], row["NumBonPese"]
+
+
+# Page d'achats parcourue par curseur (keyset) sur (DateBR, NumBonPese)
+# Les lignes sont lues par lots au fur et à mesure de l'itération : une réponse en streaming envoie
+# les premières lignes avant que la page complète soit chargée. Un bon de pesée n'est jamais coupé
+# entre deux pages ; next_cursor est connu une fois l'itération terminée (None s'il n'y a plus de lignes).
+class AchatsPage:
+    def __init__(self, supabase, filters, after=None, size=PAGE_SIZE, chunk=FETCH_CHUNK):
+        self.supabase = supabase
+        self.filters = filters
+        self.after = after
+        self.size = size
+        self.chunk = chunk
+        self.next_cursor = None
+        self.count = 0
+
+    # Requête filtrée et triée sur la clé de pagination
+    def _query(self):
+        query = filter_achats(self.supabase.table('Achats').select('*'), self.filters)
+        return query.order('DateBR').order('NumBonPese').order('DesignationArticle')
+
+    # Toutes les lignes d'un même bon de pesée à une date donnée
+    def _group(self, key):
+        rows = self._query().eq('DateBR', key[0]).eq('NumBonPese', key[1]).execute().data or []
+        record_rows("Achats", len(rows))
+        return rows
+
+    def __iter__(self):
+        cursor = self.after
+        while self.count < self.size:
+            query = self._query()
+            if cursor:
+                day, bon = map(quote_value, cursor)
+                query = query.or_(f"DateBR.gt.{day},and(DateBR.eq.{day},NumBonPese.gt.{bon})")
+            limit = min(self.chunk, self.size - self.count)
+            rows = query.limit(limit).execute().data or []
+            record_rows("Achats", len(rows))
+
+            if len(rows) < limit:
+                # Plus de lignes après ce lot : dernière page
+                self.count += len(rows)
+                yield from rows
+                self.next_cursor = None
+                return
+
+            # Le dernier bon du lot peut être incomplet : il est relu en entier
+            cursor = row_key(rows[-1])
+            rows = [row for row in rows if row_key(row) != cursor] + self._group(cursor)
+            self.count += len(rows)
+            yield from rows
+
+        self.next_cursor = "|".join(cursor)
+
+
+# Achats filtrés lus par lots de `size` lignes environ, dans l'ordre de la pagination (DateBR, NumBonPese) :
+# seul le lot courant est en mémoire (exports et rapport planifié)
+def iter_pages(supabase, filters, size=FETCH_CHUNK):
+    after = None
+    while True:
+        page = AchatsPage(supabase, filters, after=after, size=size, chunk=size)
+        rows = list(page)
+        if rows:
+            yield rows
+        if page.next_cursor is None:
+            return
+        after = parse_cursor(page.next_cursor)
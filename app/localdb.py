@@ -0,0 +1,373 @@
+import hmac
+import os
+import re
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+import jwt
+import pandas as pd
+
+# Dossier des CSV normalisés chargés dans la base locale, et fichier SQLite (":memory:" : base en mémoire)
+LOCAL_DATA_DIR = os.getenv('LOCAL_DATA_DIR', os.path.join(os.path.dirname(__file__), "..", "data", "normalizedSchema"))
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', ':memory:')
+
+# Identifiants acceptés par la connexion locale et secret de signature de ses tokens (distinct du secret
+# Supabase) : obligatoires, la connexion locale est refusée sans eux (voir check_local_auth)
+LOCAL_EMAIL = os.getenv('LOCAL_EMAIL')
+LOCAL_PASSWORD = os.getenv('LOCAL_PASSWORD')
+LOCAL_JWT_SECRET = os.getenv('LOCAL_JWT_SECRET')
+
+# Tables chargées depuis les CSV (même nom de colonne que dans Supabase : QteFacturee sans accent)
+TABLES = ("Achats", "AchatsBP", "Fournisseurs", "Produits", "AchatsJour", "AchatsBPJour")
+COLUMN_RENAMES = {"QteFacturée": "QteFacturee"}
+
+# Index utilisés par les filtres du tableau de bord et par la pagination par curseur
+INDEXES = (
+    'create index if not exists achats_date_bon on "Achats" ("DateBR", "NumBonPese")',
+    'create index if not exists achats_date_fournisseur on "Achats" ("DateBR", "CodeFournisseur")',
+    'create index if not exists achats_fournisseur_date on "Achats" ("CodeFournisseur", "DateBR")',
+    'create index if not exists achats_bp_date_fournisseur on "AchatsBP" ("DateBR", "CodeFournisseur")',
+    'create unique index if not exists achats_jour_cle on "AchatsJour" ("DateBR", "CodeFournisseur", "DesignationArticle")',
+    'create unique index if not exists achats_bp_jour_cle on "AchatsBPJour" ("DateBR", "CodeFournisseur")',
+)
+
+# Opérateurs PostgREST pris en charge -> opérateur SQL
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "like": "like", "ilike": "like"}
+
+# Fonctions RPC : équivalents SQLite des fonctions Postgres de sql/ et valeurs par défaut de leurs paramètres
+ACHATS_FILTRES = """
+    select * from "Achats"
+    where (:p_date_from is null or "DateBR" >= :p_date_from)
+      and (:p_date_to is null or "DateBR" <= :p_date_to)
+      and (:p_fournisseur is null or (:p_exact and "CodeFournisseur" = :p_fournisseur)
+           or (not :p_exact and "CodeFournisseur" like '%' || :p_fournisseur || '%'))
+      and (:p_article is null or (:p_exact and "DesignationArticle" = :p_article)
+           or (not :p_exact and "DesignationArticle" like '%' || :p_article || '%'))
+      and (:p_montant_min is null or "MontantAchat" >= :p_montant_min)
+      and (:p_montant_max is null or "MontantAchat" <= :p_montant_max)
+"""
+FILTER_DEFAULTS = {"p_date_from": None, "p_date_to": None, "p_fournisseur": None, "p_article": None,
+                   "p_montant_min": None, "p_montant_max": None, "p_exact": False}
+
+RPC_FUNCTIONS = {
+    # sql/004_agregats_jour.sql et sql/005_index_filtres.sql
+    "agregats_achats": (f"""
+        with lignes as ({ACHATS_FILTRES})
+        select 'ca_par_produit' as serie, "DesignationArticle" as cle, sum("MontantAchat") as valeur
+        from lignes group by "DesignationArticle"
+        union all
+        select 'ecarts_par_fournisseur', "CodeFournisseur",
+               sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)))
+        from lignes group by "CodeFournisseur"
+        union all
+        select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+        from lignes group by "DesignationArticle"
+        union all
+        select 'ca_par_jour', "DateBR", sum("MontantAchat")
+        from lignes group by "DateBR"
+        order by 1, 2
+    """, FILTER_DEFAULTS),
+    "agregats_achats_jour": ("""
+        with jours as (
+            select * from "AchatsJour"
+            where (:p_date_from is null or "DateBR" >= :p_date_from)
+              and (:p_date_to is null or "DateBR" <= :p_date_to)
+              and (:p_fournisseur is null or (:p_exact and "CodeFournisseur" = :p_fournisseur)
+                   or (not :p_exact and "CodeFournisseur" like '%' || :p_fournisseur || '%'))
+              and (:p_article is null or (:p_exact and "DesignationArticle" = :p_article)
+                   or (not :p_exact and "DesignationArticle" like '%' || :p_article || '%'))
+        )
+        select 'ca_par_produit' as serie, "DesignationArticle" as cle, sum("MontantAchat") as valeur
+        from jours group by "DesignationArticle"
+        union all
+        select 'ecarts_par_fournisseur', "CodeFournisseur", sum("EcartAbs")
+        from jours group by "CodeFournisseur"
+        union all
+        select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+        from jours group by "DesignationArticle"
+        union all
+        select 'ca_par_jour', "DateBR", sum("MontantAchat")
+        from jours group by "DateBR"
+        order by 1, 2
+    """, {"p_date_from": None, "p_date_to": None, "p_fournisseur": None, "p_article": None, "p_exact": False}),
+    "agregats_achats_bp": ("""
+        with lignes_bp as (
+            select * from "AchatsBPJour"
+            where (:p_date_from is null or "DateBR" >= :p_date_from)
+              and (:p_date_to is null or "DateBR" <= :p_date_to)
+              and (:p_fournisseur is null or (:p_exact and "CodeFournisseur" = :p_fournisseur)
+                   or (not :p_exact and "CodeFournisseur" like '%' || :p_fournisseur || '%'))
+        )
+        select 'ecartqt_par_fournisseur' as serie, coalesce("CodeFournisseur", 'NA') as cle,
+               sum(coalesce("EcartQt", 0)) as valeur
+        from lignes_bp group by coalesce("CodeFournisseur", 'NA')
+        union all select 'totaux', 'totalPaye', coalesce(sum("TotPaye"), 0) from lignes_bp
+        union all select 'totaux', 'totalRecu', coalesce(sum("TotRecu"), 0) from lignes_bp
+        union all select 'totaux', 'totalFacture', coalesce(sum("TotFacture"), 0) from lignes_bp
+        union all select 'totaux', 'TotalEcartQ', coalesce(sum("EcartQt"), 0) from lignes_bp
+        union all select 'totaux', 'TotalEcartM', coalesce(sum("EcartMontant"), 0) from lignes_bp
+        order by 1, 2
+    """, FILTER_DEFAULTS),
+    # sql/002_bornes_montant.sql
+    "bornes_montant_achat": ("""
+        select coalesce(min("MontantAchat"), 0) as min_montant, coalesce(max("MontantAchat"), 0) as max_montant
+        from "Achats"
+    """, {}),
+    # sql/003_agregats_rapport.sql
+    "agregats_rapport": ("""
+        with lignes as (
+            select * from "Achats"
+            where (:p_date_from is null or "DateBR" >= :p_date_from)
+              and (:p_date_to is null or "DateBR" <= :p_date_to)
+              and (:p_fournisseur is null or "CodeFournisseur" = :p_fournisseur)
+        ),
+        top_produits as (
+            select "DesignationArticle" as cle, sum("QteRecue") as valeur
+            from lignes group by "DesignationArticle"
+            order by valeur desc
+            limit :p_top
+        )
+        select 'totaux' as serie, 'nombre' as cle, cast(count(*) as real) as valeur from lignes
+        union all select 'totaux', 'total', coalesce(sum("MontantAchat"), 0) from lignes
+        union all select 'top', cle, valeur from top_produits
+    """, {"p_date_from": None, "p_date_to": None, "p_fournisseur": None, "p_top": 3}),
+}
+
+IDENTIFIER = re.compile(r"^\w+$")
+
+
+# Nom de colonne entre guillemets (seuls les identifiants simples sont acceptés)
+def quote(column):
+    if not IDENTIFIER.match(column):
+        raise ValueError(f"Nom de colonne invalide : {column}")
+    return f'"{column}"'
+
+
+# Condition SQL et paramètres d'un filtre PostgREST (colonne, opérateur, valeur)
+def condition(column, operator, value):
+    if operator == "is":
+        return f"{quote(column)} is {'null' if value in (None, 'null') else int(value in (True, 'true'))}", []
+    if operator not in OPERATORS:
+        raise ValueError(f"Opérateur non pris en charge : {operator}")
+    if operator in ("like", "ilike"):
+        value = value.replace("*", "%")
+    return f"{quote(column)} {OPERATORS[operator]} ?", [value]
+
+
+# Découpe une liste PostgREST "a,b,and(c,d)" aux virgules qui ne sont ni entre parenthèses ni entre guillemets
+def split_top_level(text):
+    parts, depth, current, quoted, escaped = [], 0, "", False, False
+    for char in text:
+        if quoted:
+            quoted = escaped or char != '"'
+            escaped = not escaped and char == "\\"
+        elif char == '"':
+            quoted = True
+        elif char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        else:
+            depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    parts.append(current)
+    return parts
+
+
+# Valeur d'un filtre PostgREST, sans les guillemets éventuels
+def unquote_value(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1])
+    return value
+
+
+# Traduction d'un filtre logique PostgREST ("col.op.valeur", "and(...)", "or(...)") en condition SQL
+def logical_condition(text, joiner="or"):
+    clauses, params = [], []
+    for part in split_top_level(text):
+        match = re.match(r"^(and|or)\((.*)\)$", part)
+        if match:
+            clause, values = logical_condition(match.group(2), match.group(1))
+        else:
+            column, operator, value = part.split(".", 2)
+            clause, values = condition(column, operator, unquote_value(value))
+        clauses.append(f"({clause})")
+        params.extend(values)
+    return f" {joiner} ".join(clauses), params
+
+
+# Requête sur une table locale, avec les méthodes du client PostgREST utilisées par l'application
+class LocalQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = "*"
+        self.count = None
+        self.conditions = []
+        self.params = []
+        self.orders = []
+        self.limit_value = None
+        self.offset = None
+
+    def select(self, columns="*", count=None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def filter(self, column, operator, value):
+        clause, values = condition(column, operator, value)
+        self.conditions.append(clause)
+        self.params.extend(values)
+        return self
+
+    def eq(self, column, value):
+        return self.filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self.filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self.filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self.filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self.filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self.filter(column, "lte", value)
+
+    def ilike(self, column, pattern):
+        return self.filter(column, "ilike", pattern)
+
+    def in_(self, column, values):
+        values = list(values)
+        self.conditions.append(f"{quote(column)} in ({', '.join('?' * len(values))})")
+        self.params.extend(values)
+        return self
+
+    def or_(self, filters):
+        clause, values = logical_condition(filters)
+        self.conditions.append(f"({clause})")
+        self.params.extend(values)
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append(f"{quote(column)} {'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, size):
+        self.limit_value = size
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.limit_value = end - start + 1
+        return self
+
+    def execute(self):
+        if self.columns == "*":
+            columns = "*"
+        else:
+            columns = ", ".join(quote(column.strip()) for column in self.columns.split(","))
+        where = f" where {' and '.join(self.conditions)}" if self.conditions else ""
+        sql = f"select {columns} from {quote(self.table)}{where}"
+        if self.orders:
+            sql += f" order by {', '.join(self.orders)}"
+        if self.limit_value is not None:
+            sql += f" limit {int(self.limit_value)}"
+            if self.offset:
+                sql += f" offset {int(self.offset)}"
+
+        data = self.client.query(sql, self.params)
+        count = None
+        if self.count:
+            count = self.client.query(f"select count(*) as n from {quote(self.table)}{where}", self.params)[0]["n"]
+        return SimpleNamespace(data=data, count=count)
+
+
+# Appel d'une fonction RPC locale (voir RPC_FUNCTIONS)
+class LocalRpc:
+    def __init__(self, client, name, params):
+        if name not in RPC_FUNCTIONS:
+            raise ValueError(f"Fonction RPC inconnue : {name}")
+        self.client = client
+        self.sql, defaults = RPC_FUNCTIONS[name]
+        self.params = {**defaults, **{key: value for key, value in (params or {}).items() if key in defaults}}
+
+    def execute(self):
+        return SimpleNamespace(data=self.client.query(self.sql, self.params), count=None)
+
+
+# Vérifie que la connexion locale est configurée (RuntimeError sinon)
+def check_local_auth():
+    settings = {"LOCAL_EMAIL": LOCAL_EMAIL, "LOCAL_PASSWORD": LOCAL_PASSWORD, "LOCAL_JWT_SECRET": LOCAL_JWT_SECRET}
+    missing = [name for name, value in settings.items() if not value]
+    if missing:
+        raise RuntimeError(f"Base locale : {', '.join(missing)} non défini(s), connexion locale impossible")
+
+
+# Connexion locale : seul l’utilisateur LOCAL_EMAIL / LOCAL_PASSWORD est accepté, tokens JWT signés avec
+# LOCAL_JWT_SECRET et vérifiés par get_user (voir app/auth.py)
+class LocalAuth:
+    def __init__(self):
+        check_local_auth()
+
+    def sign_in_with_password(self, credentials):
+        email = credentials.get("email") or ""
+        password = credentials.get("password") or ""
+        if not (hmac.compare_digest(email.encode(), LOCAL_EMAIL.encode())
+                and hmac.compare_digest(password.encode(), LOCAL_PASSWORD.encode())):
+            raise ValueError("Invalid login credentials")
+        claims = {"sub": email, "email": email, "role": "authenticated", "aud": "authenticated",
+                  "exp": int(time.time()) + 3600}
+        token = jwt.encode(claims, LOCAL_JWT_SECRET, algorithm="HS256")
+        user = SimpleNamespace(id=email, email=email, role="authenticated")
+        return SimpleNamespace(session=SimpleNamespace(access_token=token), user=user)
+
+    def get_user(self, token):
+        claims = jwt.decode(token, LOCAL_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        return SimpleNamespace(user=SimpleNamespace(id=claims.get("sub"), email=claims.get("email"),
+                                                    role=claims.get("role")))
+
+
+# Remplaçant hors ligne du client Supabase : base SQLite chargée depuis les CSV de data/normalizedSchema
+# Une seule connexion partagée par les threads, protégée par un verrou (les requêtes sont donc exécutées une par une).
+# Avec auth=False (benchmarks), la base est utilisable sans la connexion locale.
+class LocalClient:
+    def __init__(self, data_dir=LOCAL_DATA_DIR, db_path=LOCAL_DB_PATH, auth=True):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self.auth = LocalAuth() if auth else None
+        self.load(data_dir)
+
+    # Chargement des CSV (sauf si le fichier SQLite contient déjà les tables)
+    def load(self, data_dir):
+        existing = {row["name"] for row in self.query("select name from sqlite_master where type = 'table'")}
+        with self._lock:
+            for table in TABLES:
+                if table in existing:
+                    continue
+                df = pd.read_csv(os.path.join(data_dir, f"{table}.csv")).rename(columns=COLUMN_RENAMES)
+                df.to_sql(table, self._connection, index=False)
+            for index in INDEXES:
+                self._connection.execute(index)
+            self._connection.commit()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connection.execute(sql, params).fetchall()]
+
+    def table(self, name):
+        if name not in TABLES:
+            raise ValueError(f"Table inconnue : {name}")
+        return LocalQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, name, params=None):
+        return LocalRpc(self, name, params)
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+
+# Limites (en secondes) des classes des histogrammes de durée
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# Histogramme de durées par combinaison d’étiquettes, au format Prometheus
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._counts = defaultdict(lambda: [0] * len(buckets))
+        self._sums = defaultdict(float)
+        self._totals = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts = self._counts[labels]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._sums[labels] += value
+            self._totals[labels] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, counts in sorted(self._counts.items()):
+                base = format_labels(self.label_names, labels)
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {self._totals[labels]}')
+                lines.append(f"{self.name}_sum{{{base}}} {self._sums[labels]}")
+                lines.append(f"{self.name}_count{{{base}}} {self._totals[labels]}")
+        return lines
+
+
+# Compteur par combinaison d’étiquettes, au format Prometheus
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self._lock:
+            self._values[labels] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in zip(names, values))
+
+
+# Mesures de l’application
+request_latency = Histogram("http_request_duration_seconds", "Durée des requêtes HTTP par route",
+                            ("route", "method", "status"))
+phase_latency = Histogram("phase_duration_seconds", "Durée des étapes des requêtes (Supabase, agrégation, rendu)",
+                          ("route", "phase"))
+rows_fetched = Counter("rows_fetched_total", "Lignes utilisées par route, par table ou fonction RPC", ("route", "source"))
+
+
+def current_route():
+    return request.url_rule.rule if request.url_rule else "inconnue"
+
+
+# Enregistre la durée d’une étape de la requête courante (pour l’histogramme et l’en-tête Server-Timing)
+def record_span(name, duration):
+    if not has_app_context():
+        return
+    g.setdefault("spans", []).append((name, duration))
+    phase_latency.observe((current_route(), name), duration)
+
+
+# Mesure la durée d’un bloc de code comme étape de la requête courante
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+# Compte les lignes utilisées depuis une table ou une fonction RPC pendant la requête courante
+def record_rows(source, count):
+    if has_app_context():
+        rows_fetched.inc((current_route(), source), count)
+
+
+# Texte exposé sur /metrics (format Prometheus)
+def expose(extra_lines=()):
+    lines = request_latency.expose() + phase_latency.expose() + rows_fetched.expose() + list(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+# Installation des mesures sur l’application : durée de chaque requête et en-tête Server-Timing
+# Pour les réponses en streaming, la durée mesurée s’arrête à l’envoi des en-têtes (avant les lignes).
+def init_metrics(app):
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        request_latency.observe((current_route(), request.method, response.status_code), total)
+
+        # Durées en millisecondes de chaque étape, puis de la requête entière
+        timings = [f"{name};dur={duration * 1000:.1f}" for name, duration in g.get("spans", [])]
+        timings.append(f"total;dur={total * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
@@ -0,0 +1,17 @@
+from app.cache import reference_cache
+from app.aggregates import fetch_montant_bounds
+
+
+# Table Produits (en cache jusqu’à expiration ou au prochain chargement de données)
+def get_produits(supabase):
+    return reference_cache.get("produits", lambda: supabase.table("Produits").select("*").execute().data or [])
+
+
+# Table Fournisseurs (en cache jusqu’à expiration ou au prochain chargement de données)
+def get_fournisseurs(supabase):
+    return reference_cache.get("fournisseurs", lambda: supabase.table("Fournisseurs").select("*").execute().data or [])
+
+
+# Bornes (min, max) de MontantAchat (en cache jusqu’à expiration ou au prochain chargement de données)
+def get_montant_bounds(supabase):
+    return reference_cache.get("bornes_montant", lambda: fetch_montant_bounds(supabase))
@@ -1,21 +1,27 @@
-from flask import render_template, request, flash, session, redirect, url_for
-from supabase import create_client, Client
+from flask import render_template, request, flash, session, redirect, url_for, jsonify, abort, g, send_file
+from flask import Response, stream_template, stream_with_context
+from supabase import Client
 from app import app
-from bokeh.plotting import figure
-from bokeh.embed import components
-from bokeh.palettes import Category10
-from bokeh.models import HoverTool, NumeralTickFormatter, CustomJSTickFormatter
-from collections import defaultdict
-from app.auth import login_required
-from dotenv import load_dotenv
+from app.auth import login_required, forget_token, token_cache_stats
+from app.client import get_client, create_login_client
+from app.filters import get_filters, filters_key, filter_achats_bp, drop_open_montant_bounds
+from app.aggregates import fetch_achats_aggregates, fetch_achats_bp_aggregates
+from app.fanout import run_parallel, QueryTimeout
+from app.cache import reference_cache, chart_cache, data_version, invalidate_caches
+from app.charts import render_charts
+from app.reference import get_produits, get_fournisseurs, get_montant_bounds
+from app.listing import AchatsPage, get_page_size, parse_cursor
+from app.metrics import span, record_rows, expose
+from app.exports import EXPORT_FORMATS, STREAM_FORMATS, export_filename, stream_export, start_export, get_job
+import hmac
+import json
 import os
 
-# Charger les variables d'environnement depuis .env
-load_dotenv()
-
-# Récupérer les clés Supabase à partir de .env
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+# Requête Supabase trop longue (voir app/fanout.py) : 504 plutôt qu’une erreur 500
+@app.errorhandler(QueryTimeout)
+def query_timeout(error):
+    app.logger.warning("%s (%s)", error, request.path)
+    return "La base de données n’a pas répondu à temps, veuillez réessayer.", 504
 
 
 # Route de connexion
@@ -26,10 +32,11 @@ def redirectLogin():
 
 @app.route("/login", methods=["GET", "POST"])
 def login():
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)  # Création du client Supabase
     if session.get("access_token"):  # Si l'utilisateur est déjà connecté
         return redirect(url_for("dashboard"))
     if request.method == "POST":
+        # Client dédié à la connexion : sign_in modifie l'état du client, le client partagé ne doit pas être utilisé
+        supabase: Client = create_login_client()
         # Récupération des données du formulaire
         email = request.form.get("email")
         password = request.form.get("password")
@@ -47,6 +54,7 @@ def login():
 # Route de déconnexion
 @app.route("/logout")
 def logout():
+    forget_token(session.get("access_token"))  # Suppression du token du cache
     session.clear()  # Suppression de toutes les données de session
     return redirect(url_for("login"))
 
@@ -55,203 +63,222 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)  # Connexion Supabase
-
-    # Récupération des produits et fournisseurs
-    produits = supabase.table("Produits").select("*").execute().data or []
-    fournisseurs = supabase.table("Fournisseurs").select("*").execute().data or []
-
-    # Récupération des filtres de la requête (formulaire ou URL)
-    date_from = request.args.get('date_from')
-    date_to = request.args.get('date_to')
-    fournisseur = request.args.get('fournisseur')
-    article = request.args.get('article')
-    montant_min = request.args.get('montant_min')
-    montant_max = request.args.get('montant_max')
-
-    # Construction des requêtes pour les tables Achats et AchatsBP
-    query = supabase.table('Achats').select('*')
-    queryBP = supabase.table('AchatsBP').select('*')
-
-    # Application des filtres dynamiquement
-    if date_from:
-        query = query.filter('DateBR', 'gte', date_from)
-        queryBP = queryBP.filter('DateBR', 'gte', date_from)
-    if date_to:
-        query = query.filter('DateBR', 'lte', date_to)
-        queryBP = queryBP.filter('DateBR', 'lte', date_to)
-    if fournisseur:
-        query = query.filter('CodeFournisseur', 'ilike', f'%{fournisseur}%')
-        queryBP = queryBP.filter('CodeFournisseur', 'ilike', f'%{fournisseur}%')
-    if article:
-        query = query.filter('DesignationArticle', 'ilike', f'%{article}%')
-    if montant_min:
-        query = query.gte('MontantAchat', float(montant_min))
-    if montant_max:
-        query = query.lte('MontantAchat', float(montant_max))
-
-    # Exécution des requêtes filtrées
-    achats = query.execute().data or []
-    achatsBP = queryBP.execute().data or []
-
-    # Calcul des totaux depuis AchatsBP
-    totalPaye = sum(item["TotPaye"] for item in achatsBP)
-    totalRecu = sum(item["TotRecu"] for item in achatsBP)
-    totalFacture = sum(item["TotFacture"] for item in achatsBP)
-    TotalEcartQ = sum(item["EcartQt"] for item in achatsBP)
-    TotalEcartM = sum(item["EcartMontant"] for item in achatsBP)
+    supabase: Client = get_client()  # Client Supabase partagé
+
+    # Récupération des filtres de la requête (formulaire ou URL), sans les bornes de montant ouvertes
+    filters = get_filters()
+    if filters["montant_min"] is not None or filters["montant_max"] is not None:
+        drop_open_montant_bounds(filters, get_montant_bounds(supabase))
+
+    # Graphiques et totaux déjà calculés pour ces filtres et cette version des données
+    cache_key = (filters_key(filters), data_version())
+    cached = chart_cache.get(cache_key)
+
+    # Requêtes indépendantes exécutées en parallèle : la latence de la page est celle de la plus lente
+    queries = {
+        # Produits et fournisseurs (en cache)
+        "produits": lambda: get_produits(supabase),
+        "fournisseurs": lambda: get_fournisseurs(supabase),
+        # Bornes des montants pour l’intervalle du filtre (en cache)
+        "bornes": lambda: get_montant_bounds(supabase),
+    }
+    if cached is None:
+        # Séries et totaux déjà regroupés par Postgres, depuis les agrégats journaliers
+        # (les lignes brutes sont chargées à part, voir achats_lignes)
+        queries["series"] = lambda: fetch_achats_aggregates(supabase, filters)
+        queries["seriesBP"] = lambda: fetch_achats_bp_aggregates(supabase, filters)
+    results = run_parallel(queries)
+    produits = results["produits"]
+    fournisseurs = results["fournisseurs"]
+    record_rows("Produits", len(produits))
+    record_rows("Fournisseurs", len(fournisseurs))
+
+    if cached is None:
+        record_rows("agregats_achats", sum(len(values) for values in results["series"].values()))
+        record_rows("agregats_achats_bp", sum(len(values) for values in results["seriesBP"].values()))
+        # Génération des graphiques (un seul script pour les quatre) et mise en cache avec les totaux
+        script, divs = render_charts(results["series"], results["seriesBP"])
+        cached = (results["seriesBP"]["totaux"], script, divs)
+        chart_cache.put(cache_key, cached)
+    totaux, script, (div1, div2, div3, div4, div5) = cached
+
+    # Totaux depuis AchatsBP
+    totalPaye = totaux.get("totalPaye", 0)
+    totalRecu = totaux.get("totalRecu", 0)
+    totalFacture = totaux.get("totalFacture", 0)
+    TotalEcartQ = totaux.get("TotalEcartQ", 0)
+    TotalEcartM = totaux.get("TotalEcartM", 0)
 
     # Détermination de l’intervalle des montants
-    all_achats = supabase.table('Achats').select('MontantAchat').execute().data or []
-    minRange = min((achat["MontantAchat"] for achat in all_achats), default=0)
-    maxRange = max((achat["MontantAchat"] for achat in all_achats), default=0)
+    minRange, maxRange = results["bornes"]
     maxRange += 100
 
-    js_format_code = """
-        var num = tick.toFixed(2).replace('.', ',');
-        return num.replace(/\\B(?=(\\d{3})+(?!\\d))/g, " ");
-    """
-
-    def get_colors(data_length):
-        if data_length == 0:
-            return []
-        palette = Category10[10]
-        return (palette * ((data_length // 10) + 1))[:data_length]
-
-    # ---- GRAPHIQUE 1 : CA par produit ----
-    ca_by_product = defaultdict(float)
-    for achat in achats:
-        ca_by_product[achat['DesignationArticle']] += achat['MontantAchat']
-
-    product_names = list(ca_by_product.keys())
-
-    p1 = figure(
-        x_range=product_names,
-        title="Chiffre d'affaires par Produit",
-        toolbar_location=None, tools="hover",
-        sizing_mode='stretch_both'
-    )
-    p1.vbar(
-        x=product_names,
-        top=list(ca_by_product.values()),
-        width=0.9, color=get_colors(len(product_names))
-    )
-    p1.title.text_font_size = '16pt'
-    p1.xaxis.major_label_orientation = 1
-    p1.background_fill_color = "#f9f9f9"
-    p1.outline_line_color = None
-    p1.yaxis.formatter = CustomJSTickFormatter(code=js_format_code)
-    p1.add_tools(
-        HoverTool(tooltips=[("Produit", "@x"), ("CA", "@top{(0.00 a)}")], formatters={"@top": "numeral"}, mode='vline'))
-
-    # ---- GRAPHIQUE 2 : Écarts par fournisseur ----
-    ecarts_by_provider = defaultdict(float)
-    for achat in achats:
-        ecart = abs(achat.get("QteRecue", 0) - achat.get("QteFacturee", 0))
-        ecarts_by_provider[achat['CodeFournisseur']] += ecart
-
-    provider_names_g2 = list(ecarts_by_provider.keys())
-
-    p2 = figure(
-        x_range=provider_names_g2,
-        title="Écarts par Fournisseur",
-        toolbar_location=None, tools="hover",
-        sizing_mode='stretch_both'
-    )
-    p2.vbar(
-        x=provider_names_g2,
-        top=list(ecarts_by_provider.values()),
-        width=0.9, color=get_colors(len(provider_names_g2))
-    )
-    p2.title.text_font_size = '16pt'
-    p2.xaxis.major_label_orientation = 1
-    p2.background_fill_color = "#f9f9f9"
-    p2.outline_line_color = None
-    p2.yaxis.formatter = CustomJSTickFormatter(code=js_format_code)
-    p2.add_tools(
-        HoverTool(tooltips=[("Fournisseur", "@x"), ("Écart", "@top{(0.00 a)}")], formatters={"@top": "numeral"},
-                  mode='vline'))
-
-    # ---- GRAPHIQUE 3 : Qté vendue par produit ----
-    qte_by_product = defaultdict(float)
-    for achat in achats:
-        qte_by_product[achat['DesignationArticle']] += achat['QteRecue']
-
-    product_names_g3 = list(qte_by_product.keys())
-
-    p3 = figure(
-        x_range=product_names_g3,
-        title="Produits les Plus Vendus",
-        toolbar_location=None, tools="hover",
-        sizing_mode='stretch_both'
-    )
-    p3.vbar(
-        x=product_names_g3,
-        top=list(qte_by_product.values()),
-        width=0.9, color=get_colors(len(product_names_g3))
-    )
-    p3.title.text_font_size = '16pt'
-    p3.xaxis.major_label_orientation = 1
-    p3.background_fill_color = "#f9f9f9"
-    p3.outline_line_color = None
-    p3.yaxis.formatter = CustomJSTickFormatter(code=js_format_code)
-    p3.add_tools(HoverTool(tooltips=[("Produit", "@x"), ("Qté", "@top{(0.00 a)}")], formatters={"@top": "numeral"},
-                           mode='vline'))
-
-    # ---- GRAPHIQUE 4 : Écart Quantité dans AchatsBP par fournisseur ----
-    ecartqt_bp_by_provider = defaultdict(float)
-    for row in achatsBP:
-        code_f = row.get("CodeFournisseur", "NA")
-        ecart_q = row.get("EcartQt", 0) or 0
-        ecartqt_bp_by_provider[code_f] += ecart_q
-
-    providers_bp = list(ecartqt_bp_by_provider.keys())
-    ecart_vals_bp = list(ecartqt_bp_by_provider.values())
-
-    p4 = figure(
-        x_range=providers_bp,
-        title="Écart Quantité par Fournisseur",
-        toolbar_location=None,
-        tools="hover",
-        sizing_mode='stretch_both'
-    )
-
-    p4.vbar(
-        x=providers_bp,
-        top=ecart_vals_bp,
-        width=0.9,
-        color=get_colors(len(providers_bp))
-    )
-    p4.title.text_font_size = '16pt'
-    p4.xaxis.major_label_orientation = 1
-    p4.background_fill_color = "#f9f9f9"
-    p4.outline_line_color = None
-    p4.yaxis.formatter = CustomJSTickFormatter(code=js_format_code)
-    p4.add_tools(
-        HoverTool(tooltips=[("Fournisseur", "@x"), ("Écart Qt", "@top{(0.00 a)}")], formatters={"@top": "numeral"},
-                  mode='vline'))
-
-    # Génération des scripts HTML pour les graphiques
-    script1, div1 = components(p1)
-    script2, div2 = components(p2)
-    script3, div3 = components(p3)
-    script4, div4 = components(p4)
-
     # Rendu de la page dashboard avec les variables nécessaires
-    return render_template("dashboard.html",
-                           achats=achats,
-                           achatsBP=achatsBP,
-                           produits=produits,
-                           fournisseurs=fournisseurs,
-                           minRange=minRange,
-                           maxRange=maxRange,
-                           totalPaye=totalPaye,
-                           totalFacture=totalFacture,
-                           totalRecu=totalRecu,
-                           TotalEcartM=TotalEcartM,
-                           TotalEcartQ=TotalEcartQ,
-                           script1=script1, div1=div1,
-                           script2=script2, div2=div2,
-                           script3=script3, div3=div3,
-                           script4=script4, div4=div4
-                           )
+    with span("render_template"):
+        html = render_template("dashboard.html",
+                               produits=produits,
+                               fournisseurs=fournisseurs,
+                               minRange=minRange,
+                               maxRange=maxRange,
+                               totalPaye=totalPaye,
+                               totalFacture=totalFacture,
+                               totalRecu=totalRecu,
+                               TotalEcartM=TotalEcartM,
+                               TotalEcartQ=TotalEcartQ,
+                               script=script,
+                               div1=div1, div2=div2, div3=div3, div4=div4, div5=div5,
+                               export_formats=list(EXPORT_FORMATS)
+                               )
+    return html
+
+
+# Page des achats filtrés pour la requête courante (paramètres after=DateBR|NumBonPese et limit)
+# Un curseur mal formé est refusé (400)
+def get_achats_page():
+    try:
+        after = parse_cursor(request.args.get('after'))
+    except ValueError:
+        abort(400, description="Curseur de pagination invalide")
+    return AchatsPage(get_client(), get_filters(), after=after, size=get_page_size(request.args.get('limit')))
+
+
+# Lignes détaillées des achats filtrés, page par page (chargées quand l'onglet "Données Détaillées" est affiché)
+@app.route('/dashboard/achats')
+@login_required
+def achats_lignes():
+    # Paramètres de la requête sans le curseur, pour construire le lien vers la page suivante
+    args = {key: value for key, value in request.args.items() if key != 'after'}
+    return stream_template("lignesAchats.html", page=get_achats_page(), args=args)
+
+
+# Liste paginée des achats filtrés au format JSON, envoyée au fur et à mesure de la lecture
+@app.route('/api/achats')
+@login_required
+def api_achats():
+    page = get_achats_page()
+
+    def generate():
+        yield '{"data": ['
+        for index, achat in enumerate(page):
+            yield (', ' if index else '') + json.dumps(achat)
+        yield '], "next": ' + json.dumps(page.next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+# Lignes de la table AchatsBP filtrées (chargées après l'affichage du tableau de bord)
+@app.route('/dashboard/achatsBP')
+@login_required
+def achats_bp_lignes():
+    supabase: Client = get_client()
+    with span("supabase_achatsBP"):
+        achatsBP = filter_achats_bp(supabase.table('AchatsBP').select('*'), get_filters()).execute().data or []
+    record_rows("AchatsBP", len(achatsBP))
+    with span("render_template"):
+        return render_template("lignesAchatsBP.html", achatsBP=achatsBP)
+
+
+# Export des achats filtrés (mêmes paramètres que le tableau de bord) en CSV ou Parquet
+# Les lignes sont lues dans la base par lots et envoyées au fur et à mesure : la mémoire utilisée ne dépend pas
+# du nombre de lignes. Pour les grands volumes (et le format XLSX), utiliser une tâche de fond (export_job_start).
+@app.route('/export/achats.<fmt>')
+@login_required
+def export_achats(fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    if fmt not in STREAM_FORMATS:
+        return jsonify(error=f"Le format {fmt} n'est disponible qu'en tâche de fond "
+                             f"({url_for('export_job_start', format=fmt)})"), 400
+    chunks = stream_export(fmt, get_client(), get_filters())
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{export_filename(fmt)}"'})
+
+
+# Identifiant de l'utilisateur connecté (propriétaire des tâches d'export)
+def current_user_id():
+    return getattr(g.user, "id", None)
+
+
+# État d'une tâche d'export, avec les liens de suivi et de téléchargement (quand le fichier est prêt)
+def job_status(job):
+    status = job.to_dict()
+    status["status_url"] = url_for('export_job_status', job_id=job.id)
+    status["download_url"] = url_for('export_job_download', job_id=job.id) if job.status == "termine" else None
+    return status
+
+
+# Lancement d'un export en tâche de fond (paramètres du tableau de bord et format=csv|parquet|xlsx)
+# Répond 202 avec l'URL de suivi (en-tête Location) : la requête n'occupe pas un worker pendant l'export.
+# L'état des tâches est enregistré dans EXPORT_DIR : le suivi et le téléchargement peuvent être servis par un
+# autre processus de l'application, s'il partage ce dossier (voir app/exports.py).
+@app.route('/export/achats/jobs', methods=["POST"])
+@login_required
+def export_job_start():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(error=f"Format d'export indisponible : {fmt}", formats=list(EXPORT_FORMATS)), 400
+    job = start_export(get_client(), fmt, get_filters(), current_user_id())
+    return jsonify(job_status(job)), 202, {"Location": url_for('export_job_status', job_id=job.id)}
+
+
+# État d'une tâche d'export (en_attente, en_cours, termine ou erreur) et nombre de lignes déjà exportées
+@app.route('/export/jobs/<job_id>')
+@login_required
+def export_job_status(job_id):
+    job = get_job(job_id, current_user_id())
+    if job is None:
+        abort(404)
+    return jsonify(job_status(job))
+
+
+# Fichier produit par une tâche d'export terminée
+@app.route('/export/jobs/<job_id>/fichier')
+@login_required
+def export_job_download(job_id):
+    job = get_job(job_id, current_user_id())
+    if job is None:
+        abort(404)
+    if job.status != "termine":
+        return jsonify(job_status(job)), 409
+    return send_file(job.path, mimetype=EXPORT_FORMATS[job.format], as_attachment=True,
+                     download_name=export_filename(job.format))
+
+
+# Compteurs des caches de l'application (format JSON)
+@app.route('/cache/stats')
+@login_required
+def cache_stats():
+    return jsonify(tokens=token_cache_stats(), reference=reference_cache.stats(), charts=chart_cache.stats())
+
+
+# Invalidation des caches, appelée par le pipeline de normalisation après le chargement de nouvelles données
+# Protégée par le jeton CACHE_INVALIDATION_TOKEN (en-tête X-Cache-Token)
+# Les caches sont propres à chaque processus : seul le processus qui reçoit la requête est invalidé. Avec
+# plusieurs processus (gunicorn -w N), les autres gardent leurs données de référence jusqu’à expiration
+# (REFERENCE_CACHE_TTL) et leurs graphiques jusqu’à éviction : l’application doit alors tourner dans un seul
+# processus (avec des threads), ou être redémarrée après un chargement.
+@app.route('/cache/invalidate', methods=["POST"])
+def cache_invalidate():
+    expected = os.getenv('CACHE_INVALIDATION_TOKEN')
+    token = request.headers.get('X-Cache-Token', '')
+    if not expected or not hmac.compare_digest(token, expected):
+        abort(403)
+    invalidate_caches()
+    return jsonify(invalidated=True)
+
+
+# Mesures de l'application au format texte Prometheus : durées par route et par étape, lignes lues, caches
+# Si METRICS_TOKEN est défini, il doit être fourni dans l'en-tête Authorization (Bearer)
+@app.route('/metrics')
+def metrics():
+    expected = os.getenv('METRICS_TOKEN')
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if expected and not hmac.compare_digest(token, expected):
+        abort(403)
+
+    lines = ["# HELP cache_stat Compteurs et taille des caches de l'application", "# TYPE cache_stat gauge"]
+    for cache, stats in (("tokens", token_cache_stats()), ("reference", reference_cache.stats()),
+                         ("charts", chart_cache.stats())):
+        for stat, value in stats.items():
+            lines.append(f'cache_stat{{cache="{cache}",stat="{stat}"}} {value}')
+    return Response(expose(lines), mimetype='text/plain; version=0.0.4')
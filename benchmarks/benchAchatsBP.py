@@ -0,0 +1,58 @@
+# Comparaison de la construction du tableau AchatsBP : regroupement vectorisé (buildAchatsBP)
+# contre une boucle ligne par ligne.
+# Utilisation (depuis la racine du dépôt) : python -m benchmarks.benchAchatsBP [facteur de duplication]
+import sys
+import time
+import pandas as pd
+from scripts.cleaningData import cleanData
+from scripts.reconciliationData import buildAchatsBP, BP_COLUMNS
+
+
+def buildAchatsBPLoop(df):
+    # Version de référence : parcours des lignes une par une et cumul dans un dictionnaire
+    tickets = {}
+    for row in df.itertuples(index=False):
+        ecart = row.QteRecue - row.QteFacturée
+        ticket = tickets.get(row.NumBonPese)
+        if ticket is None:
+            ticket = tickets[row.NumBonPese] = {
+                'NumBonPese': row.NumBonPese, 'DateBR': row.DateBR,
+                'CodeFournisseur': row.CodeFournisseur, 'NomBateau': row.NomBateau,
+                'EcartQt': 0.0, 'EcartMontant': 0.0, 'TotRecu': 0.0, 'TotFacture': 0.0, 'TotPaye': 0.0,
+            }
+        ticket['DateBR'] = max(ticket['DateBR'], row.DateBR)
+        ticket['CodeFournisseur'] = max(ticket['CodeFournisseur'], row.CodeFournisseur)
+        ticket['NomBateau'] = max(ticket['NomBateau'], row.NomBateau)
+        ticket['EcartQt'] += ecart
+        ticket['EcartMontant'] += ecart * row.PU
+        ticket['TotRecu'] += row.QteRecue
+        ticket['TotFacture'] += row.QteFacturée
+        ticket['TotPaye'] += row.MontantAchat
+    return pd.DataFrame(sorted(tickets.values(), key=lambda t: t['NumBonPese']), columns=BP_COLUMNS)
+
+
+def timeIt(fn, df, repeat=3):
+    # Meilleure durée sur `repeat` exécutions
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    factor = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    # Données de test : le fichier d'exemple dupliqué `factor` fois, avec des numéros de bon distincts
+    base = cleanData(pd.read_csv('data/BaseDeDonnees.csv'))
+    df = pd.concat([base.assign(NumBonPese=base['NumBonPese'] + f"-{i}") for i in range(factor)], ignore_index=True)
+
+    vectorTime, vectorResult = timeIt(buildAchatsBP, df)
+    loopTime, loopResult = timeIt(buildAchatsBPLoop, df)
+    # Mêmes valeurs (NumBonPese est en type chaîne dans le tableau vectorisé, en objet dans la boucle)
+    pd.testing.assert_frame_equal(vectorResult, loopResult, check_exact=False, check_dtype=False)
+
+    print(f"{len(df)} lignes, {len(vectorResult)} bons de pesée")
+    print(f"Boucle ligne par ligne : {loopTime:.3f} s")
+    print(f"Regroupement vectorisé : {vectorTime:.3f} s (x{loopTime / vectorTime:.1f})")
@@ -0,0 +1,84 @@
+# Comparaison de la lecture et du nettoyage des données brutes : cleanData (schéma déclaratif, catégories
+# construites à la lecture, quarantaine) contre l'ancienne version (lecture en chaînes, dropna puis
+# conversion colonne par colonne et astype(str)).
+# Les données sont synthétiques (voir benchmarks/syntheticData.py), avec une fraction de lignes invalides
+# (quantité non numérique ou bon de pesée vide).
+# Utilisation (depuis la racine du dépôt) :
+#   python -m benchmarks.benchCleanData [tailles...] [--invalides FRACTION] [--sans-memoire]
+# Exemple : python -m benchmarks.benchCleanData 100k 1M
+import argparse
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from benchmarks.syntheticData import iterSynthetic, parseSize
+from benchmarks.benchPipeline import measure
+from scripts.cleaningData import cleanData, RAW_DTYPES
+
+
+# Types de lecture de l'ancienne version
+LEGACY_DTYPES = {col: str for col in ['NumBonPese', 'DateBR', 'CodeFournisseur', 'DesignationFournisseur',
+                                      'DesignationArticle', 'Famille', 'NomBateau', 'Qualite', 'Moule']}
+
+
+def cleanDataLegacy(df):
+    # Version de référence : l'implémentation précédente de cleanData
+    df = df.dropna(subset=df.columns.difference(['Moule', 'Qualite']))
+    df['DateBR'] = pd.to_datetime(df['DateBR'], format='mixed')
+    for col in ['QteRecue', 'QteFacturée', 'PU', 'MontantAchat']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in ['NumBonPese', 'CodeFournisseur', 'DesignationFournisseur', 'DesignationArticle',
+                'Famille', 'NomBateau', 'Qualite', 'Moule']:
+        df[col] = df[col].astype(str)
+    df['Ecart'] = df['QteRecue'] - df['QteFacturée']
+    return df
+
+
+def writeInvalid(path, rows, invalid, seed=0):
+    # Fichier synthétique dont une fraction `invalid` des lignes est invalide
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for index, chunk in enumerate(iterSynthetic(rows, seed)):
+            lines = rng.choice(len(chunk), size=int(len(chunk) * invalid), replace=False)
+            half = len(lines) // 2
+            chunk['QteRecue'] = chunk['QteRecue'].astype(object)
+            chunk.loc[lines[:half], 'QteRecue'] = 'inconnue'
+            chunk.loc[lines[half:], 'NumBonPese'] = ''
+            chunk.to_csv(f, index=False, header=index == 0)
+    return path
+
+
+def benchSize(rows, directory, invalid, memory=True):
+    # Mesures (version, durée, pic mémoire, mémoire du résultat, lignes gardées, lignes avec NaN) des deux versions
+    sourcePath = writeInvalid(os.path.join(directory, 'BaseDeDonnees.csv'), rows, invalid)
+    quarantinePath = os.path.join(directory, 'Rejets.csv')
+    results = []
+    with pd.option_context('mode.chained_assignment', None):
+        for name, fn in [('ancienne version', lambda: cleanDataLegacy(pd.read_csv(sourcePath, dtype=LEGACY_DTYPES))),
+                         ('schéma', lambda: cleanData(pd.read_csv(sourcePath, dtype=RAW_DTYPES), quarantinePath))]:
+            result, elapsed, peak = measure(fn, memory)
+            nan = int(result[['QteRecue', 'QteFacturée', 'PU', 'MontantAchat']].isna().any(axis=1).sum())
+            results.append((name, elapsed, peak, result.memory_usage(deep=True).sum(), len(result), nan))
+    return results
+
+
+def printResults(rows, results):
+    print(f"\n{rows:,} lignes".replace(',', ' '))
+    for name, elapsed, peak, size, kept, nan in results:
+        memory = f"{peak / 2**20:9.1f} Mo" if peak is not None else "         -"
+        print(f"  {name:17s} {elapsed:8.3f} s  pic {memory}  résultat {size / 2**20:8.1f} Mo"
+              f"  {kept:>10,} lignes gardées  {nan:>7,} avec NaN".replace(',', ' '))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Comparaison des deux versions de cleanData")
+    parser.add_argument('sizes', nargs='*', default=['100k', '1M'], help="10k, 100k, 1M, 10M ou un nombre de lignes")
+    parser.add_argument('--invalides', type=float, default=0.001, help="fraction de lignes invalides")
+    parser.add_argument('--sans-memoire', action='store_true', help="durées seules (une seule exécution par version)")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rows = parseSize(size)
+        with tempfile.TemporaryDirectory() as directory:
+            results = benchSize(rows, directory, args.invalides, not args.sans_memoire)
+        printResults(rows, results)
@@ -0,0 +1,122 @@
+# Durée et mémoire maximale de chaque étape de la chaîne de traitement, sur des données synthétiques
+# (voir benchmarks/syntheticData.py) : nettoyage, normalisation, agrégations du tableau de bord,
+# graphiques et rapport PDF.
+# Les agrégations sont celles des fonctions RPC, exécutées par la base locale SQLite (app/localdb.py).
+# Le pic mémoire est celui des allocations Python (tracemalloc), qui ne voit pas la mémoire interne de SQLite.
+# Utilisation (depuis la racine du dépôt) :
+#   python -m benchmarks.benchPipeline [tailles...] [--chunksize N] [--pdf-max N] [--sans-memoire] [--csv fichier]
+# Exemple : python -m benchmarks.benchPipeline 10k 100k 1M --csv resultats.csv
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from benchmarks.syntheticData import writeSynthetic, parseSize
+from scripts.cleaningData import cleanData, RAW_DTYPES
+from scripts.normalizeData import normalizeDF
+from app.localdb import LocalClient
+from app.filters import FILTER_KEYS
+from app.aggregates import fetch_achats_aggregates, fetch_achats_bp_aggregates, fetch_montant_bounds
+from app.charts import render_charts
+from rapport.scheduleRapport import generate_pdf
+
+# Tableau de bord sans filtre
+NO_FILTERS = dict.fromkeys(FILTER_KEYS)
+
+# Au-delà de ce nombre de lignes, le rapport PDF est généré sur les premières lignes seulement
+# (xhtml2pdf traite de l'ordre de 70 lignes par seconde, et bien moins sous tracemalloc)
+PDF_MAX_ROWS = 1_000
+
+
+def measure(fn, memory=True):
+    # Durée d'une exécution sans tracemalloc (qui ralentit le code Python), puis pic des allocations
+    # sur une seconde exécution. Retourne (résultat, durée en s, pic en octets ou None)
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return result, elapsed, None
+
+    del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def aggregations(client):
+    return (fetch_achats_aggregates(client, NO_FILTERS), fetch_achats_bp_aggregates(client, NO_FILTERS),
+            fetch_montant_bounds(client))
+
+
+def pdfRows(directory, count):
+    # Premières lignes de Achats au format retourné par Supabase
+    df = pd.read_csv(os.path.join(directory, 'Achats.csv'), nrows=count).rename(columns={'QteFacturée': 'QteFacturee'})
+    return df.where(df.notna(), None).to_dict('records')
+
+
+def benchSize(rows, directory, chunksize=None, pdfMax=PDF_MAX_ROWS, memory=True):
+    # Mesures (étape, lignes traitées, durée, pic mémoire) pour un fichier synthétique de `rows` lignes
+    sourcePath = writeSynthetic(os.path.join(directory, 'BaseDeDonnees.csv'), rows)
+    results = []
+
+    def run(stage, count, fn):
+        result, elapsed, peak = measure(fn, memory)
+        results.append((stage, count, elapsed, peak))
+        return result
+
+    run('lecture + cleanData', rows, lambda: cleanData(pd.read_csv(sourcePath, dtype=RAW_DTYPES)))
+    run('normalizeDF', rows, lambda: normalizeDF(sourcePath, directory, chunksize))
+    client = run('chargement SQLite', rows, lambda: LocalClient(directory, ':memory:', auth=False))
+    series, seriesBP, _ = run('agrégations', rows, lambda: aggregations(client))
+    run('graphiques', rows, lambda: render_charts(series, seriesBP))
+
+    count = min(rows, pdfMax)
+    data = pdfRows(directory, count)
+    run('generate_pdf', count, lambda: generate_pdf(data, os.path.join(directory, 'rapport.pdf')))
+    return results
+
+
+def printResults(rows, results):
+    print(f"\n{rows:,} lignes".replace(',', ' '))
+    for stage, count, elapsed, peak in results:
+        memory = f"{peak / 2**20:9.1f} Mo" if peak is not None else "         -"
+        print(f"  {stage:22s} {elapsed:9.3f} s {memory}  {count / elapsed:12,.0f} lignes/s".replace(',', ' '))
+
+
+def saveResults(path, rows, results):
+    # Ajout des mesures à un fichier CSV, pour comparer les exécutions successives
+    exists = os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(['date', 'taille', 'etape', 'lignes', 'duree_s', 'pic_memoire_octets'])
+        date = time.strftime('%Y-%m-%d %H:%M:%S')
+        for stage, count, elapsed, peak in results:
+            writer.writerow([date, rows, stage, count, f"{elapsed:.6f}", peak if peak is not None else ''])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure des étapes de la chaîne de traitement")
+    parser.add_argument('sizes', nargs='*', default=['10k', '100k'], help="10k, 100k, 1M, 10M ou un nombre de lignes")
+    parser.add_argument('--chunksize', type=int, help="normalizeDF en mode streaming, par blocs de N lignes")
+    parser.add_argument('--pdf-max', type=int, default=PDF_MAX_ROWS, help="lignes maximum du rapport PDF")
+    parser.add_argument('--sans-memoire', action='store_true', help="durées seules (une seule exécution par étape)")
+    parser.add_argument('--csv', help="fichier CSV auquel ajouter les mesures")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rows = parseSize(size)
+        with tempfile.TemporaryDirectory() as directory:
+            results = benchSize(rows, directory, args.chunksize, args.pdf_max, not args.sans_memoire)
+        printResults(rows, results)
+        if args.csv:
+            saveResults(args.csv, rows, results)
@@ -0,0 +1,61 @@
+# Comparaison des moteurs de génération du rapport PDF : durée et mémoire maximale
+# Utilisation (depuis la racine du dépôt) : python -m benchmarks.benchRapport [nombre de lignes] [moteurs...]
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from scripts.cleaningData import cleanData
+from rapport.renderers import RENDERERS, get_renderer
+from rapport.scheduleRapport import generate_pdf
+
+# Mémoire des processus enfants : module resource disponible seulement sous Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def loadRows(count):
+    # Lignes du fichier d'exemple (répétées si nécessaire), au format retourné par Supabase
+    df = cleanData(pd.read_csv('data/BaseDeDonnees.csv')).rename(columns={'QteFacturée': 'QteFacturee'})
+    df = pd.concat([df] * (count // len(df) + 1), ignore_index=True).head(count)
+    df['DateBR'] = df['DateBR'].dt.strftime('%Y-%m-%d')
+    return df.to_dict('records')
+
+
+def bench(backend, rows, output_path):
+    # Durée, pic d'allocations Python (tracemalloc) et mémoire maximale des processus enfants (wkhtmltopdf,
+    # None hors Unix)
+    # La durée est mesurée sans tracemalloc, qui ralentit fortement l'exécution ; le pic mémoire sur une seconde exécution
+    start = time.perf_counter()
+    generate_pdf(rows, output_path, backend=backend)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    generate_pdf(rows, output_path, backend=backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    childMaxRss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss if resource else None
+    return elapsed, peak, childMaxRss, os.path.getsize(output_path)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    backends = sys.argv[2:] or list(RENDERERS)
+    rows = loadRows(count)
+
+    print(f"{count} lignes")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in backends:
+            try:
+                get_renderer(backend)
+            except Exception as error:
+                print(f"{backend:12s} indisponible ({error})")
+                continue
+            elapsed, peak, childMaxRss, size = bench(backend, rows, os.path.join(directory, f"{backend}.pdf"))
+            external = ""
+            if backend == "wkhtmltopdf" and childMaxRss is not None:
+                external = f"  processus externe {childMaxRss / 1024:7.1f} Mo"
+            print(f"{backend:12s} {elapsed:7.2f} s  pic Python {peak / 2**20:7.1f} Mo{external}  PDF {size / 1024:7.1f} Ko")
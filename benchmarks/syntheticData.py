@@ -0,0 +1,105 @@
+# Génération de données synthétiques au format de data/BaseDeDonnees.csv, à grande échelle
+# Les bons de pesée réels sont tirés au hasard (avec remise) et recopiés avec toutes leurs lignes : le nombre de
+# lignes par bon, les associations fournisseur/bateau/article/famille, les Qualite/Moule vides et le format des
+# dates (M/J/AAAA sans zéros) suivent ceux du fichier réel. Chaque copie reçoit un nouveau numéro de bon, une date
+# décalée d'un nombre entier d'années et des quantités/montants multipliés par un même facteur aléatoire.
+# Utilisation (depuis la racine du dépôt) : python -m benchmarks.syntheticData <taille (10k, 100k, 1M, 10M ou nombre)> <fichier>
+import sys
+import numpy as np
+import pandas as pd
+
+SOURCE_PATH = 'data/BaseDeDonnees.csv'
+
+# Tailles prédéfinies
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+# Lignes générées à la fois (la mémoire utilisée ne dépend pas de la taille totale)
+CHUNK_ROWS = 1_000_000
+
+# Dispersion du facteur appliqué aux quantités et montants d'une ligne (loi log-normale)
+NOISE_SIGMA = 0.15
+
+
+def parseSize(value):
+    return SIZES[value] if value in SIZES else int(value)
+
+
+def loadSource(path=SOURCE_PATH):
+    # Fichier réel lu sans conversion (les valeurs sont recopiées telles quelles), lignes regroupées par bon
+    source = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return source.sort_values('NumBonPese', kind='stable').reset_index(drop=True)
+
+
+def iterSynthetic(rows, seed=0, years=None, source=None, chunkRows=CHUNK_ROWS):
+    # Blocs de données synthétiques totalisant `rows` lignes, répartis sur `years` années
+    # (par défaut une année par million de lignes)
+    source = loadSource() if source is None else source
+    years = years or max(1, round(rows / 1_000_000))
+    rng = np.random.default_rng(seed)
+
+    # Début et nombre de lignes de chaque bon réel
+    sizes = source.groupby('NumBonPese', sort=False).size().to_numpy()
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    dates = pd.to_datetime(source['DateBR'], format='%m/%d/%Y')
+    numeric = ['QteRecue', 'QteFacturée', 'PU', 'MontantAchat']
+    values = source[numeric].astype(float)
+
+    generated = 0
+    nextBon = 1
+    while generated < rows:
+        target = min(chunkRows, rows - generated)
+
+        # Bons tirés au hasard jusqu'à atteindre le nombre de lignes du bloc (le dernier bon peut être tronqué)
+        tickets = rng.integers(0, len(sizes), size=int(target / sizes.mean()) + len(sizes))
+        ticketSizes = sizes[tickets]
+        tickets = tickets[:np.searchsorted(np.cumsum(ticketSizes), target) + 1]
+        ticketSizes = sizes[tickets]
+
+        # Indices des lignes sources : lignes consécutives de chaque bon tiré
+        offsets = np.repeat(np.cumsum(ticketSizes) - ticketSizes, ticketSizes)
+        lines = np.repeat(starts[tickets], ticketSizes) + np.arange(ticketSizes.sum()) - offsets
+        ticketOfLine = np.repeat(np.arange(len(tickets)), ticketSizes)
+        lines, ticketOfLine = lines[:target], ticketOfLine[:target]
+
+        chunk = source.iloc[lines].reset_index(drop=True)
+
+        # Date du bon réel décalée d'un nombre entier d'années (même saisonnalité), au format M/J/AAAA
+        shift = rng.integers(0, years, size=len(tickets))[ticketOfLine]
+        lineDates = dates.iloc[lines].reset_index(drop=True)
+        # (un 29 février devient un 28 février si l'année d'arrivée n'est pas bissextile)
+        leapDay = (lineDates.dt.month == 2) & (lineDates.dt.day == 29)
+        shifted = pd.to_datetime(pd.DataFrame({'year': lineDates.dt.year + shift, 'month': lineDates.dt.month,
+                                               'day': lineDates.dt.day.mask(leapDay, 28)}))
+        chunk['DateBR'] = (shifted.dt.month.astype(str) + '/' + shifted.dt.day.astype(str) + '/'
+                           + shifted.dt.year.astype(str))
+
+        # Numéros de bon uniques, attribués dans l'ordre des dates comme dans le fichier réel
+        ticketDates = shifted.groupby(ticketOfLine).first().to_numpy()
+        order = np.empty(len(tickets), dtype=np.int64)
+        order[np.argsort(ticketDates, kind='stable')] = np.arange(len(tickets))
+        chunk['NumBonPese'] = 'BP' + pd.Series(nextBon + order[ticketOfLine]).astype(str).str.zfill(7)
+
+        # Quantités et montant multipliés par un même facteur (écart relatif et prix unitaire conservés)
+        factor = rng.lognormal(0, NOISE_SIGMA, size=len(chunk))
+        lineValues = values.iloc[lines].reset_index(drop=True)
+        chunk['QteRecue'] = (lineValues['QteRecue'] * factor).round(2)
+        chunk['QteFacturée'] = (lineValues['QteFacturée'] * factor).round(2)
+        chunk['MontantAchat'] = (lineValues['MontantAchat'] * factor).round(6)
+
+        generated += len(chunk)
+        nextBon += len(tickets)
+        yield chunk
+
+
+def writeSynthetic(path, rows, seed=0, years=None):
+    # Écriture bloc par bloc dans un CSV au même format que le fichier réel (BOM UTF-8, valeurs vides "NULL")
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for index, chunk in enumerate(iterSynthetic(rows, seed, years)):
+            chunk.to_csv(f, index=False, header=index == 0)
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit("Utilisation : python -m benchmarks.syntheticData <taille> <fichier>")
+    writeSynthetic(sys.argv[2], parseSize(sys.argv[1]))
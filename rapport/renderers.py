@@ -0,0 +1,80 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+# Moteur de génération PDF par défaut : wkhtmltopdf sous Windows, moteur Python intégré ailleurs
+RAPPORT_PDF_BACKEND = os.getenv("RAPPORT_PDF_BACKEND", "wkhtmltopdf" if os.name == "nt" else "xhtml2pdf")
+
+# Chemin de l'exécutable wkhtmltopdf (recherché dans le PATH s'il n'est pas à l'emplacement Windows habituel)
+WKHTMLTOPDF_PATH = os.getenv("WKHTMLTOPDF_PATH", r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
+
+
+# Interface commune des moteurs de génération PDF : conversion d'un fichier HTML ou d'une chaîne HTML
+class PdfRenderer(ABC):
+    name = None
+
+    @abstractmethod
+    def render_file(self, html_path, output_path):
+        ...
+
+    @abstractmethod
+    def render_string(self, html, output_path):
+        ...
+
+
+# Conversion par wkhtmltopdf (un processus externe par rapport)
+class WkhtmltopdfRenderer(PdfRenderer):
+    name = "wkhtmltopdf"
+
+    def __init__(self, path=WKHTMLTOPDF_PATH):
+        import pdfkit
+        self.pdfkit = pdfkit
+        if not os.path.exists(path):
+            path = shutil.which("wkhtmltopdf") or path
+        self.config = pdfkit.configuration(wkhtmltopdf=path)
+
+    def render_file(self, html_path, output_path):
+        self.pdfkit.from_file(html_path, output_path, configuration=self.config)
+
+    def render_string(self, html, output_path):
+        self.pdfkit.from_string(html, output_path, configuration=self.config)
+
+
+# Conversion dans le processus Python avec xhtml2pdf (aucun exécutable externe, fonctionne sous Linux)
+class Xhtml2pdfRenderer(PdfRenderer):
+    name = "xhtml2pdf"
+
+    def __init__(self):
+        from xhtml2pdf import pisa
+        self.pisa = pisa
+
+    def _render(self, source, output_path):
+        with open(output_path, "wb") as pdf_file:
+            result = self.pisa.CreatePDF(source, dest=pdf_file, encoding="utf-8")
+        if result.err:
+            raise RuntimeError(f"Échec de la génération du PDF {output_path}")
+
+    def render_file(self, html_path, output_path):
+        with open(html_path, "rb") as html_file:
+            self._render(html_file, output_path)
+
+    def render_string(self, html, output_path):
+        self._render(html, output_path)
+
+
+RENDERERS = {
+    WkhtmltopdfRenderer.name: WkhtmltopdfRenderer,
+    Xhtml2pdfRenderer.name: Xhtml2pdfRenderer,
+}
+
+# Moteurs déjà créés (un seul par nom et par processus)
+_renderers = {}
+
+
+def get_renderer(name=None):
+    name = name or RAPPORT_PDF_BACKEND
+    if name not in RENDERERS:
+        raise ValueError(f"Moteur PDF inconnu : {name} (disponibles : {', '.join(RENDERERS)})")
+    if name not in _renderers:
+        _renderers[name] = RENDERERS[name]()
+    return _renderers[name]
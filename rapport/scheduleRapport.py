@@ -1,34 +1,125 @@
 import os
 import smtplib
+import tempfile
 import schedule
 import time
-from datetime import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
 from email.message import EmailMessage
 from jinja2 import Environment, FileSystemLoader
 from dotenv import load_dotenv
-from supabase import create_client, Client
-import pdfkit
+from supabase import Client
 from collections import defaultdict
+from rapport.renderers import get_renderer
 
 # Charger les variables d'environnement depuis le fichier .env
 load_dotenv()
 
 # Récupération des clés depuis les variables d'environnement
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+# (la connexion aux données, Supabase ou base locale, est configurée dans app/client.py)
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")       # Adresse email de l'expéditeur
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")   # Mot de passe ou clé d'application
 EMAIL_RECEIVER = os.getenv("EMAIL_RECEIVER")   # Adresse email du destinataire
 
-# Création d'une instance Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Fournisseurs ayant leur propre rapport, en plus du rapport global (codes séparés par des virgules)
+RAPPORT_FOURNISSEURS = [code.strip() for code in os.getenv("RAPPORT_FOURNISSEURS", "").split(",") if code.strip()]
+
+# Nombre de rapports générés en parallèle
+RAPPORT_WORKERS = int(os.getenv("RAPPORT_WORKERS", 4))
+
+# Période couverte par le rapport planifié, en jours avant la date du jour (vide : tout l'historique)
+RAPPORT_JOURS = int(os.getenv("RAPPORT_JOURS")) if os.getenv("RAPPORT_JOURS") else None
+
+# Nombre de produits affichés dans le classement et nombre de lignes lues par requête pour le détail
+RAPPORT_TOP = int(os.getenv("RAPPORT_TOP", 3))
+RAPPORT_CHUNK = int(os.getenv("RAPPORT_CHUNK", 1000))
+
+# Dossier du modèle HTML et des PDF générés
+TEMPLATE_DIR = os.path.dirname(__file__)
+
+logger = logging.getLogger("rapport")
+
+# Environnement Jinja2 partagé : le modèle HTML est compilé une seule fois par processus
+jinja_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), auto_reload=False)
+
+# Pool de génération, créé au premier usage (l'import du module n'a pas d'effet de bord)
+_executor = None
+
+
+# Client de données partagé de l'application (Supabase, ou base locale si DATA_BACKEND=local)
+# Importé au premier usage : l'import de ce module ne charge pas l'application Flask
+def get_supabase() -> Client:
+    from app.client import get_client
+    return get_client()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RAPPORT_WORKERS, thread_name_prefix="rapport")
+    return _executor
+
+
+# Nombre de lignes, montant total et produits les plus reçus, calculés par Postgres (sql/003_agregats_rapport.sql)
+def fetch_aggregates(date_from=None, date_to=None, fournisseur=None, top=RAPPORT_TOP):
+    params = {
+        "p_date_from": date_from.isoformat() if date_from else None,
+        "p_date_to": date_to.isoformat() if date_to else None,
+        "p_fournisseur": fournisseur,
+        "p_top": top,
+    }
+    rows = get_supabase().rpc("agregats_rapport", params).execute().data or []
+    totaux = {row["cle"]: row["valeur"] or 0 for row in rows if row["serie"] == "totaux"}
+    top_n = sorted(((row["cle"], row["valeur"] or 0) for row in rows if row["serie"] == "top"),
+                   key=lambda x: x[1], reverse=True)
+    return int(totaux.get("nombre", 0)), totaux.get("total", 0), top_n
+
+# Lignes de la période lues par lots de `chunk` lignes, triées par (DateBR, NumBonPese) : même pagination par
+# curseur que la liste détaillée du tableau de bord (app/listing.py)
+def iter_achats(date_from=None, date_to=None, fournisseur=None, chunk=RAPPORT_CHUNK):
+    from app.filters import FILTER_KEYS
+    from app.listing import iter_pages
+
+    filters = dict.fromkeys(FILTER_KEYS)
+    filters.update(date_from=date_from.isoformat() if date_from else None,
+                   date_to=date_to.isoformat() if date_to else None,
+                   fournisseur=fournisseur, exact=True)
+    for rows in iter_pages(get_supabase(), filters, chunk):
+        yield from rows
+
+# Génération d'un rapport sur une période : agrégats calculés par la base et tableau de détail
+# lu par lots puis écrit au fur et à mesure dans un fichier HTML temporaire (jamais chargé en entier)
+# Retourne (chemin du PDF, nombre de lignes, durée de lecture des données, durée de la conversion en PDF)
+def generate_report(output_path, date_from=None, date_to=None, fournisseur=None, titre="Rapport d’Achats",
+                    backend=None):
+    start = time.perf_counter()
+    nombre, total, top_n = fetch_aggregates(date_from, date_to, fournisseur)
+
+    template = jinja_env.get_template("rapport.html")
+    stream = template.generate(
+        titre=titre,
+        periode=(date_from, date_to) if date_from or date_to else None,
+        nombre=nombre,
+        achats=iter_achats(date_from, date_to, fournisseur),
+        total=total,
+        top_3=top_n,
+        date=datetime.now().strftime("%d/%m/%Y %H:%M")
+    )
 
-# Fonction pour récupérer les données depuis la table "Achats" dans Supabase
-def fetch_data():
-    return supabase.table('Achats').select("*").execute().data or []
+    # Écriture du HTML par morceaux, puis conversion du fichier en PDF par le moteur choisi
+    with tempfile.NamedTemporaryFile("w", suffix=".html", encoding="utf-8", delete=False) as html_file:
+        html_file.writelines(stream)
+    fetched = time.perf_counter()
+    try:
+        get_renderer(backend).render_file(html_file.name, output_path)
+    finally:
+        os.remove(html_file.name)
+    return output_path, nombre, fetched - start, time.perf_counter() - fetched
 
 # Fonction pour générer un PDF à partir des données récupérées
-def generate_pdf(data):
+def generate_pdf(data, output_path=None, titre="Rapport d’Achats", backend=None):
     # Calcul du montant total des achats
     total = sum(item.get("MontantAchat", 0) for item in data)
 
@@ -44,55 +135,99 @@ def generate_pdf(data):
     # Date actuelle formatée pour affichage dans le rapport
     current_date = datetime.now().strftime("%d/%m/%Y %H:%M")
 
-    # Chargement du modèle HTML Jinja2 depuis le dossier du script
-    TEMPLATE_DIR = os.path.dirname(__file__)
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-    template = env.get_template("rapport.html")
+    # Modèle HTML Jinja2 (compilé une seule fois, voir jinja_env)
+    template = jinja_env.get_template("rapport.html")
 
     # Rendu HTML avec les données passées au template
     html_out = template.render(
+        titre=titre,
+        nombre=len(data),
         achats=data,
         total=total,
         top_3=top_3,
         date=current_date
     )
 
-    # Configuration de wkhtmltopdf pour générer le PDF
-    config = pdfkit.configuration(wkhtmltopdf=r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe")
-    output_path = os.path.join(TEMPLATE_DIR, "rapport.pdf")
+    output_path = output_path or os.path.join(TEMPLATE_DIR, "rapport.pdf")
 
-    # Génération du fichier PDF à partir du HTML
-    pdfkit.from_string(html_out, output_path, configuration=config)
+    # Génération du fichier PDF à partir du HTML (wkhtmltopdf ou moteur Python, voir rapport/renderers.py)
+    get_renderer(backend).render_string(html_out, output_path)
 
     return output_path  # Retourner le chemin du fichier PDF généré
 
-# Fonction pour envoyer le PDF généré par email
-def send_email(pdf_path):
+# Construction de l'email contenant un rapport PDF
+def build_email(pdf_path, subject="Rapport des Achats"):
     msg = EmailMessage()
-    msg["Subject"] = "Rapport des Achats"            # Sujet de l'email
+    msg["Subject"] = subject                         # Sujet de l'email
     msg["From"] = EMAIL_SENDER                       # Expéditeur
     msg["To"] = EMAIL_RECEIVER                       # Destinataire
     msg.set_content("Veuillez trouver ci-joint le rapport PDF des achats.")  # Corps du message
 
     # Ajouter le PDF en pièce jointe
     with open(pdf_path, "rb") as f:
-        msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename="rapport.pdf")
-
-    # Envoi de l'email via un serveur SMTP sécurisé (Gmail ici)
+        msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename=os.path.basename(pdf_path))
+    return msg
+
+# Envoi de plusieurs rapports sur une seule connexion SMTP (liste de couples (chemin du PDF, sujet))
+def send_emails(reports):
+    if not reports:
+        return
+    # Envoi des emails via un serveur SMTP sécurisé (Gmail ici), connexion ouverte une seule fois
     with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
         smtp.login(EMAIL_SENDER, EMAIL_PASSWORD)  # Connexion
-        smtp.send_message(msg)                    # Envoi de l'email
-
-# Tâche principale : récupérer, générer et envoyer
+        for pdf_path, subject in reports:
+            smtp.send_message(build_email(pdf_path, subject))  # Envoi de l'email
+
+# Génération d'un rapport (global si fournisseur est None) sur les RAPPORT_JOURS derniers jours,
+# avec les durées de lecture des données et de conversion en PDF dans le journal
+def run_report(fournisseur=None):
+    name = fournisseur or "global"
+    date_to = date.today() if RAPPORT_JOURS else None
+    date_from = date_to - timedelta(days=RAPPORT_JOURS) if RAPPORT_JOURS else None
+
+    filename = f"rapport_{fournisseur}.pdf" if fournisseur else "rapport.pdf"
+    titre = f"Rapport d’Achats — {fournisseur}" if fournisseur else "Rapport d’Achats"
+    pdf, nombre, lecture, rendu = generate_report(os.path.join(TEMPLATE_DIR, filename), date_from, date_to,
+                                                  fournisseur, titre)
+
+    logger.info("Rapport %s : %d lignes, lecture %.2f s, PDF %.2f s", name, nombre, lecture, rendu)
+    subject = f"Rapport des Achats — {fournisseur}" if fournisseur else "Rapport des Achats"
+    return pdf, subject
+
+# Tâche principale : générer en parallèle le rapport global et ceux des fournisseurs, puis les envoyer
 def job():
-    data = fetch_data()
-    pdf = generate_pdf(data)
-    send_email(pdf)
+    start = time.perf_counter()
+    futures = [get_executor().submit(run_report, fournisseur) for fournisseur in [None] + RAPPORT_FOURNISSEURS]
+
+    # Un rapport en échec n'empêche pas l'envoi des autres
+    reports = []
+    for future in futures:
+        try:
+            reports.append(future.result())
+        except Exception:
+            logger.exception("Échec de la génération d'un rapport")
+    generated = time.perf_counter()
+
+    send_emails(reports)
+    logger.info("Tâche terminée : %d rapport(s), génération %.2f s, envoi %.2f s",
+                len(reports), generated - start, time.perf_counter() - generated)
+
+# Lancement de la tâche dans son propre thread, sans bloquer la boucle de planification
+# (la tâche attend ensuite les rapports générés par le pool)
+def dispatch(task):
+    threading.Thread(target=task, name="rapport-job", daemon=True).start()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    # Planifier l'exécution du job tous les lundis à 09:00
+    schedule.every().monday.at("09:00").do(dispatch, job)
+
+    # Boucle infinie pour garder le script en attente des tâches planifiées
+    while True:
+        schedule.run_pending()  # Exécuter si une tâche est due
+        time.sleep(60)          # Attendre 60 secondes avant de revérifier
 
-# Planifier l'exécution du job tous les lundis à 09:00
-schedule.every().monday.at("09:00").do(job)
 
-# Boucle infinie pour garder le script en attente des tâches planifiées
-while True:
-    schedule.run_pending()  # Exécuter si une tâche est due
-    time.sleep(60)          # Attendre 60 secondes avant de revérifier
\ No newline at end of file
+if __name__ == "__main__":
+    main()
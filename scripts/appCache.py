@@ -0,0 +1,27 @@
+import logging
+import os
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+# Demande à l'application Flask de vider ses caches (données de référence, bornes des montants)
+# après le chargement de nouvelles données. Sans APP_URL ou CACHE_INVALIDATION_TOKEN, ne fait rien.
+# Seul le processus qui reçoit la requête vide ses caches (voir la route /cache/invalidate).
+# Les données sont déjà enregistrées : un échec de la requête est signalé dans le journal sans interrompre le
+# chargement (les caches expirent d'eux-mêmes après REFERENCE_CACHE_TTL).
+def invalidateAppCache():
+    appUrl = os.getenv('APP_URL')
+    token = os.getenv('CACHE_INVALIDATION_TOKEN')
+    if not appUrl or not token:
+        return False
+
+    # Requête POST vers la route /cache/invalidate de l'application
+    req = urllib.request.Request(f"{appUrl.rstrip('/')}/cache/invalidate", method="POST",
+                                 headers={"X-Cache-Token": token})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status == 200
+    except OSError as e:  # URLError, HTTPError (jeton refusé) et délai dépassé
+        logger.warning("Invalidation des caches de l'application impossible (%s) : %s", appUrl, e)
+        return False
@@ -1,48 +1,109 @@
+import os
+import numpy as np
 import pandas as pd
 
-
-def cleanData(df):
-    # Supprimer les lignes contenant des valeurs manquantes, sauf dans les colonnes 'Moule' et 'Qualite'
-    df = df.dropna(subset=[col for col in df.columns if (col != 'Moule' and col != 'Qualite')])
-
-    # Convertir la colonne 'DateBR' en format datetime (gère les formats mixtes)
-    df['DateBR'] = pd.to_datetime(df['DateBR'], format='mixed')
-
-    # Convertir la colonne 'QteRecue' en numérique, en remplaçant les erreurs par NaN
-    df['QteRecue'] = pd.to_numeric(df['QteRecue'], errors='coerce')
-
-    # Convertir la colonne 'QteFacturée' en numérique, en remplaçant les erreurs par NaN
-    df['QteFacturée'] = pd.to_numeric(df['QteFacturée'], errors='coerce')
-
-    # Convertir la colonne 'PU' (Prix Unitaire) en numérique, erreurs remplacées par NaN
-    df['PU'] = pd.to_numeric(df['PU'], errors='coerce')
-
-    # Convertir la colonne 'MontantAchat' en numérique, erreurs remplacées par NaN
-    df['MontantAchat'] = pd.to_numeric(df['MontantAchat'], errors='coerce')
-
-    # Forcer la colonne 'NumBonPese' à être de type chaîne de caractères
-    df['NumBonPese'] = df['NumBonPese'].astype(str)
-
-    # Forcer la colonne 'CodeFournisseur' à être de type chaîne de caractères
-    df['CodeFournisseur'] = df['CodeFournisseur'].astype(str)
-
-    # Forcer la colonne 'DesignationFournisseur' à être de type chaîne de caractères
-    df['DesignationFournisseur'] = df['DesignationFournisseur'].astype(str)
-
-    # Forcer la colonne 'DesignationArticle' à être de type chaîne de caractères
-    df['DesignationArticle'] = df['DesignationArticle'].astype(str)
-
-    # Forcer la colonne 'Famille' à être de type chaîne de caractères
-    df['Famille'] = df['Famille'].astype(str)
-
-    # Forcer la colonne 'NomBateau' à être de type chaîne de caractères
-    df['NomBateau'] = df['NomBateau'].astype(str)
-
-    # Forcer la colonne 'Qualite' à être de type chaîne de caractères
-    df['Qualite'] = df['Qualite'].astype(str)
-
-    # Forcer la colonne 'Moule' à être de type chaîne de caractères
-    df['Moule'] = df['Moule'].astype(str)
+# Schéma des colonnes du fichier brut : type cible et caractère obligatoire de chaque colonne
+# Types : 'texte' (chaînes), 'categorie' (valeurs très répétées, stockées une seule fois), 'date' et 'nombre'.
+# Une ligne dont une colonne obligatoire est vide, ou dont une date ou un nombre est invalide, est rejetée
+# (et écrite dans le fichier de quarantaine avec la raison du rejet).
+SCHEMA = {
+    'NumBonPese': {'type': 'texte', 'obligatoire': True},
+    'DateBR': {'type': 'date', 'obligatoire': True},
+    'CodeFournisseur': {'type': 'categorie', 'obligatoire': True},
+    'DesignationFournisseur': {'type': 'categorie', 'obligatoire': True},
+    'DesignationArticle': {'type': 'categorie', 'obligatoire': True},
+    'Famille': {'type': 'categorie', 'obligatoire': True},
+    'NomBateau': {'type': 'categorie', 'obligatoire': True},
+    'QteRecue': {'type': 'nombre', 'obligatoire': True},
+    'QteFacturée': {'type': 'nombre', 'obligatoire': True},
+    'Qualite': {'type': 'categorie', 'obligatoire': False},
+    'Moule': {'type': 'categorie', 'obligatoire': False},
+    'PU': {'type': 'nombre', 'obligatoire': True},
+    'MontantAchat': {'type': 'nombre', 'obligatoire': True},
+}
+
+# Format des dates du fichier brut (M/J/AAAA) ; les dates dans un autre format sont reconnues une par une
+DATE_FORMAT = '%m/%d/%Y'
+
+# Type des colonnes texte : chaînes avec valeur manquante pd.NA (au lieu de la chaîne 'nan')
+TEXT_DTYPE = pd.StringDtype()
+
+# Types de lecture du fichier brut : le texte et les catégories sont construits directement par read_csv
+# (sans passer par des objets Python), les dates sont lues en texte et les colonnes numériques en float64
+# (ou en texte si elles contiennent des valeurs invalides), puis converties par cleanData
+READ_DTYPES = {'texte': TEXT_DTYPE, 'categorie': 'category', 'date': str}
+RAW_DTYPES = {col: READ_DTYPES[spec['type']] for col, spec in SCHEMA.items() if spec['type'] != 'nombre'}
+
+# Colonne du fichier de quarantaine contenant les raisons du rejet
+REASON_COLUMN = 'Raison'
+
+
+def coerceColumn(values, kind):
+    # Conversion vectorisée d'une colonne vers son type cible (valeur invalide -> valeur manquante)
+    if kind == 'nombre':
+        return pd.to_numeric(values, errors='coerce')
+    if kind == 'date':
+        # Format principal en une seule passe ; seules les autres dates sont analysées au cas par cas
+        dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+        other = dates.isna() & values.notna()
+        if other.any():
+            dates[other] = pd.to_datetime(values[other], format='mixed', errors='coerce')
+        return dates
+    # (colonnes texte et catégories déjà dans le bon type si le fichier a été lu avec RAW_DTYPES)
+    if kind == 'categorie':
+        return values.astype('category')
+    return values.astype(TEXT_DTYPE)
+
+
+def validateData(df):
+    # Conversion de toutes les colonnes du schéma et séparation des lignes valides et rejetées
+    # Retourne (lignes valides converties, lignes rejetées brutes avec la colonne Raison)
+    missing = [col for col in SCHEMA if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes absentes du fichier : {', '.join(missing)}")
+
+    columns = {}
+    problems = {}
+    for col, spec in SCHEMA.items():
+        raw = df[col]
+        value = coerceColumn(raw, spec['type'])
+        columns[col] = value
+        # Valeurs vides : lues sur la colonne convertie pour le texte (test plus rapide sur les catégories)
+        empty = (raw if spec['type'] in ('nombre', 'date') else value).isna().to_numpy()
+        if spec['obligatoire']:
+            problems[f"{col} manquant"] = empty
+        if spec['type'] in ('nombre', 'date'):
+            problems[f"{col} invalide"] = value.isna().to_numpy() & ~empty
+
+    # Colonnes converties (les autres colonnes sont gardées telles quelles, dans le même ordre)
+    clean_df = pd.DataFrame({col: columns.get(col, df[col]) for col in df.columns}, index=df.index)
+    rejected = np.logical_or.reduce(list(problems.values()))
+    if rejected.any():
+        clean_df = clean_df[~rejected]
+        # Les catégories des seules lignes rejetées sont retirées
+        for col, spec in SCHEMA.items():
+            if spec['type'] == 'categorie':
+                clean_df[col] = clean_df[col].cat.remove_unused_categories()
+
+    # Raisons du rejet (calculées uniquement pour les lignes rejetées)
+    rejected_df = df[rejected].copy()
+    flags = pd.DataFrame({reason: mask[rejected] for reason, mask in problems.items()}, index=rejected_df.index)
+    rejected_df[REASON_COLUMN] = flags.apply(lambda row: '; '.join(row.index[row]), axis=1) if len(flags) else ''
+    return clean_df, rejected_df
+
+
+def writeQuarantine(rejected_df, quarantinePath):
+    # Ajout des lignes rejetées au fichier de quarantaine (en-tête écrit à la création du fichier)
+    exists = os.path.exists(quarantinePath)
+    rejected_df.to_csv(quarantinePath, mode='a' if exists else 'w', header=not exists, index=False)
+
+
+def cleanData(df, quarantinePath=None):
+    # Convertir les colonnes selon le schéma ; les lignes rejetées sont écartées (et ajoutées au fichier
+    # de quarantaine si quarantinePath est donné). Les valeurs manquantes de Qualite et Moule restent nulles.
+    df, rejected_df = validateData(df)
+    if quarantinePath and not rejected_df.empty:
+        writeQuarantine(rejected_df, quarantinePath)
 
     # Créer une nouvelle colonne 'Ecart' représentant la différence entre 'QteRecue' et 'QteFacturée'
     df['Ecart'] = df['QteRecue'] - df['QteFacturée']
@@ -1,18 +1,50 @@
+import os
 import pandas as pd
-from scripts.cleaningData import cleanData
+from scripts.cleaningData import cleanData, RAW_DTYPES
+from scripts.appCache import invalidateAppCache
+from scripts.uploadData import uploadRows, replaceRows, deleteRows
+from scripts.parquetData import saveAchatsParquet, saveTableParquet
+from scripts.reconciliationData import buildAchatsBP, combineAchatsBP, BP_COLUMNS
+from scripts.rollupData import (buildAchatsJour, buildAchatsBPJour, mergeRollup, readRollup, replaceRollup,
+                                ROLLUP_COLUMNS, ROLLUP_KEYS, ROLLUP_VALUES, BP_ROLLUP_KEYS, BP_ROLLUP_VALUES)
 
+# Colonnes du tableau des ventes (Achats)
+SALES_COLUMNS = ['NumBonPese', 'DesignationArticle', 'DateBR',
+                 'CodeFournisseur', 'NomBateau', 'QteRecue', 'QteFacturée',
+                 'Qualite', 'Moule', 'PU', 'MontantAchat']
+
+# Colonnes numériques du tableau des ventes
+SALES_NUMBERS = ['QteRecue', 'QteFacturée', 'PU', 'MontantAchat']
+
+# Nombre de lignes lues à la fois en mode streaming
+CHUNK_SIZE = 100_000
+
+# Fichier des lignes rejetées par cleanData, avec la raison du rejet (recréé à chaque chargement)
+QUARANTINE_FILE = 'Rejets.csv'
+
+
+def resetQuarantine(saveDirectory):
+    # Supprimer le fichier de quarantaine du chargement précédent et retourner son chemin
+    path = f"{saveDirectory}/{QUARANTINE_FILE}"
+    if os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def normalizeDF(ogPath, saveDirectory, chunksize=None, parquet=False):
+    # Mode streaming : lecture et traitement du fichier par blocs de `chunksize` lignes
+    if chunksize:
+        return normalizeDFChunked(ogPath, saveDirectory, chunksize, parquet)
 
-def normalizeDF(ogPath, saveDirectory):
     # Lire le fichier CSV original à partir du chemin donné
-    df = pd.read_csv(ogPath)
+    df = pd.read_csv(ogPath, dtype=RAW_DTYPES)
 
-    # Nettoyer le DataFrame en utilisant la fonction cleanData (suppression de NaN, conversion de types, etc.)
-    df = cleanData(df)
+    # Nettoyer le DataFrame en utilisant la fonction cleanData (conversion de types selon le schéma,
+    # lignes invalides écartées dans le fichier de quarantaine)
+    df = cleanData(df, resetQuarantine(saveDirectory))
 
     # Extraire les colonnes nécessaires pour le tableau des ventes (Achats)
-    sales_df = df[['NumBonPese', 'DesignationArticle', 'DateBR',
-                   'CodeFournisseur', 'NomBateau', 'QteRecue', 'QteFacturée',
-                   'Qualite', 'Moule', 'PU', 'MontantAchat']]
+    sales_df = df[SALES_COLUMNS]
 
     # Créer le tableau des fournisseurs en supprimant les doublons et en réinitialisant les index
     suppliers_df = df[['CodeFournisseur', 'DesignationFournisseur']].drop_duplicates().reset_index(drop=True)
@@ -21,7 +53,7 @@ def normalizeDF(ogPath, saveDirectory):
     articles_df = df[['DesignationArticle', 'Famille']].drop_duplicates().reset_index(drop=True)
 
     # Calculer le chiffre d'affaires (CA) total par produit (somme de MontantAchat groupée par DesignationArticle)
-    ca_df = df.groupby('DesignationArticle')['MontantAchat'].sum().reset_index()
+    ca_df = df.groupby('DesignationArticle', observed=True)['MontantAchat'].sum().reset_index()
 
     # Renommer la colonne 'MontantAchat' en 'CA' (chiffre d'affaires)
     ca_df.rename(columns={'MontantAchat': 'CA'}, inplace=True)
@@ -29,6 +61,13 @@ def normalizeDF(ogPath, saveDirectory):
     # Fusionner les informations de CA avec les articles pour inclure le CA dans le tableau des produits
     articles_df = articles_df.merge(ca_df, on='DesignationArticle', how='left')
 
+    # Construire le tableau de rapprochement par bon de pesée (écarts et totaux)
+    bp_df = buildAchatsBP(df)
+
+    # Construire les agrégats journaliers (jour x fournisseur x article, et jour x fournisseur pour AchatsBP)
+    rollup_df = buildAchatsJour(df)
+    bpRollup_df = buildAchatsBPJour(bp_df)
+
     # Enregistrer le tableau des ventes dans un fichier CSV nommé "Achats.csv" dans le répertoire spécifié
     sales_df.to_csv(f"{saveDirectory}/Achats.csv", index=False)
 
@@ -37,3 +76,255 @@ def normalizeDF(ogPath, saveDirectory):
 
     # Enregistrer le tableau des produits (avec famille + CA) dans "Produits.csv"
     articles_df.to_csv(f"{saveDirectory}/Produits.csv", index=False)
+
+    # Enregistrer le tableau de rapprochement par bon de pesée dans "AchatsBP.csv"
+    bp_df.to_csv(f"{saveDirectory}/AchatsBP.csv", index=False)
+
+    # Enregistrer les agrégats journaliers dans "AchatsJour.csv" et "AchatsBPJour.csv"
+    rollup_df.to_csv(f"{saveDirectory}/AchatsJour.csv", index=False)
+    bpRollup_df.to_csv(f"{saveDirectory}/AchatsBPJour.csv", index=False)
+
+    # Enregistrer aussi les tableaux au format Parquet (ventes partitionnées par année/mois)
+    if parquet:
+        saveAchatsParquet(sales_df, saveDirectory)
+        saveTableParquet(suppliers_df, saveDirectory, 'Fournisseurs')
+        saveTableParquet(articles_df, saveDirectory, 'Produits')
+        saveTableParquet(bp_df, saveDirectory, 'AchatsBP')
+        saveTableParquet(rollup_df, saveDirectory, 'AchatsJour')
+        saveTableParquet(bpRollup_df, saveDirectory, 'AchatsBPJour')
+
+    # Nouvelles données chargées : invalider les caches de l'application
+    invalidateAppCache()
+
+
+def normalizeDFChunked(ogPath, saveDirectory, chunksize=CHUNK_SIZE, parquet=False):
+    # Même résultat que normalizeDF, mais seul un bloc de lignes est en mémoire à la fois :
+    # la mémoire utilisée ne dépend pas de la taille du fichier d'entrée.
+    salesPath = f"{saveDirectory}/Achats.csv"
+    quarantinePath = resetQuarantine(saveDirectory)
+
+    # Fournisseurs et articles déjà rencontrés (dictionnaires pour garder l'ordre de première apparition)
+    suppliers = {}
+    articles = {}
+
+    # Chiffre d'affaires cumulé par produit
+    ca = pd.Series(dtype='float64')
+
+    # Tableaux AchatsBP partiels de chaque bloc (un bon de pesée peut être réparti sur plusieurs blocs)
+    bpParts = []
+
+    # Agrégats journaliers des ventes cumulés bloc par bloc
+    rollup_df = pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    firstChunk = True
+    for chunk in pd.read_csv(ogPath, dtype=RAW_DTYPES, chunksize=chunksize):
+        # Nettoyer le bloc
+        chunk = cleanData(chunk, quarantinePath)
+
+        # Ajouter les ventes du bloc à "Achats.csv" (le fichier est recréé au premier bloc)
+        chunk[SALES_COLUMNS].to_csv(salesPath, mode='w' if firstChunk else 'a', header=firstChunk, index=False)
+        if parquet:
+            saveAchatsParquet(chunk[SALES_COLUMNS], saveDirectory, append=not firstChunk)
+        firstChunk = False
+
+        # Ajouter les nouveaux fournisseurs et articles
+        for key in chunk[['CodeFournisseur', 'DesignationFournisseur']].drop_duplicates().itertuples(index=False, name=None):
+            suppliers.setdefault(key)
+        for key in chunk[['DesignationArticle', 'Famille']].drop_duplicates().itertuples(index=False, name=None):
+            articles.setdefault(key)
+
+        # Cumuler le CA du bloc par produit
+        ca = ca.add(chunk.groupby('DesignationArticle', observed=True)['MontantAchat'].sum(), fill_value=0)
+
+        # Rapprochement partiel du bloc par bon de pesée
+        bpParts.append(buildAchatsBP(chunk))
+
+        # Ajouter les agrégats journaliers du bloc
+        rollup_df = mergeRollup(rollup_df, buildAchatsJour(chunk), ROLLUP_KEYS, ROLLUP_VALUES)
+
+    # Fichier d'entrée vide : "Achats.csv" ne contient que l'en-tête
+    if firstChunk:
+        pd.DataFrame(columns=SALES_COLUMNS).to_csv(salesPath, index=False)
+
+    # Construire les tableaux des fournisseurs et des produits (avec famille + CA)
+    suppliers_df = pd.DataFrame(list(suppliers), columns=['CodeFournisseur', 'DesignationFournisseur'])
+    articles_df = pd.DataFrame(list(articles), columns=['DesignationArticle', 'Famille'])
+    articles_df['CA'] = articles_df['DesignationArticle'].map(ca)
+
+    # Combiner les rapprochements partiels en un tableau AchatsBP complet
+    bp_df = combineAchatsBP(pd.concat(bpParts, ignore_index=True)) if bpParts else pd.DataFrame(columns=BP_COLUMNS)
+
+    # Agrégats journaliers de AchatsBP, calculés sur les bons de pesée complets
+    bpRollup_df = buildAchatsBPJour(bp_df)
+
+    # Enregistrer les tableaux des fournisseurs, des produits, de rapprochement et les agrégats journaliers
+    suppliers_df.to_csv(f"{saveDirectory}/Fournisseurs.csv", index=False)
+    articles_df.to_csv(f"{saveDirectory}/Produits.csv", index=False)
+    bp_df.to_csv(f"{saveDirectory}/AchatsBP.csv", index=False)
+    rollup_df.to_csv(f"{saveDirectory}/AchatsJour.csv", index=False)
+    bpRollup_df.to_csv(f"{saveDirectory}/AchatsBPJour.csv", index=False)
+    if parquet:
+        saveTableParquet(suppliers_df, saveDirectory, 'Fournisseurs')
+        saveTableParquet(articles_df, saveDirectory, 'Produits')
+        saveTableParquet(bp_df, saveDirectory, 'AchatsBP')
+        saveTableParquet(rollup_df, saveDirectory, 'AchatsJour')
+        saveTableParquet(bpRollup_df, saveDirectory, 'AchatsBPJour')
+
+    # Nouvelles données chargées : invalider les caches de l'application
+    invalidateAppCache()
+
+
+def stageCSV(df, path):
+    # Écrire un tableau dans un fichier temporaire (remplacé ensuite par commitStaged) et retourner son chemin
+    stagedPath = f"{path}.tmp"
+    df.to_csv(stagedPath, index=False)
+    return stagedPath
+
+
+def commitStaged(stagedPaths):
+    # Remplacer les fichiers par leurs versions temporaires, une fois toutes écrites
+    for stagedPath in stagedPaths:
+        os.replace(stagedPath, stagedPath[:-len('.tmp')])
+
+
+def readSales(path):
+    # Lire "Achats.csv" (tableau vide si le fichier n'existe pas encore)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=SALES_COLUMNS)
+    text = {col: str for col in SALES_COLUMNS if col not in SALES_NUMBERS and col != 'DateBR'}
+    return pd.read_csv(path, dtype=text, parse_dates=['DateBR'])
+
+
+def readBP(path):
+    # Lire "AchatsBP.csv" (tableau vide si le fichier n'existe pas encore)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=BP_COLUMNS)
+    return pd.read_csv(path, dtype={'NumBonPese': str, 'CodeFournisseur': str, 'NomBateau': str},
+                       parse_dates=['DateBR'])
+
+
+def ticketDigests(df):
+    # Empreinte de chaque bon de pesée : nombre de lignes et somme des empreintes de ses lignes (indépendante de
+    # l'ordre des lignes). Les colonnes sont ramenées aux types relus dans "Achats.csv" (texte, valeur vide ''),
+    # pour comparer les lignes du fichier original nettoyé à celles déjà chargées.
+    rows = pd.DataFrame({col: df[col].astype('float64') if col in SALES_NUMBERS
+                         else pd.to_datetime(df[col]) if col == 'DateBR'
+                         else df[col].astype(object).where(df[col].notna(), '').astype(str)
+                         for col in SALES_COLUMNS})
+    lines = pd.DataFrame({'NumBonPese': rows['NumBonPese'],
+                          'Empreinte': pd.util.hash_pandas_object(rows, index=False).to_numpy()})
+    # (la somme des empreintes uint64 se fait modulo 2**64)
+    return lines.groupby('NumBonPese', sort=False).agg(Lignes=('Empreinte', 'size'), Empreinte=('Empreinte', 'sum'))
+
+
+def normalizeDFIncremental(ogPath, saveDirectory, upload=False, chunksize=CHUNK_SIZE, parquet=False, supabase=None):
+    # Chargement incrémental : seuls les bons de pesée (NumBonPese) nouveaux ou modifiés sont traités. Un bon est
+    # modifié si ses lignes dans le fichier original diffèrent de celles de "Achats.csv" (nombre de lignes ou
+    # empreinte, voir ticketDigests), par exemple un bon exporté en partie au chargement précédent : ses lignes
+    # remplacent alors les anciennes dans les ventes, le rapprochement, les agrégats et le CA des produits.
+    # Les bons absents du fichier original sont gardés tels quels.
+    # Avec upload=True, seules les lignes nouvelles ou modifiées sont envoyées à Supabase (client `supabase`,
+    # ou un nouveau client par table s'il n'est pas donné). Retourne le DataFrame des ventes des bons traités.
+    # L'envoi a lieu avant l'écriture des fichiers locaux : si l'envoi échoue, les bons ne sont pas marqués
+    # comme chargés et seront repris au prochain chargement ; l'envoi relancé ne crée pas de doublons.
+    salesPath = f"{saveDirectory}/Achats.csv"
+    suppliersPath = f"{saveDirectory}/Fournisseurs.csv"
+    articlesPath = f"{saveDirectory}/Produits.csv"
+    bpPath = f"{saveDirectory}/AchatsBP.csv"
+    rollupPath = f"{saveDirectory}/AchatsJour.csv"
+    bpRollupPath = f"{saveDirectory}/AchatsBPJour.csv"
+    quarantinePath = resetQuarantine(saveDirectory)
+
+    # Ventes déjà chargées et empreinte de chaque bon de pesée
+    stored_df = readSales(salesPath)
+    storedDigests = set(ticketDigests(stored_df).itertuples(name=None))
+
+    # Lire le fichier original par blocs (un bon de pesée peut être réparti sur plusieurs blocs), puis ne garder
+    # que les lignes des bons nouveaux ou modifiés
+    chunks = [cleanData(chunk, quarantinePath) for chunk in pd.read_csv(ogPath, dtype=RAW_DTYPES, chunksize=chunksize)]
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=SALES_COLUMNS)
+    changed = [bon for bon, *digest in ticketDigests(df).itertuples(name=None)
+               if (bon, *digest) not in storedDigests]
+    new_df = df[df['NumBonPese'].isin(changed)]
+    if new_df.empty:
+        return new_df[SALES_COLUMNS]
+    sales_df = new_df[SALES_COLUMNS]
+
+    # Anciennes lignes des bons modifiés (retirées des tableaux normalisés)
+    replaced = stored_df['NumBonPese'].isin(changed)
+    old_df = stored_df[replaced]
+    allSales_df = pd.concat([frame for frame in (stored_df[~replaced], sales_df) if not frame.empty], ignore_index=True)
+
+    # Fusionner les nouveaux fournisseurs avec le tableau existant
+    suppliers_df = pd.read_csv(suppliersPath, dtype=str) if os.path.exists(suppliersPath) \
+        else pd.DataFrame(columns=['CodeFournisseur', 'DesignationFournisseur'])
+    newSuppliers_df = new_df[['CodeFournisseur', 'DesignationFournisseur']].drop_duplicates()
+    newSuppliers_df = newSuppliers_df[~newSuppliers_df['CodeFournisseur'].isin(suppliers_df['CodeFournisseur'])]
+    suppliers_df = pd.concat([suppliers_df, newSuppliers_df], ignore_index=True)
+
+    # Mettre à jour le CA des produits par différence : CA existant - CA des anciennes lignes + CA des nouvelles
+    articles_df = pd.read_csv(articlesPath, dtype={'DesignationArticle': str, 'Famille': str}) \
+        if os.path.exists(articlesPath) else pd.DataFrame(columns=['DesignationArticle', 'Famille', 'CA'])
+    newArticles_df = new_df[['DesignationArticle', 'Famille']].drop_duplicates()
+    newArticles_df = newArticles_df[~newArticles_df['DesignationArticle'].isin(articles_df['DesignationArticle'])]
+    articles_df = pd.concat([articles_df, newArticles_df.assign(CA=0.0)], ignore_index=True)
+    deltaCA = new_df.groupby('DesignationArticle', observed=True)['MontantAchat'].sum()
+    if not old_df.empty:
+        deltaCA = pd.concat([deltaCA, -old_df.groupby('DesignationArticle')['MontantAchat'].sum()])
+    deltaCA = deltaCA.groupby(deltaCA.index.astype(str)).sum()
+    # (au premier chargement, les articles viennent tous de cleanData : colonne catégorielle, relue en texte)
+    articles_df['DesignationArticle'] = articles_df['DesignationArticle'].astype(str)
+    articles_df['CA'] = articles_df['CA'].fillna(0) + articles_df['DesignationArticle'].map(deltaCA).fillna(0)
+    changedArticles_df = articles_df[articles_df['DesignationArticle'].isin(deltaCA.index)]
+
+    # Rapprochement des bons traités (remplace celui des bons modifiés)
+    bp_df = readBP(bpPath)
+    replacedBP = bp_df['NumBonPese'].isin(changed)
+    newBP_df = buildAchatsBP(new_df)
+    allBP_df = pd.concat([frame for frame in (bp_df[~replacedBP], newBP_df) if not frame.empty], ignore_index=True)
+
+    # Agrégats journaliers : retirer la contribution des anciennes lignes et ajouter celle des nouvelles
+    # (seuls les jours, fournisseurs et articles des bons traités changent)
+    rollup_df, changedRollup_df, removedRollup_df = replaceRollup(
+        readRollup(rollupPath, ROLLUP_KEYS, ROLLUP_VALUES), buildAchatsJour(old_df), buildAchatsJour(new_df),
+        ROLLUP_KEYS, ROLLUP_VALUES, 'Lignes')
+    bpRollup_df, changedBPRollup_df, removedBPRollup_df = replaceRollup(
+        readRollup(bpRollupPath, BP_ROLLUP_KEYS, BP_ROLLUP_VALUES), buildAchatsBPJour(bp_df[replacedBP]),
+        buildAchatsBPJour(newBP_df), BP_ROLLUP_KEYS, BP_ROLLUP_VALUES, 'Bons')
+
+    # Envoyer uniquement les lignes nouvelles ou modifiées à Supabase, par lots. Chaque envoi peut être relancé :
+    # upsert sur la clé des tableaux, remplacement des lignes des bons traités pour Achats (sans clé unique) et
+    # suppression des agrégats journaliers qui n'ont plus de ventes
+    if upload:
+        uploadRows('Fournisseurs', newSuppliers_df, onConflict='CodeFournisseur', supabase=supabase)
+        uploadRows('Produits', changedArticles_df, onConflict='DesignationArticle', supabase=supabase)
+        replaceRows('Achats', sales_df, 'NumBonPese', supabase=supabase)
+        uploadRows('AchatsBP', newBP_df, onConflict='NumBonPese', supabase=supabase)
+        uploadRows('AchatsJour', changedRollup_df, onConflict=','.join(ROLLUP_KEYS), supabase=supabase)
+        deleteRows('AchatsJour', removedRollup_df, ROLLUP_KEYS, supabase=supabase)
+        uploadRows('AchatsBPJour', changedBPRollup_df, onConflict=','.join(BP_ROLLUP_KEYS), supabase=supabase)
+        deleteRows('AchatsBPJour', removedBPRollup_df, BP_ROLLUP_KEYS, supabase=supabase)
+
+    # Enregistrer les tableaux mis à jour : tous écrits dans des fichiers temporaires avant de remplacer les
+    # fichiers existants, "Achats.csv" en dernier (ce fichier définit les bons déjà chargés)
+    commitStaged([stageCSV(suppliers_df, suppliersPath), stageCSV(articles_df, articlesPath),
+                  stageCSV(rollup_df, rollupPath), stageCSV(bpRollup_df, bpRollupPath),
+                  stageCSV(allBP_df, bpPath), stageCSV(allSales_df, salesPath)])
+
+    # Jeu de données Parquet : nouvelles ventes ajoutées, ou jeu recréé si des bons ont été remplacés ;
+    # réécrire les petits tableaux
+    if parquet:
+        if old_df.empty:
+            saveAchatsParquet(sales_df, saveDirectory, append=True)
+        else:
+            saveAchatsParquet(allSales_df, saveDirectory)
+        saveTableParquet(suppliers_df, saveDirectory, 'Fournisseurs')
+        saveTableParquet(articles_df, saveDirectory, 'Produits')
+        saveTableParquet(allBP_df, saveDirectory, 'AchatsBP')
+        saveTableParquet(rollup_df, saveDirectory, 'AchatsJour')
+        saveTableParquet(bpRollup_df, saveDirectory, 'AchatsBPJour')
+
+    # Nouvelles données chargées : invalider les caches de l'application
+    invalidateAppCache()
+
+    return sales_df
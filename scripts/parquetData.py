@@ -0,0 +1,62 @@
+import os
+import shutil
+import pandas as pd
+
+# Colonnes texte très répétitives, stockées en dictionnaire (catégories) dans les fichiers Parquet
+CATEGORY_COLUMNS = ['CodeFournisseur', 'DesignationArticle', 'NomBateau', 'Qualite']
+
+# Colonnes de partitionnement du tableau des ventes (année et mois de DateBR)
+PARTITION_COLUMNS = ['Annee', 'Mois']
+
+
+def achatsParquetPath(saveDirectory):
+    # Dossier du jeu de données Parquet des ventes (un sous-dossier par année et par mois)
+    return f"{saveDirectory}/Achats.parquet"
+
+
+def saveAchatsParquet(sales_df, saveDirectory, append=False):
+    # Enregistrer le tableau des ventes au format Parquet, partitionné par année/mois de DateBR.
+    # Avec append=True, les lignes sont ajoutées au jeu de données existant (nouveaux fichiers) ;
+    # sinon le jeu de données est recréé.
+    path = achatsParquetPath(saveDirectory)
+    if not append and os.path.exists(path):
+        shutil.rmtree(path)
+
+    df = sales_df.copy()
+    df['Annee'] = df['DateBR'].dt.year
+    df['Mois'] = df['DateBR'].dt.month
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    df.to_parquet(path, partition_cols=PARTITION_COLUMNS, index=False)
+
+
+def saveTableParquet(df, saveDirectory, name):
+    # Enregistrer un petit tableau (Fournisseurs, Produits) dans un seul fichier Parquet
+    df.to_parquet(f"{saveDirectory}/{name}.parquet", index=False)
+
+
+def achatsFilters(dateFrom=None, dateTo=None):
+    # Filtres (forme normale disjonctive : liste de conjonctions) de la période [dateFrom, dateTo] :
+    # bornes sur le couple (Annee, Mois) pour ne lire que les partitions des mois concernés, et sur DateBR
+    # pour les lignes des mois de début et de fin
+    lower, upper, dates = [[]], [[]], []
+    if dateFrom is not None:
+        dateFrom = pd.Timestamp(dateFrom)
+        lower = [[('Annee', '>', dateFrom.year)], [('Annee', '==', dateFrom.year), ('Mois', '>=', dateFrom.month)]]
+        dates.append(('DateBR', '>=', dateFrom))
+    if dateTo is not None:
+        dateTo = pd.Timestamp(dateTo)
+        upper = [[('Annee', '<', dateTo.year)], [('Annee', '==', dateTo.year), ('Mois', '<=', dateTo.month)]]
+        dates.append(('DateBR', '<=', dateTo))
+    if not dates:
+        return None
+    return [low + high + dates for low in lower for high in upper]
+
+
+def loadAchats(saveDirectory, columns=None, dateFrom=None, dateTo=None):
+    # Charger le tableau des ventes depuis Parquet en ne lisant que les colonnes demandées et
+    # les partitions (année/mois) de la période [dateFrom, dateTo]
+    filters = achatsFilters(dateFrom, dateTo)
+    df = pd.read_parquet(achatsParquetPath(saveDirectory), columns=columns, filters=filters)
+    # Les colonnes de partitionnement ne sont gardées que si elles sont demandées
+    return df.drop(columns=[col for col in PARTITION_COLUMNS if col in df.columns and not (columns and col in columns)])
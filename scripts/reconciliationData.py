@@ -0,0 +1,48 @@
+import pandas as pd
+
+# Colonnes du tableau de rapprochement par bon de pesée (AchatsBP)
+BP_COLUMNS = ['NumBonPese', 'DateBR', 'CodeFournisseur', 'NomBateau',
+              'EcartQt', 'EcartMontant', 'TotRecu', 'TotFacture', 'TotPaye']
+
+# Colonnes texte du tableau (valeur maximale retenue pour chaque bon de pesée)
+TEXT_COLUMNS = ['CodeFournisseur', 'NomBateau']
+
+# Agrégation de chaque colonne : les sommes et les maximums se combinent aussi entre blocs de lignes
+BP_AGGREGATIONS = {
+    'DateBR': 'max',
+    'CodeFournisseur': 'max',
+    'NomBateau': 'max',
+    'EcartQt': 'sum',
+    'EcartMontant': 'sum',
+    'TotRecu': 'sum',
+    'TotFacture': 'sum',
+    'TotPaye': 'sum',
+}
+
+
+def buildAchatsBP(df):
+    # Construire le tableau AchatsBP à partir des ventes nettoyées (sortie de cleanData),
+    # en un seul regroupement par NumBonPese
+    lines = pd.DataFrame({
+        'NumBonPese': df['NumBonPese'],
+        'DateBR': df['DateBR'],
+        'CodeFournisseur': df['CodeFournisseur'],
+        'NomBateau': df['NomBateau'],
+        # Écart quantité et écart montant de chaque ligne (écart valorisé au prix unitaire)
+        'EcartQt': df['QteRecue'] - df['QteFacturée'],
+        'EcartMontant': (df['QteRecue'] - df['QteFacturée']) * df['PU'],
+        'TotRecu': df['QteRecue'],
+        'TotFacture': df['QteFacturée'],
+        'TotPaye': df['MontantAchat'],
+    })
+    return combineAchatsBP(lines)
+
+
+def combineAchatsBP(bp_df):
+    # Regrouper des lignes (ou des tableaux AchatsBP partiels) par bon de pesée
+    # Le maximum d'une colonne texte est calculé sur des catégories ordonnées (codes entiers),
+    # beaucoup plus rapide que sur des chaînes de caractères
+    bp_df = bp_df.assign(**{col: bp_df[col].astype('category').cat.as_ordered() for col in TEXT_COLUMNS})
+    result = bp_df.groupby('NumBonPese', sort=True, observed=True).agg(BP_AGGREGATIONS).reset_index()
+    result[TEXT_COLUMNS] = result[TEXT_COLUMNS].astype(object)
+    return result[BP_COLUMNS]
@@ -0,0 +1,66 @@
+import os
+import pandas as pd
+
+# Agrégats journaliers des ventes (AchatsJour) : une ligne par jour, fournisseur et article
+ROLLUP_KEYS = ['DateBR', 'CodeFournisseur', 'DesignationArticle']
+ROLLUP_VALUES = ['MontantAchat', 'QteRecue', 'QteFacturée', 'Ecart', 'EcartAbs', 'Lignes']
+ROLLUP_COLUMNS = ROLLUP_KEYS + ROLLUP_VALUES
+
+# Agrégats journaliers du rapprochement par bon de pesée (AchatsBPJour) : une ligne par jour et fournisseur
+BP_ROLLUP_KEYS = ['DateBR', 'CodeFournisseur']
+BP_ROLLUP_VALUES = ['EcartQt', 'EcartMontant', 'TotRecu', 'TotFacture', 'TotPaye', 'Bons']
+BP_ROLLUP_COLUMNS = BP_ROLLUP_KEYS + BP_ROLLUP_VALUES
+
+
+def buildAchatsJour(df):
+    # Agrégats journaliers à partir des ventes nettoyées (sortie de cleanData)
+    # L'écart absolu est calculé ligne par ligne (comme la série "écarts par fournisseur" du tableau de bord)
+    ecart = df['QteRecue'].fillna(0) - df['QteFacturée'].fillna(0)
+    lines = pd.DataFrame({
+        'DateBR': df['DateBR'],
+        'CodeFournisseur': df['CodeFournisseur'],
+        'DesignationArticle': df['DesignationArticle'],
+        'MontantAchat': df['MontantAchat'],
+        'QteRecue': df['QteRecue'],
+        'QteFacturée': df['QteFacturée'],
+        'Ecart': ecart,
+        'EcartAbs': ecart.abs(),
+        'Lignes': 1,
+    })
+    return lines.groupby(ROLLUP_KEYS, as_index=False, sort=True, observed=True)[ROLLUP_VALUES].sum()
+
+
+def buildAchatsBPJour(bp_df):
+    # Agrégats journaliers à partir du tableau AchatsBP (sortie de buildAchatsBP)
+    return (bp_df.assign(Bons=1)
+            .groupby(BP_ROLLUP_KEYS, as_index=False, sort=True, observed=True)[BP_ROLLUP_VALUES].sum())
+
+
+def mergeRollup(existing, new, keys, values):
+    # Additionner des agrégats journaliers (blocs d'un même fichier, ou nouvelles ventes d'un chargement
+    # incrémental) : les sommes et les nombres de lignes se combinent par addition
+    frames = [df for df in (existing, new) if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=keys + values)
+    return (pd.concat(frames, ignore_index=True)
+            .groupby(keys, as_index=False, sort=True, observed=True)[values].sum())
+
+
+def readRollup(path, keys, values):
+    # Lire un fichier d'agrégats journaliers (tableau vide si le fichier n'existe pas encore)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=keys + values)
+    return pd.read_csv(path, parse_dates=['DateBR'], dtype={key: str for key in keys if key != 'DateBR'})
+
+
+def replaceRollup(existing, old, new, keys, values, count):
+    # Remplacer dans des agrégats journaliers la contribution de lignes déjà comptées (agrégats `old`) par
+    # celle de leur nouvelle version (agrégats `new`), par soustraction puis addition. Les clés dont le nombre
+    # de lignes (colonne `count`) tombe à zéro sont retirées.
+    # Retourne (agrégats mis à jour, lignes modifiées, clés retirées)
+    negated = old.assign(**{col: -old[col] for col in values})
+    rollup_df = mergeRollup(mergeRollup(existing, new, keys, values), negated, keys, values)
+    touched = pd.concat([df[keys] for df in (new, old) if not df.empty], ignore_index=True).drop_duplicates()
+    changed = rollup_df.merge(touched, on=keys)
+    empty = rollup_df[count] == 0
+    return rollup_df[~empty], changed[changed[count] != 0], changed[changed[count] == 0][keys]
@@ -0,0 +1,79 @@
+import math
+import os
+import pandas as pd
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# Charger les variables d'environnement depuis le fichier .env
+load_dotenv()
+
+# Récupération des clés Supabase depuis les variables d'environnement
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+
+# Nombre de lignes envoyées par requête
+BATCH_SIZE = 1000
+
+# Nombre de clés par requête de suppression (les clés sont passées dans l'URL)
+DELETE_BATCH_SIZE = 200
+
+# Noms des colonnes dans Supabase lorsqu'ils diffèrent de ceux des fichiers normalisés
+SUPABASE_COLUMNS = {'QteFacturée': 'QteFacturee'}
+
+
+# Conversion d'un DataFrame en lignes JSON pour Supabase (dates ISO, NaN -> null)
+def toRecords(df):
+    df = df.rename(columns=SUPABASE_COLUMNS)
+    records = df.to_dict('records')
+    for record in records:
+        for key, value in record.items():
+            if isinstance(value, pd.Timestamp):
+                record[key] = value.date().isoformat()
+            elif value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+                record[key] = None
+    return records
+
+
+# Envoi des lignes d'un DataFrame vers une table Supabase, par lots de `batchSize` lignes
+# Avec onConflict, les lignes existantes (même clé) sont mises à jour (upsert) ; sinon elles sont insérées.
+def uploadRows(table, df, onConflict=None, batchSize=BATCH_SIZE, supabase: Client = None):
+    if df.empty:
+        return 0
+    supabase = supabase or create_client(SUPABASE_URL, SUPABASE_KEY)
+    records = toRecords(df)
+    for start in range(0, len(records), batchSize):
+        batch = records[start:start + batchSize]
+        if onConflict:
+            supabase.table(table).upsert(batch, on_conflict=onConflict).execute()
+        else:
+            supabase.table(table).insert(batch).execute()
+    return len(records)
+
+
+# Remplacement des lignes d'une table dont la colonne `keyColumn` a une valeur présente dans df :
+# suppression des lignes existantes, puis insertion par lots. Pour une table sans clé unique (Achats : un bon
+# de pesée peut contenir plusieurs lignes du même article), l'envoi peut être relancé après un échec sans
+# créer de doublons.
+def replaceRows(table, df, keyColumn, batchSize=BATCH_SIZE, supabase: Client = None):
+    if df.empty:
+        return 0
+    supabase = supabase or create_client(SUPABASE_URL, SUPABASE_KEY)
+    keys = df[keyColumn].drop_duplicates().tolist()
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        supabase.table(table).delete().in_(keyColumn, keys[start:start + DELETE_BATCH_SIZE]).execute()
+    return uploadRows(table, df, batchSize=batchSize, supabase=supabase)
+
+
+# Suppression des lignes d'une table dont les colonnes `keys` ont les valeurs d'une ligne de df (une requête par
+# ligne : utilisée pour les quelques agrégats journaliers qui n'ont plus de ventes)
+def deleteRows(table, df, keys, supabase: Client = None):
+    if df.empty:
+        return 0
+    supabase = supabase or create_client(SUPABASE_URL, SUPABASE_KEY)
+    records = toRecords(df[keys])
+    for record in records:
+        query = supabase.table(table).delete()
+        for key in keys:
+            query = query.eq(SUPABASE_COLUMNS.get(key, key), record[SUPABASE_COLUMNS.get(key, key)])
+        query.execute()
+    return len(records)
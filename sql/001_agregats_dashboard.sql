@@ -0,0 +1,91 @@
+-- Fonctions d'agrégation du tableau de bord
+-- Le regroupement est fait par Postgres : le tableau de bord ne reçoit que les séries
+-- déjà regroupées et les totaux, au lieu de toutes les lignes de Achats et AchatsBP.
+-- Chaque fonction retourne des lignes (serie, cle, valeur) et s'appelle via supabase.rpc().
+
+
+-- Séries calculées sur la table Achats (mêmes filtres que le formulaire du tableau de bord)
+create or replace function public.agregats_achats(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with achats as (
+        select *
+        from public."Achats"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" ilike '%' || p_fournisseur || '%')
+          and (p_article is null or "DesignationArticle" ilike '%' || p_article || '%')
+          and (p_montant_min is null or "MontantAchat" >= p_montant_min)
+          and (p_montant_max is null or "MontantAchat" <= p_montant_max)
+    )
+    -- Chiffre d'affaires par produit
+    select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+    from achats
+    group by "DesignationArticle"
+    union all
+    -- Écarts (valeur absolue) par fournisseur
+    select 'ecarts_par_fournisseur', "CodeFournisseur",
+           sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)))
+    from achats
+    group by "CodeFournisseur"
+    union all
+    -- Quantité reçue par produit
+    select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+    from achats
+    group by "DesignationArticle"
+    order by 1, 2
+$$;
+
+
+-- Séries et totaux calculés sur la table AchatsBP (filtres date et fournisseur uniquement)
+create or replace function public.agregats_achats_bp(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with bp as (
+        select *
+        from public."AchatsBP"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" ilike '%' || p_fournisseur || '%')
+    ),
+    totaux as (
+        select coalesce(sum("TotPaye"), 0) as tot_paye,
+               coalesce(sum("TotRecu"), 0) as tot_recu,
+               coalesce(sum("TotFacture"), 0) as tot_facture,
+               coalesce(sum("EcartQt"), 0) as ecart_qt,
+               coalesce(sum("EcartMontant"), 0) as ecart_montant
+        from bp
+    )
+    -- Écart quantité par fournisseur
+    select 'ecartqt_par_fournisseur', coalesce("CodeFournisseur", 'NA'), sum(coalesce("EcartQt", 0))
+    from bp
+    group by coalesce("CodeFournisseur", 'NA')
+    union all
+    -- Totaux affichés dans les cartes du tableau de bord
+    select 'totaux', t.cle, t.valeur
+    from totaux,
+         lateral (values ('totalPaye', tot_paye),
+                         ('totalRecu', tot_recu),
+                         ('totalFacture', tot_facture),
+                         ('TotalEcartQ', ecart_qt),
+                         ('TotalEcartM', ecart_montant)) as t(cle, valeur)
+    order by 1, 2
+$$;
@@ -0,0 +1,10 @@
+-- Bornes de MontantAchat pour le curseur du formulaire de filtres
+-- Un seul agrégat calculé par Postgres, au lieu du téléchargement de toute la colonne.
+create or replace function public.bornes_montant_achat()
+returns table (min_montant double precision, max_montant double precision)
+language sql
+stable
+as $$
+    select coalesce(min("MontantAchat"), 0), coalesce(max("MontantAchat"), 0)
+    from public."Achats"
+$$;
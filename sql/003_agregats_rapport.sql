@@ -0,0 +1,35 @@
+-- Agrégats du rapport PDF hebdomadaire
+-- Nombre de lignes, montant total et produits les plus reçus sur une période (et éventuellement un fournisseur),
+-- calculés par Postgres au lieu d'être recalculés en Python sur toutes les lignes.
+create or replace function public.agregats_rapport(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_top integer default 3
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with achats as (
+        select *
+        from public."Achats"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" = p_fournisseur)
+    ),
+    top_produits as (
+        select "DesignationArticle" as cle, sum("QteRecue") as valeur
+        from achats
+        group by "DesignationArticle"
+        order by valeur desc
+        limit p_top
+    )
+    -- Nombre de lignes et montant total
+    select 'totaux', 'nombre', count(*)::double precision from achats
+    union all
+    select 'totaux', 'total', coalesce(sum("MontantAchat"), 0) from achats
+    union all
+    -- Produits les plus reçus (quantité reçue), du plus grand au plus petit
+    select 'top', cle, valeur from top_produits
+$$;
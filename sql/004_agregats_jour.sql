@@ -0,0 +1,180 @@
+-- Agrégats journaliers : tables tenues à jour par le pipeline de normalisation (scripts/rollupData.py)
+-- Les séries du tableau de bord filtrées par période sont lues dans ces tables : le coût d'une requête
+-- dépend du nombre de jours (x fournisseurs x articles) de la période, et non plus du nombre de lignes.
+-- Les lignes brutes ne sont lues que lorsqu'un filtre porte sur MontantAchat (propre à chaque ligne).
+
+
+-- Ventes par jour, fournisseur et article
+create table if not exists public."AchatsJour" (
+    "DateBR" date not null,
+    "CodeFournisseur" text not null,
+    "DesignationArticle" text not null,
+    "MontantAchat" double precision not null default 0,
+    "QteRecue" double precision not null default 0,
+    "QteFacturee" double precision not null default 0,
+    "Ecart" double precision not null default 0,
+    "EcartAbs" double precision not null default 0,
+    "Lignes" integer not null default 0,
+    primary key ("DateBR", "CodeFournisseur", "DesignationArticle")
+);
+
+-- Rapprochement par jour et fournisseur
+create table if not exists public."AchatsBPJour" (
+    "DateBR" date not null,
+    "CodeFournisseur" text not null,
+    "EcartQt" double precision not null default 0,
+    "EcartMontant" double precision not null default 0,
+    "TotRecu" double precision not null default 0,
+    "TotFacture" double precision not null default 0,
+    "TotPaye" double precision not null default 0,
+    "Bons" integer not null default 0,
+    primary key ("DateBR", "CodeFournisseur")
+);
+
+
+-- Remplissage initial à partir des tables existantes (les chargements suivants sont faits par le pipeline)
+insert into public."AchatsJour"
+select "DateBR", "CodeFournisseur", "DesignationArticle",
+       coalesce(sum("MontantAchat"), 0), coalesce(sum("QteRecue"), 0), coalesce(sum("QteFacturee"), 0),
+       sum(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)),
+       sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0))),
+       count(*)
+from public."Achats"
+group by "DateBR", "CodeFournisseur", "DesignationArticle"
+on conflict do nothing;
+
+insert into public."AchatsBPJour"
+select "DateBR", coalesce("CodeFournisseur", 'NA'),
+       coalesce(sum("EcartQt"), 0), coalesce(sum("EcartMontant"), 0), coalesce(sum("TotRecu"), 0),
+       coalesce(sum("TotFacture"), 0), coalesce(sum("TotPaye"), 0), count(*)
+from public."AchatsBP"
+group by "DateBR", coalesce("CodeFournisseur", 'NA')
+on conflict do nothing;
+
+
+-- Séries du tableau de bord calculées sur les agrégats journaliers (filtres période, fournisseur, article)
+create or replace function public.agregats_achats_jour(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with jours as (
+        select *
+        from public."AchatsJour"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" ilike '%' || p_fournisseur || '%')
+          and (p_article is null or "DesignationArticle" ilike '%' || p_article || '%')
+    )
+    -- Chiffre d'affaires par produit
+    select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+    from jours
+    group by "DesignationArticle"
+    union all
+    -- Écarts (valeur absolue, ligne par ligne) par fournisseur
+    select 'ecarts_par_fournisseur', "CodeFournisseur", sum("EcartAbs")
+    from jours
+    group by "CodeFournisseur"
+    union all
+    -- Quantité reçue par produit
+    select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+    from jours
+    group by "DesignationArticle"
+    union all
+    -- Chiffre d'affaires par jour
+    select 'ca_par_jour', "DateBR"::text, sum("MontantAchat")
+    from jours
+    group by "DateBR"
+    order by 1, 2
+$$;
+
+
+-- Séries calculées sur les lignes de Achats (utilisée avec un filtre sur MontantAchat) : ajout du CA par jour
+create or replace function public.agregats_achats(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with achats as (
+        select *
+        from public."Achats"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" ilike '%' || p_fournisseur || '%')
+          and (p_article is null or "DesignationArticle" ilike '%' || p_article || '%')
+          and (p_montant_min is null or "MontantAchat" >= p_montant_min)
+          and (p_montant_max is null or "MontantAchat" <= p_montant_max)
+    )
+    select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+    from achats
+    group by "DesignationArticle"
+    union all
+    select 'ecarts_par_fournisseur', "CodeFournisseur",
+           sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)))
+    from achats
+    group by "CodeFournisseur"
+    union all
+    select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+    from achats
+    group by "DesignationArticle"
+    union all
+    select 'ca_par_jour', "DateBR"::text, sum("MontantAchat")
+    from achats
+    group by "DateBR"
+    order by 1, 2
+$$;
+
+
+-- Séries et totaux AchatsBP calculés sur les agrégats journaliers (mêmes résultats que sur les bons de pesée)
+create or replace function public.agregats_achats_bp(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null
+)
+returns table (serie text, cle text, valeur double precision)
+language sql
+stable
+as $$
+    with bp as (
+        select *
+        from public."AchatsBPJour"
+        where (p_date_from is null or "DateBR" >= p_date_from)
+          and (p_date_to is null or "DateBR" <= p_date_to)
+          and (p_fournisseur is null or "CodeFournisseur" ilike '%' || p_fournisseur || '%')
+    ),
+    totaux as (
+        select coalesce(sum("TotPaye"), 0) as tot_paye,
+               coalesce(sum("TotRecu"), 0) as tot_recu,
+               coalesce(sum("TotFacture"), 0) as tot_facture,
+               coalesce(sum("EcartQt"), 0) as ecart_qt,
+               coalesce(sum("EcartMontant"), 0) as ecart_montant
+        from bp
+    )
+    select 'ecartqt_par_fournisseur', "CodeFournisseur", sum("EcartQt")
+    from bp
+    group by "CodeFournisseur"
+    union all
+    select 'totaux', t.cle, t.valeur
+    from totaux,
+         lateral (values ('totalPaye', tot_paye),
+                         ('totalRecu', tot_recu),
+                         ('totalFacture', tot_facture),
+                         ('TotalEcartQ', ecart_qt),
+                         ('TotalEcartM', ecart_montant)) as t(cle, valeur)
+    order by 1, 2
+$$;
@@ -0,0 +1,201 @@
+-- Index des filtres du tableau de bord et comparaison exacte des fournisseurs/articles
+-- Les listes déroulantes du formulaire envoient des codes exacts (paramètre exact=1) : les fonctions
+-- comparent alors par égalité, ce qui permet d'utiliser les index btree. La recherche partielle
+-- (ilike '%…%', valeur saisie librement) ne peut pas utiliser un index btree : elle s'appuie sur les
+-- index trigrammes (pg_trgm).
+-- Plans d'exécution avant et après cette migration : sql/plans/005_index_filtres.sql
+
+
+create extension if not exists pg_trgm;
+
+
+-- Période et fournisseur (période seule, ou période et fournisseur exact)
+create index if not exists achats_date_fournisseur on public."Achats" ("DateBR", "CodeFournisseur");
+create index if not exists achats_bp_date_fournisseur on public."AchatsBP" ("DateBR", "CodeFournisseur");
+
+-- Fournisseur exact sans période (le fournisseur en tête de l'index)
+create index if not exists achats_fournisseur_date on public."Achats" ("CodeFournisseur", "DateBR");
+
+-- Pagination par curseur de la liste détaillée (tri sur DateBR, NumBonPese)
+create index if not exists achats_date_bon on public."Achats" ("DateBR", "NumBonPese");
+
+-- Recherche partielle (ilike '%…%') sur le fournisseur et l'article
+create index if not exists achats_fournisseur_trgm on public."Achats" using gin ("CodeFournisseur" gin_trgm_ops);
+create index if not exists achats_article_trgm on public."Achats" using gin ("DesignationArticle" gin_trgm_ops);
+create index if not exists achats_bp_fournisseur_trgm on public."AchatsBP" using gin ("CodeFournisseur" gin_trgm_ops);
+
+
+-- Nouvelles signatures (paramètre p_exact) : les anciennes sont supprimées pour que PostgREST
+-- n'ait qu'une seule fonction de chaque nom à choisir
+drop function if exists public.agregats_achats(date, date, text, text, double precision, double precision);
+drop function if exists public.agregats_achats_bp(date, date, text, text, double precision, double precision);
+drop function if exists public.agregats_achats_jour(date, date, text, text);
+
+-- PostgREST passe les paramètres par json_to_record : pour le planificateur, ce ne sont pas des constantes,
+-- et une condition "(p_exact and col = p) or (not p_exact and col ilike ...)" n'est pas simplifiée
+-- (parcours séquentiel de toute la table, voir sql/plans/005_index_filtres.sql). Les fonctions construisent
+-- donc leur requête (execute) avec les seules conditions des paramètres renseignés : l'égalité ou le ilike.
+
+
+-- Conditions sur les colonnes de la table filtrée, pour les paramètres renseignés
+-- Les valeurs ne sont pas copiées dans le texte de la requête : elles sont passées à execute ... using, dans
+-- l'ordre $1 p_date_from, $2 p_date_to, $3 p_fournisseur, $4 p_article, $5 p_montant_min, $6 p_montant_max.
+create or replace function public.condition_filtres(
+    p_date_from date,
+    p_date_to date,
+    p_fournisseur text,
+    p_article text,
+    p_montant_min double precision,
+    p_montant_max double precision,
+    p_exact boolean
+)
+returns text
+language sql
+immutable
+as $$
+    select concat_ws(' and ', 'true',
+        case when p_date_from is not null then '"DateBR" >= $1' end,
+        case when p_date_to is not null then '"DateBR" <= $2' end,
+        case when p_fournisseur is null then null
+             when p_exact then '"CodeFournisseur" = $3'
+             else '"CodeFournisseur" ilike ''%'' || $3 || ''%''' end,
+        case when p_article is null then null
+             when p_exact then '"DesignationArticle" = $4'
+             else '"DesignationArticle" ilike ''%'' || $4 || ''%''' end,
+        case when p_montant_min is not null then '"MontantAchat" >= $5' end,
+        case when p_montant_max is not null then '"MontantAchat" <= $6' end)
+$$;
+
+
+-- Séries calculées sur les agrégats journaliers (voir sql/004_agregats_jour.sql)
+create or replace function public.agregats_achats_jour(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_exact boolean default false
+)
+returns table (serie text, cle text, valeur double precision)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format($q$
+        with jours as (
+            select *
+            from public."AchatsJour"
+            where %s
+        )
+        select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+        from jours
+        group by "DesignationArticle"
+        union all
+        select 'ecarts_par_fournisseur', "CodeFournisseur", sum("EcartAbs")
+        from jours
+        group by "CodeFournisseur"
+        union all
+        select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+        from jours
+        group by "DesignationArticle"
+        union all
+        select 'ca_par_jour', "DateBR"::text, sum("MontantAchat")
+        from jours
+        group by "DateBR"
+        order by 1, 2
+    $q$, public.condition_filtres(p_date_from, p_date_to, p_fournisseur, p_article, null, null, p_exact))
+    using p_date_from, p_date_to, p_fournisseur, p_article, null::double precision, null::double precision;
+end;
+$$;
+
+
+-- Séries calculées sur les lignes de Achats (utilisée avec un filtre sur MontantAchat)
+create or replace function public.agregats_achats(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null,
+    p_exact boolean default false
+)
+returns table (serie text, cle text, valeur double precision)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format($q$
+        with achats as (
+            select *
+            from public."Achats"
+            where %s
+        )
+        select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+        from achats
+        group by "DesignationArticle"
+        union all
+        select 'ecarts_par_fournisseur', "CodeFournisseur",
+               sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)))
+        from achats
+        group by "CodeFournisseur"
+        union all
+        select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+        from achats
+        group by "DesignationArticle"
+        union all
+        select 'ca_par_jour', "DateBR"::text, sum("MontantAchat")
+        from achats
+        group by "DateBR"
+        order by 1, 2
+    $q$, public.condition_filtres(p_date_from, p_date_to, p_fournisseur, p_article, p_montant_min, p_montant_max,
+                                  p_exact))
+    using p_date_from, p_date_to, p_fournisseur, p_article, p_montant_min, p_montant_max;
+end;
+$$;
+
+
+-- Séries et totaux AchatsBP calculés sur les agrégats journaliers
+-- (AchatsBPJour n'a ni article ni montant par ligne : seuls la période et le fournisseur sont filtrés)
+create or replace function public.agregats_achats_bp(
+    p_date_from date default null,
+    p_date_to date default null,
+    p_fournisseur text default null,
+    p_article text default null,
+    p_montant_min double precision default null,
+    p_montant_max double precision default null,
+    p_exact boolean default false
+)
+returns table (serie text, cle text, valeur double precision)
+language plpgsql
+stable
+as $$
+begin
+    return query execute format($q$
+        with bp as (
+            select *
+            from public."AchatsBPJour"
+            where %s
+        ),
+        totaux as (
+            select coalesce(sum("TotPaye"), 0) as tot_paye,
+                   coalesce(sum("TotRecu"), 0) as tot_recu,
+                   coalesce(sum("TotFacture"), 0) as tot_facture,
+                   coalesce(sum("EcartQt"), 0) as ecart_qt,
+                   coalesce(sum("EcartMontant"), 0) as ecart_montant
+            from bp
+        )
+        select 'ecartqt_par_fournisseur', "CodeFournisseur", sum("EcartQt")
+        from bp
+        group by "CodeFournisseur"
+        union all
+        select 'totaux', t.cle, t.valeur
+        from totaux,
+             lateral (values ('totalPaye', tot_paye),
+                             ('totalRecu', tot_recu),
+                             ('totalFacture', tot_facture),
+                             ('TotalEcartQ', ecart_qt),
+                             ('TotalEcartM', ecart_montant)) as t(cle, valeur)
+        order by 1, 2
+    $q$, public.condition_filtres(p_date_from, p_date_to, p_fournisseur, null, null, null, p_exact))
+    using p_date_from, p_date_to, p_fournisseur, p_article, p_montant_min, p_montant_max;
+end;
+$$;
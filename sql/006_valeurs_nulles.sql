@@ -0,0 +1,7 @@
+-- Valeurs manquantes de Qualite et Moule
+-- L'ancien nettoyage (scripts/cleaningData.py) convertissait les valeurs vides en chaîne 'nan' avant l'envoi
+-- à Supabase ; elles sont maintenant envoyées comme null. Cette migration corrige les lignes déjà chargées.
+
+
+update public."Achats" set "Qualite" = null where "Qualite" = 'nan';
+update public."Achats" set "Moule" = null where "Moule" = 'nan';
@@ -0,0 +1,388 @@
+-- Plans d'exécution des requêtes filtrées du tableau de bord, avant et après sql/005_index_filtres.sql
+-- Exécuter ce fichier (psql ou éditeur SQL de Supabase) une fois avant la migration et une fois après.
+--
+-- Plans relevés sur PostgreSQL 16.2 (configuration par défaut), table Achats de 1 000 000 lignes
+-- synthétiques (python -m benchmarks.syntheticData 1M, puis scripts/normalizeData.py) : AchatsBP 373 328 lignes,
+-- AchatsJour 310, AchatsBPJour 178, du 2019-01-03 au 2019-06-15 ; vacuum analyze après chargement et après la
+-- migration. Les valeurs des filtres sont choisies sélectives : le fournisseur FB032 a 11 931 lignes, dont
+-- 3 003 sur la semaine du 2019-03-01 au 2019-03-07.
+-- L'extension pg_trgm n'était pas disponible sur ce serveur : la migration a été appliquée sans elle ni les trois
+-- index trigrammes. Les plans "après" des recherches partielles (2 et 3) sont donc ceux sans index trigramme ;
+-- avec pg_trgm, un Bitmap Index Scan on achats_fournisseur_trgm / achats_article_trgm est attendu à la place
+-- du parcours séquentiel de la requête 3.
+-- Sur une table de quelques milliers de lignes, Postgres préfère souvent le parcours séquentiel.
+
+
+-- 1. Liste détaillée, période et fournisseur choisi dans la liste déroulante (égalité), première page
+explain (analyze, buffers)
+select *
+from public."Achats"
+where "DateBR" >= '2019-03-01' and "DateBR" <= '2019-03-07'
+  and "CodeFournisseur" = 'FB032'
+order by "DateBR", "NumBonPese", "DesignationArticle"
+limit 500;
+
+-- Avant :
+--   Limit  (cost=22359.88..22418.22 rows=500 width=72) (actual time=323.871..324.158 rows=500 loops=1)
+--     Buffers: shared hit=3057 read=11104
+--     ->  Gather Merge  (cost=22359.88..22540.73 rows=1550 width=72) (actual time=323.869..324.096 rows=500 loops=1)
+--           Workers Planned: 2
+--           Workers Launched: 2
+--           Buffers: shared hit=3057 read=11104
+--           ->  Sort  (cost=21359.86..21361.80 rows=775 width=72) (actual time=313.433..313.465 rows=409 loops=3)
+--                 Sort Key: "DateBR", "NumBonPese", "DesignationArticle"
+--                 Sort Method: quicksort  Memory: 155kB
+--                 Buffers: shared hit=3057 read=11104
+--                 Worker 0:  Sort Method: top-N heapsort  Memory: 91kB
+--                 Worker 1:  Sort Method: top-N heapsort  Memory: 91kB
+--                 ->  Parallel Seq Scan on "Achats"  (cost=0.00..21322.67 rows=775 width=72) (actual time=0.260..300.807 rows=1001 loops=3)
+--                       Filter: (("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date) AND ("CodeFournisseur" = 'FB032'::text))
+--                       Rows Removed by Filter: 332332
+--                       Buffers: shared hit=2927 read=11104
+--   Planning:
+--     Buffers: shared hit=75
+--   Planning Time: 0.358 ms
+--   Execution Time: 324.264 ms
+--
+-- Après :
+--   Limit  (cost=70.32..1896.17 rows=500 width=72) (actual time=10.565..10.667 rows=500 loops=1)
+--     Buffers: shared hit=268 read=735
+--     ->  Incremental Sort  (cost=70.32..6665.27 rows=1806 width=72) (actual time=10.563..10.602 rows=500 loops=1)
+--           Sort Key: "DateBR", "NumBonPese", "DesignationArticle"
+--           Presorted Key: "DateBR"
+--           Full-sort Groups: 1  Sort Method: quicksort  Average Memory: 33kB  Peak Memory: 33kB
+--           Pre-sorted Groups: 1  Sort Method: top-N heapsort  Average Memory: 91kB  Peak Memory: 91kB
+--           Buffers: shared hit=268 read=735
+--           ->  Index Scan using achats_fournisseur_date on "Achats"  (cost=0.42..6602.43 rows=1806 width=72) (actual time=0.047..9.046 rows=3003 loops=1)
+--                 Index Cond: (("CodeFournisseur" = 'FB032'::text) AND ("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date))
+--                 Buffers: shared hit=259 read=735
+--   Planning:
+--     Buffers: shared hit=143 read=3
+--   Planning Time: 0.679 ms
+--   Execution Time: 10.772 ms
+
+
+-- 2. Même filtre en recherche partielle (valeur saisie librement)
+explain (analyze, buffers)
+select *
+from public."Achats"
+where "DateBR" >= '2019-03-01' and "DateBR" <= '2019-03-07'
+  and "CodeFournisseur" ilike '%b03%'
+order by "DateBR", "NumBonPese", "DesignationArticle"
+limit 500;
+
+-- Avant :
+--   Limit  (cost=22359.88..22418.22 rows=500 width=72) (actual time=338.499..338.778 rows=500 loops=1)
+--     Buffers: shared hit=3153 read=11008
+--     ->  Gather Merge  (cost=22359.88..22540.73 rows=1550 width=72) (actual time=338.498..338.716 rows=500 loops=1)
+--           Workers Planned: 2
+--           Workers Launched: 2
+--           Buffers: shared hit=3153 read=11008
+--           ->  Sort  (cost=21359.86..21361.80 rows=775 width=72) (actual time=328.152..328.181 rows=389 loops=3)
+--                 Sort Key: "DateBR", "NumBonPese", "DesignationArticle"
+--                 Sort Method: top-N heapsort  Memory: 91kB
+--                 Buffers: shared hit=3153 read=11008
+--                 Worker 0:  Sort Method: quicksort  Memory: 149kB
+--                 Worker 1:  Sort Method: top-N heapsort  Memory: 91kB
+--                 ->  Parallel Seq Scan on "Achats"  (cost=0.00..21322.67 rows=775 width=72) (actual time=0.260..327.023 rows=1001 loops=3)
+--                       Filter: (("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date) AND ("CodeFournisseur" ~~* '%b03%'::text))
+--                       Rows Removed by Filter: 332332
+--                       Buffers: shared hit=3023 read=11008
+--   Planning Time: 0.123 ms
+--   Execution Time: 338.846 ms
+--
+-- Après (sans index trigramme : la période est parcourue dans l'ordre de pagination) :
+--   Limit  (cost=34.36..16955.20 rows=500 width=72) (actual time=93.165..97.302 rows=500 loops=1)
+--     Buffers: shared hit=6742 read=7125
+--     ->  Incremental Sort  (cost=34.36..61152.42 rows=1806 width=72) (actual time=93.163..97.234 rows=500 loops=1)
+--           Sort Key: "DateBR", "NumBonPese", "DesignationArticle"
+--           Presorted Key: "DateBR", "NumBonPese"
+--           Full-sort Groups: 16  Sort Method: quicksort  Average Memory: 29kB  Peak Memory: 29kB
+--           Buffers: shared hit=6742 read=7125
+--           ->  Index Scan using achats_date_bon on "Achats"  (cost=0.42..61071.36 rows=1806 width=72) (actual time=92.616..96.887 rows=502 loops=1)
+--                 Index Cond: (("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date))
+--                 Filter: ("CodeFournisseur" ~~* '%b03%'::text)
+--                 Rows Removed by Filter: 54857
+--                 Buffers: shared hit=6742 read=7125
+--   Planning:
+--     Buffers: shared hit=5
+--   Planning Time: 0.204 ms
+--   Execution Time: 97.365 ms
+
+
+-- 3. Article en recherche partielle, sans période
+explain (analyze, buffers)
+select count(*)
+from public."Achats"
+where "DesignationArticle" ilike '%sard%';
+
+-- Avant :
+--   Finalize Aggregate  (cost=20854.44..20854.45 rows=1 width=8) (actual time=352.140..352.731 rows=1 loops=1)
+--     Buffers: shared hit=3119 read=10912
+--     ->  Gather  (cost=20854.23..20854.44 rows=2 width=8) (actual time=351.974..352.723 rows=3 loops=1)
+--           Workers Planned: 2
+--           Workers Launched: 2
+--           Buffers: shared hit=3119 read=10912
+--           ->  Partial Aggregate  (cost=19854.23..19854.24 rows=1 width=8) (actual time=338.694..338.696 rows=1 loops=3)
+--                 Buffers: shared hit=3119 read=10912
+--                 ->  Parallel Seq Scan on "Achats"  (cost=0.00..19239.33 rows=245958 width=0) (actual time=0.031..253.365 rows=196421 loops=3)
+--                       Filter: ("DesignationArticle" ~~* '%sard%'::text)
+--                       Rows Removed by Filter: 136912
+--                       Buffers: shared hit=3119 read=10912
+--   Planning:
+--     Buffers: shared hit=6
+--   Planning Time: 0.109 ms
+--   Execution Time: 352.763 ms
+--
+-- Après (sans index trigramme : parcours séquentiel, comme avant) :
+--   Finalize Aggregate  (cost=20856.67..20856.68 rows=1 width=8) (actual time=278.446..280.187 rows=1 loops=1)
+--     Buffers: shared hit=11298 read=2733
+--     ->  Gather  (cost=20856.45..20856.66 rows=2 width=8) (actual time=278.255..280.177 rows=3 loops=1)
+--           Workers Planned: 2
+--           Workers Launched: 2
+--           Buffers: shared hit=11298 read=2733
+--           ->  Partial Aggregate  (cost=19856.45..19856.46 rows=1 width=8) (actual time=271.741..271.743 rows=1 loops=3)
+--                 Buffers: shared hit=11298 read=2733
+--                 ->  Parallel Seq Scan on "Achats"  (cost=0.00..19239.33 rows=246847 width=0) (actual time=0.015..228.196 rows=196421 loops=3)
+--                       Filter: ("DesignationArticle" ~~* '%sard%'::text)
+--                       Rows Removed by Filter: 136912
+--                       Buffers: shared hit=11298 read=2733
+--   Planning:
+--     Buffers: shared hit=6
+--   Planning Time: 0.134 ms
+--   Execution Time: 280.225 ms
+
+
+-- 4. Fournisseur exact sans période
+explain (analyze, buffers)
+select count(*)
+from public."Achats"
+where "CodeFournisseur" = 'FB032';
+
+-- Avant :
+--   Finalize Aggregate  (cost=20251.91..20251.92 rows=1 width=8) (actual time=155.336..156.305 rows=1 loops=1)
+--     Buffers: shared hit=3215 read=10816
+--     ->  Gather  (cost=20251.70..20251.91 rows=2 width=8) (actual time=154.053..156.291 rows=3 loops=1)
+--           Workers Planned: 2
+--           Workers Launched: 2
+--           Buffers: shared hit=3215 read=10816
+--           ->  Partial Aggregate  (cost=19251.70..19251.71 rows=1 width=8) (actual time=148.397..148.398 rows=1 loops=3)
+--                 Buffers: shared hit=3215 read=10816
+--                 ->  Parallel Seq Scan on "Achats"  (cost=0.00..19239.33 rows=4945 width=0) (actual time=0.088..147.930 rows=3977 loops=3)
+--                       Filter: ("CodeFournisseur" = 'FB032'::text)
+--                       Rows Removed by Filter: 329356
+--                       Buffers: shared hit=3215 read=10816
+--   Planning Time: 0.095 ms
+--   Execution Time: 156.341 ms
+--
+-- Après :
+--   Aggregate  (cost=278.43..278.44 rows=1 width=8) (actual time=2.462..2.463 rows=1 loops=1)
+--     Buffers: shared hit=7 read=7
+--     ->  Index Only Scan using achats_fournisseur_date on "Achats"  (cost=0.42..249.18 rows=11700 width=0) (actual time=0.117..1.487 rows=11931 loops=1)
+--           Index Cond: ("CodeFournisseur" = 'FB032'::text)
+--           Heap Fetches: 0
+--           Buffers: shared hit=7 read=7
+--   Planning Time: 0.206 ms
+--   Execution Time: 2.506 ms
+
+
+-- 5. Lignes AchatsBP filtrées (onglet "Données Regroupées")
+explain (analyze, buffers)
+select *
+from public."AchatsBP"
+where "DateBR" >= '2019-03-01' and "DateBR" <= '2019-03-07'
+  and "CodeFournisseur" = 'FB032';
+
+-- Avant :
+--   Gather  (cost=1000.00..8398.38 rows=672 width=67) (actual time=47.127..49.064 rows=1001 loops=1)
+--     Workers Planned: 2
+--     Workers Launched: 2
+--     Buffers: shared hit=2241 read=2368
+--     ->  Parallel Seq Scan on "AchatsBP"  (cost=0.00..7331.18 rows=280 width=67) (actual time=29.201..36.041 rows=334 loops=3)
+--           Filter: (("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date) AND ("CodeFournisseur" = 'FB032'::text))
+--           Rows Removed by Filter: 124109
+--           Buffers: shared hit=2241 read=2368
+--   Planning:
+--     Buffers: shared hit=60
+--   Planning Time: 0.316 ms
+--   Execution Time: 49.143 ms
+--
+-- Après :
+--   Index Scan using achats_bp_date_fournisseur on "AchatsBP"  (cost=0.42..1884.30 rows=663 width=67) (actual time=0.155..1.255 rows=1001 loops=1)
+--     Index Cond: (("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date) AND ("CodeFournisseur" = 'FB032'::text))
+--     Buffers: shared hit=75 read=45 written=26
+--   Planning:
+--     Buffers: shared hit=58 read=1
+--   Planning Time: 0.348 ms
+--   Execution Time: 1.337 ms
+
+
+-- 6. Séries du tableau de bord avec filtre sur le montant (lignes brutes), fournisseur exact, appelées comme le
+--    fait PostgREST (paramètres lus par json_to_record : ce ne sont pas des constantes pour le planificateur)
+--    Avant la migration, retirer p_exact (la fonction n'a pas ce paramètre et fait un ilike)
+explain (analyze, buffers)
+select pgrst_call.*
+from (select '{"p_date_from": "2019-03-01", "p_date_to": "2019-03-07", "p_fournisseur": "FB032", "p_montant_min": 1000, "p_exact": true}'::json as json_data) pgrst_payload,
+     lateral (select * from json_to_record(pgrst_payload.json_data)
+              as _("p_date_from" date, "p_date_to" date, "p_fournisseur" text, "p_montant_min" double precision, "p_exact" boolean)) pgrst_body,
+     lateral public.agregats_achats(p_date_from := pgrst_body.p_date_from, p_date_to := pgrst_body.p_date_to,
+                                    p_fournisseur := pgrst_body.p_fournisseur,
+                                    p_montant_min := pgrst_body.p_montant_min, p_exact := pgrst_body.p_exact) pgrst_call;
+
+-- Avant :
+--   Nested Loop  (cost=39124.58..39134.59 rows=800 width=72) (actual time=234.132..234.141 rows=6 loops=1)
+--     Buffers: shared hit=3343 read=10688
+--     ->  Function Scan on json_to_record _  (cost=0.00..0.01 rows=1 width=48) (actual time=0.025..0.027 rows=1 loops=1)
+--     ->  Sort  (cost=39124.58..39126.58 rows=800 width=72) (actual time=234.103..234.108 rows=6 loops=1)
+--           Sort Key: ('ca_par_produit'::text), achats."DesignationArticle"
+--           Sort Method: quicksort  Memory: 25kB
+--           Buffers: shared hit=3343 read=10688
+--           CTE achats
+--             ->  Seq Scan on "Achats"  (cost=0.00..39031.00 rows=381 width=72) (actual time=0.098..227.478 rows=2698 loops=1)
+--                   Filter: (((_.p_date_from IS NULL) OR ("DateBR" >= _.p_date_from)) AND ((_.p_date_to IS NULL) OR ("DateBR" <= _.p_date_to)) AND ((_.p_montant_min IS NULL) OR ("MontantAchat" >= _.p_montant_min)) AND ((_.p_fournisseur IS NULL) OR ("CodeFournisseur" ~~* (('%'::text || _.p_fournisseur) || '%'::text))))
+--                   Rows Removed by Filter: 997302
+--                   Buffers: shared hit=3343 read=10688
+--           ->  Append  (cost=9.53..55.00 rows=800 width=72) (actual time=230.176..234.082 rows=6 loops=1)
+--                 Buffers: shared hit=3343 read=10688
+--                 ->  HashAggregate  (cost=9.53..11.53 rows=200 width=72) (actual time=230.174..230.177 rows=2 loops=1)
+--                       Group Key: achats."DesignationArticle"
+--                       Batches: 1  Memory Usage: 40kB
+--                       Buffers: shared hit=3343 read=10688
+--                       ->  CTE Scan on achats  (cost=0.00..7.62 rows=381 width=40) (actual time=0.100..228.710 rows=2698 loops=1)
+--                             Buffers: shared hit=3343 read=10688
+--                 ->  HashAggregate  (cost=11.43..13.43 rows=200 width=72) (actual time=1.379..1.380 rows=1 loops=1)
+--                       Group Key: achats_1."CodeFournisseur"
+--                       Batches: 1  Memory Usage: 40kB
+--                       ->  CTE Scan on achats achats_1  (cost=0.00..7.62 rows=381 width=48) (actual time=0.001..0.353 rows=2698 loops=1)
+--                 ->  HashAggregate  (cost=9.53..11.53 rows=200 width=72) (actual time=1.307..1.309 rows=2 loops=1)
+--                       Group Key: achats_2."DesignationArticle"
+--                       Batches: 1  Memory Usage: 40kB
+--                       ->  CTE Scan on achats achats_2  (cost=0.00..7.62 rows=381 width=40) (actual time=0.000..0.334 rows=2698 loops=1)
+--                 ->  Subquery Scan on "*SELECT* 4"  (cost=9.53..14.53 rows=200 width=72) (actual time=1.203..1.204 rows=1 loops=1)
+--                       ->  HashAggregate  (cost=9.53..12.53 rows=200 width=76) (actual time=1.200..1.201 rows=1 loops=1)
+--                             Group Key: achats_3."DateBR"
+--                             Batches: 1  Memory Usage: 40kB
+--                             ->  CTE Scan on achats achats_3  (cost=0.00..7.62 rows=381 width=12) (actual time=0.000..0.309 rows=2698 loops=1)
+--   Planning Time: 0.567 ms
+--   Execution Time: 234.292 ms
+--
+-- Après, avec une première version de la migration (fonction SQL avec la condition
+-- "(p_exact and col = p) or (not p_exact and col ilike ...)") : la condition n'est pas simplifiée et la table
+-- est toujours parcourue en entier, malgré les index
+--   Nested Loop  (cost=41738.82..41748.83 rows=800 width=72) (actual time=226.467..226.476 rows=6 loops=1)
+--     Buffers: shared hit=11337 read=2694 written=32
+--     ->  Function Scan on json_to_record _  (cost=0.00..0.01 rows=1 width=49) (actual time=0.021..0.023 rows=1 loops=1)
+--     ->  Sort  (cost=41738.82..41740.82 rows=800 width=72) (actual time=226.442..226.446 rows=6 loops=1)
+--           Sort Key: ('ca_par_produit'::text), achats."DesignationArticle"
+--           Sort Method: quicksort  Memory: 25kB
+--           Buffers: shared hit=11337 read=2694 written=32
+--           CTE achats
+--             ->  Seq Scan on "Achats"  (cost=0.00..41531.00 rows=1469 width=72) (actual time=0.038..220.193 rows=2698 loops=1)
+--                   Filter: (((_.p_date_from IS NULL) OR ("DateBR" >= _.p_date_from)) AND ((_.p_date_to IS NULL) OR ("DateBR" <= _.p_date_to)) AND ((_.p_montant_min IS NULL) OR ("MontantAchat" >= _.p_montant_min)) AND ((_.p_fournisseur IS NULL) OR (_.p_exact AND ("CodeFournisseur" = _.p_fournisseur)) OR ((NOT _.p_exact) AND ("CodeFournisseur" ~~* (('%'::text || _.p_fournisseur) || '%'::text)))))
+--                   Rows Removed by Filter: 997302
+--                   Buffers: shared hit=11337 read=2694 written=32
+--           ->  Append  (cost=36.73..169.25 rows=800 width=72) (actual time=222.667..226.424 rows=6 loops=1)
+--                 Buffers: shared hit=11337 read=2694 written=32
+--                 ->  HashAggregate  (cost=36.73..38.73 rows=200 width=72) (actual time=222.665..222.668 rows=2 loops=1)
+--                       Group Key: achats."DesignationArticle"
+--                       Batches: 1  Memory Usage: 40kB
+--                       Buffers: shared hit=11337 read=2694 written=32
+--                       ->  CTE Scan on achats  (cost=0.00..29.38 rows=1469 width=40) (actual time=0.039..221.141 rows=2698 loops=1)
+--                             Buffers: shared hit=11337 read=2694 written=32
+--                 ->  HashAggregate  (cost=44.07..46.07 rows=200 width=72) (actual time=1.315..1.316 rows=1 loops=1)
+--                       Group Key: achats_1."CodeFournisseur"
+--                       Batches: 1  Memory Usage: 40kB
+--                       ->  CTE Scan on achats achats_1  (cost=0.00..29.38 rows=1469 width=48) (actual time=0.001..0.319 rows=2698 loops=1)
+--                 ->  HashAggregate  (cost=36.73..38.73 rows=200 width=72) (actual time=1.265..1.266 rows=2 loops=1)
+--                       Group Key: achats_2."DesignationArticle"
+--                       Batches: 1  Memory Usage: 40kB
+--                       ->  CTE Scan on achats achats_2  (cost=0.00..29.38 rows=1469 width=40) (actual time=0.001..0.318 rows=2698 loops=1)
+--                 ->  Subquery Scan on "*SELECT* 4"  (cost=36.73..41.73 rows=200 width=72) (actual time=1.161..1.162 rows=1 loops=1)
+--                       ->  HashAggregate  (cost=36.73..39.73 rows=200 width=76) (actual time=1.160..1.160 rows=1 loops=1)
+--                             Group Key: achats_3."DateBR"
+--                             Batches: 1  Memory Usage: 40kB
+--                             ->  CTE Scan on achats achats_3  (cost=0.00..29.38 rows=1469 width=12) (actual time=0.000..0.300 rows=2698 loops=1)
+--   Planning Time: 0.516 ms
+--   Execution Time: 226.593 ms
+--
+-- Après (fonction plpgsql, requête construite avec les seules conditions utiles, voir public.condition_filtres) :
+-- la requête exécutée par la fonction n'apparaît pas dans ce plan, voir la requête 7
+--   Nested Loop  (cost=0.25..20.26 rows=1000 width=72) (actual time=10.119..10.123 rows=6 loops=1)
+--     Buffers: shared hit=1429
+--     ->  Function Scan on json_to_record _  (cost=0.00..0.01 rows=1 width=49) (actual time=0.040..0.041 rows=1 loops=1)
+--     ->  Function Scan on agregats_achats pgrst_call  (cost=0.25..10.25 rows=1000 width=72) (actual time=10.074..10.075 rows=6 loops=1)
+--           Buffers: shared hit=1429
+--   Planning Time: 0.120 ms
+--   Execution Time: 10.511 ms
+
+
+-- 7. Requête exécutée par agregats_achats pour la requête 6 (après la migration)
+--    select public.condition_filtres('2019-03-01', '2019-03-07', 'FB032', null, 1000, null, true) donne la condition
+prepare agregats(date, date, text, text, double precision, double precision) as
+with achats as (
+    select *
+    from public."Achats"
+    where true and "DateBR" >= $1 and "DateBR" <= $2 and "CodeFournisseur" = $3 and "MontantAchat" >= $5
+)
+select 'ca_par_produit', "DesignationArticle", sum("MontantAchat")
+from achats
+group by "DesignationArticle"
+union all
+select 'ecarts_par_fournisseur', "CodeFournisseur",
+       sum(abs(coalesce("QteRecue", 0) - coalesce("QteFacturee", 0)))
+from achats
+group by "CodeFournisseur"
+union all
+select 'qte_par_produit', "DesignationArticle", sum("QteRecue")
+from achats
+group by "DesignationArticle"
+union all
+select 'ca_par_jour', "DateBR"::text, sum("MontantAchat")
+from achats
+group by "DateBR"
+order by 1, 2;
+
+explain (analyze, buffers) execute agregats('2019-03-01', '2019-03-07', 'FB032', null, 1000, null);
+
+deallocate agregats;
+
+-- Après :
+--   Sort  (cost=5283.85..5285.85 rows=800 width=72) (actual time=5.980..5.985 rows=6 loops=1)
+--     Sort Key: ('ca_par_produit'::text), achats."DesignationArticle"
+--     Sort Method: quicksort  Memory: 25kB
+--     Buffers: shared hit=997
+--     CTE achats
+--       ->  Bitmap Heap Scan on "Achats"  (cost=31.35..5084.95 rows=1384 width=72) (actual time=0.354..2.617 rows=2698 loops=1)
+--             Recheck Cond: (("CodeFournisseur" = 'FB032'::text) AND ("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date))
+--             Filter: ("MontantAchat" >= '1000'::double precision)
+--             Rows Removed by Filter: 305
+--             Heap Blocks: exact=988
+--             Buffers: shared hit=994
+--             ->  Bitmap Index Scan on achats_fournisseur_date  (cost=0.00..31.00 rows=1806 width=0) (actual time=0.227..0.228 rows=3003 loops=1)
+--                   Index Cond: (("CodeFournisseur" = 'FB032'::text) AND ("DateBR" >= '2019-03-01'::date) AND ("DateBR" <= '2019-03-07'::date))
+--                   Buffers: shared hit=6
+--     ->  Append  (cost=34.60..160.32 rows=800 width=72) (actual time=3.824..5.952 rows=6 loops=1)
+--           Buffers: shared hit=994
+--           ->  HashAggregate  (cost=34.60..36.60 rows=200 width=72) (actual time=3.823..3.825 rows=2 loops=1)
+--                 Group Key: achats."DesignationArticle"
+--                 Batches: 1  Memory Usage: 40kB
+--                 Buffers: shared hit=994
+--                 ->  CTE Scan on achats  (cost=0.00..27.68 rows=1384 width=40) (actual time=0.358..3.170 rows=2698 loops=1)
+--                       Buffers: shared hit=994
+--           ->  HashAggregate  (cost=41.52..43.52 rows=200 width=72) (actual time=0.775..0.776 rows=1 loops=1)
+--                 Group Key: achats_1."CodeFournisseur"
+--                 Batches: 1  Memory Usage: 40kB
+--                 ->  CTE Scan on achats achats_1  (cost=0.00..27.68 rows=1384 width=48) (actual time=0.000..0.188 rows=2698 loops=1)
+--           ->  HashAggregate  (cost=34.60..36.60 rows=200 width=72) (actual time=0.688..0.689 rows=2 loops=1)
+--                 Group Key: achats_2."DesignationArticle"
+--                 Batches: 1  Memory Usage: 40kB
+--                 ->  CTE Scan on achats achats_2  (cost=0.00..27.68 rows=1384 width=40) (actual time=0.000..0.184 rows=2698 loops=1)
+--           ->  Subquery Scan on "*SELECT* 4"  (cost=34.60..39.60 rows=200 width=72) (actual time=0.657..0.658 rows=1 loops=1)
+--                 ->  HashAggregate  (cost=34.60..37.60 rows=200 width=76) (actual time=0.656..0.656 rows=1 loops=1)
+--                       Group Key: achats_3."DateBR"
+--                       Batches: 1  Memory Usage: 40kB
+--                       ->  CTE Scan on achats achats_3  (cost=0.00..27.68 rows=1384 width=12) (actual time=0.000..0.183 rows=2698 loops=1)
+--   Planning:
+--     Buffers: shared hit=168
+--   Planning Time: 0.622 ms
+--   Execution Time: 6.248 ms
@@ -0,0 +1,45 @@
+import os
+
+# Tests exécutés sur la base locale (app/localdb.py), chargée depuis data/normalizedSchema : pas de réseau
+os.environ.setdefault("DATA_BACKEND", "local")
+os.environ.setdefault("LOCAL_EMAIL", "test@example.com")
+os.environ.setdefault("LOCAL_PASSWORD", "mot-de-passe-de-test")
+os.environ.setdefault("LOCAL_JWT_SECRET", "secret-des-tests")
+os.environ.setdefault("SECRET_KEY", "cle-des-tests")
+os.environ.pop("SUPABASE_JWT_SECRET", None)
+
+import pytest
+from app import app as flask_app
+from app.cache import invalidate_caches
+from app.client import get_client
+
+
+@pytest.fixture
+def supabase():
+    return get_client()
+
+
+# Client HTTP de test, connecté avec les identifiants locaux ; caches vidés avant chaque test
+@pytest.fixture
+def client():
+    invalidate_caches()
+    flask_app.config["TESTING"] = True
+    with flask_app.test_client() as test_client:
+        response = test_client.post("/login", data={"email": os.environ["LOCAL_EMAIL"],
+                                                    "password": os.environ["LOCAL_PASSWORD"]})
+        assert response.status_code == 302
+        yield test_client
+
+
+# Noms des fonctions RPC appelées pendant le test
+@pytest.fixture
+def rpc_calls(supabase, monkeypatch):
+    calls = []
+    rpc = supabase.rpc
+
+    def spy(name, params=None):
+        calls.append(name)
+        return rpc(name, params or {})
+
+    monkeypatch.setattr(supabase, "rpc", spy)
+    return calls
@@ -0,0 +1,14 @@
+import logging
+from scripts.appCache import invalidateAppCache
+
+
+def test_invalidation_without_app_is_not_fatal(monkeypatch, caplog):
+    monkeypatch.setenv("APP_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("CACHE_INVALIDATION_TOKEN", "jeton")
+    with caplog.at_level(logging.WARNING):
+        assert invalidateAppCache() is False
+    assert "Invalidation des caches" in caplog.text
+
+
+def test_invalidation_route_requires_token(client):
+    assert client.post("/cache/invalidate").status_code == 403
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import pytest
+from app import localdb
+
+
+def test_wrong_password_is_rejected(supabase):
+    with pytest.raises(ValueError):
+        supabase.auth.sign_in_with_password({"email": localdb.LOCAL_EMAIL, "password": "mauvais"})
+
+
+def test_login_page_rejects_unknown_user():
+    from app import app
+    with app.test_client() as client:
+        client.post("/login", data={"email": "inconnu@example.com", "password": "x"})
+        assert client.get("/dashboard").status_code == 302
+
+
+def test_local_auth_requires_secret(monkeypatch):
+    monkeypatch.setattr(localdb, "LOCAL_JWT_SECRET", None)
+    with pytest.raises(RuntimeError, match="LOCAL_JWT_SECRET"):
+        localdb.LocalAuth()
+
+
+# L'application ne démarre pas sur la base locale sans identifiants
+def test_app_refuses_to_start_without_local_credentials(monkeypatch):
+    monkeypatch.delenv("LOCAL_PASSWORD")
+    result = subprocess.run([sys.executable, "-c", "import app"], capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "LOCAL_PASSWORD" in result.stderr
+
+
+# L'import du module de rapport ne charge pas l'application Flask
+def test_report_import_has_no_app_side_effect():
+    code = "import sys, rapport.scheduleRapport; assert 'app' not in sys.modules"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,118 @@
+import io
+import os
+import time
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import load_workbook
+from app import exports
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def count_achats(supabase, fournisseur=None):
+    query = supabase.table('Achats').select('*')
+    if fournisseur:
+        query = query.eq('CodeFournisseur', fournisseur)
+    return len(query.execute().data)
+
+
+def test_stream_csv(client, supabase, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_CHUNK", 100)
+    response = client.get("/export/achats.csv", query_string={"fournisseur": "FO001", "exact": "1"})
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/csv; charset=utf-8"
+    assert response.is_streamed
+    lines = response.get_data().decode("utf-8-sig").splitlines()
+    assert lines[0].split(",") == exports.EXPORT_COLUMNS
+    assert len(lines) - 1 == count_achats(supabase, "FO001")
+
+
+def test_stream_parquet(client, supabase, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_CHUNK", 100)
+    response = client.get("/export/achats.parquet")
+    assert response.headers["Content-Type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.schema == exports.PARQUET_SCHEMA
+    assert table.num_rows == count_achats(supabase)
+    assert pq.ParquetFile(io.BytesIO(response.get_data())).num_row_groups > 1
+
+
+def wait_for(client, url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(url).get_json()
+        if job["status"] in ("termine", "erreur"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("export non terminé")
+
+
+def test_job_lifecycle(client, supabase, export_dir):
+    response = client.post("/export/achats/jobs", query_string={"format": "csv"})
+    assert response.status_code == 202
+    job = wait_for(client, response.headers["Location"])
+    assert job["status"] == "termine"
+    assert job["rows"] == count_achats(supabase)
+
+    # État lisible par un autre processus : seul le fichier JSON de la tâche est utilisé
+    assert (export_dir / f"{job['id']}.json").exists()
+    assert exports.get_job(job["id"], "autre-utilisateur") is None
+
+    download = client.get(job["download_url"])
+    assert download.headers["Content-Type"] == "text/csv; charset=utf-8"
+    assert len(download.get_data().decode("utf-8-sig").splitlines()) == job["rows"] + 1
+    download.close()
+
+
+def test_unknown_or_invalid_job_is_404(client, export_dir):
+    assert client.get("/export/jobs/inconnue-0123456789abcdef").status_code == 404
+    assert client.get("/export/jobs/..%2F..%2Fetc").status_code == 404
+
+
+def test_interrupted_job_is_reported(export_dir):
+    job = exports.ExportJob("csv", None, "utilisateur")
+    job.status = "en_cours"
+    job.save()
+    # Dernier avancement enregistré il y a plus de EXPORT_STALE secondes (processus arrêté)
+    state_path = export_dir / f"{job.id}.json"
+    stale = job.updated - 2 * exports.EXPORT_STALE
+    state_path.write_text(state_path.read_text().replace(str(job.updated), str(stale)))
+    loaded = exports.get_job(job.id, "utilisateur")
+    assert loaded.status == "erreur"
+    assert loaded.error
+
+
+def test_purge_removes_expired_and_orphaned_files(export_dir):
+    old = time.time() - 2 * exports.EXPORT_TTL
+    done = exports.ExportJob("csv", None, "utilisateur")
+    done.status, done.finished = "termine", old
+    done.save()
+    open(done.path, "w").close()
+    recent = exports.ExportJob("csv", None, "utilisateur")
+    recent.status, recent.finished = "termine", time.time()
+    recent.save()
+    open(recent.path, "w").close()
+    orphan = export_dir / "orpheline.parquet.part"
+    orphan.touch()
+    os.utime(orphan, (old, old))
+    fresh = export_dir / "en-cours.csv.part"
+    fresh.touch()
+
+    exports.purge_jobs()
+    assert sorted(os.listdir(export_dir)) == sorted([f"{recent.id}.json", f"{recent.id}.csv", "en-cours.csv.part"])
+
+
+def test_xlsx_job(client, supabase, export_dir):
+    response = client.post("/export/achats/jobs", query_string={"format": "xlsx"})
+    job = wait_for(client, response.headers["Location"])
+    assert job["status"] == "termine"
+    download = client.get(job["download_url"])
+    sheet = load_workbook(io.BytesIO(download.get_data()), read_only=True)["Achats"]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert list(rows[0]) == exports.EXPORT_COLUMNS
+    assert len(rows) == count_achats(supabase) + 1
+    download.close()
@@ -0,0 +1,33 @@
+import time
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+from app import routes
+from app.fanout import run_parallel, QueryTimeout, QUERY_WORKERS
+
+
+def read_timeout():
+    raise httpx.ReadTimeout("délai dépassé")
+
+
+def test_http_timeout_becomes_query_timeout():
+    with pytest.raises(QueryTimeout, match="lente"):
+        run_parallel({"rapide": lambda: 1, "lente": read_timeout})
+
+
+def test_statement_timeout_becomes_query_timeout():
+    def cancelled():
+        raise APIError({"code": "57014", "message": "canceling statement due to statement timeout"})
+    with pytest.raises(QueryTimeout):
+        run_parallel({"annulee": cancelled})
+
+
+# L'attente dans la file du pool n'est pas comptée comme un délai dépassé
+def test_queue_wait_is_not_a_timeout():
+    queries = {f"q{index}": lambda: time.sleep(0.05) or "ok" for index in range(QUERY_WORKERS * 3)}
+    assert set(run_parallel(queries).values()) == {"ok"}
+
+
+def test_dashboard_timeout_returns_504(client, monkeypatch):
+    monkeypatch.setattr(routes, "fetch_achats_aggregates", lambda supabase, filters: read_timeout())
+    assert client.get("/dashboard").status_code == 504
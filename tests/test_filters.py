@@ -0,0 +1,37 @@
+import pytest
+from app.aggregates import fetch_montant_bounds
+
+
+# Formulaire envoyé sans toucher aux curseurs : montant_min=0 et montant_max=maxRange (maximum + 100)
+def test_default_form_uses_daily_rollups(client, supabase, rpc_calls):
+    _, high = fetch_montant_bounds(supabase)
+    response = client.get("/dashboard", query_string={"date_from": "", "date_to": "", "fournisseur": "",
+                                                      "article": "", "montant_min": 0, "montant_max": high + 100,
+                                                      "exact": "1"})
+    assert response.status_code == 200
+    assert "agregats_achats_jour" in rpc_calls
+    assert "agregats_achats" not in rpc_calls
+
+
+def test_montant_inside_bounds_filters_rows(client, supabase, rpc_calls):
+    low, high = fetch_montant_bounds(supabase)
+    response = client.get("/dashboard", query_string={"montant_min": low + 1, "montant_max": high + 100})
+    assert response.status_code == 200
+    assert "agregats_achats" in rpc_calls
+    assert "agregats_achats_jour" not in rpc_calls
+
+
+# Un montant qui n’est pas un nombre est refusé sur toutes les routes qui lisent les filtres
+@pytest.mark.parametrize("path", ["/dashboard", "/dashboard/achats", "/api/achats", "/dashboard/achatsBP",
+                                  "/export/achats.csv"])
+@pytest.mark.parametrize("montant", ["abc", "nan", "inf"])
+def test_invalid_montant_is_rejected(client, path, montant):
+    assert client.get(path, query_string={"montant_min": montant}).status_code == 400
+    assert client.get(path, query_string={"montant_max": montant}).status_code == 400
+
+
+# La lecture des filtres ne consulte pas la base (bornes des montants lues seulement pour les agrégats)
+def test_listing_does_not_read_montant_bounds(client, rpc_calls):
+    response = client.get("/dashboard/achats", query_string={"montant_min": 0, "montant_max": 10 ** 9})
+    assert response.status_code == 200
+    assert "bornes_montant_achat" not in rpc_calls
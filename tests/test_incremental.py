@@ -0,0 +1,181 @@
+import os
+import pandas as pd
+import pytest
+from scripts.normalizeData import normalizeDF, normalizeDFIncremental
+
+RAW_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "BaseDeDonnees.csv")
+
+
+# Remplaçant du client Supabase : tables en mémoire, avec upsert sur la clé, insertion et suppression par clé
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = None
+        self.conditions = []
+
+    def insert(self, rows):
+        def run():
+            self.client.tables.setdefault(self.table, []).extend(rows)
+        self.action = run
+        return self
+
+    def upsert(self, rows, on_conflict):
+        keys = on_conflict.split(',')
+
+        def run():
+            existing = {tuple(row[key] for key in keys): row for row in self.client.tables.get(self.table, [])}
+            existing.update({tuple(row[key] for key in keys): row for row in rows})
+            self.client.tables[self.table] = list(existing.values())
+        self.action = run
+        return self
+
+    def delete(self):
+        def run():
+            self.client.tables[self.table] = [row for row in self.client.tables.get(self.table, [])
+                                              if not all(test(row) for test in self.conditions)]
+        self.action = run
+        return self
+
+    def in_(self, column, values):
+        self.conditions.append(lambda row: row[column] in values)
+        return self
+
+    def eq(self, column, value):
+        self.conditions.append(lambda row: row[column] == value)
+        return self
+
+    def execute(self):
+        if self.table == self.client.fail_table:
+            raise ConnectionError("envoi interrompu")
+        self.action()
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+        self.fail_table = None  # table dont les envois échouent
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+# Fichier brut réduit aux `rows` premières lignes
+@pytest.fixture
+def raw(tmp_path):
+    def write(rows):
+        path = tmp_path / "BaseDeDonnees.csv"
+        pd.read_csv(RAW_PATH, dtype=str, encoding="utf-8-sig").head(rows).to_csv(path, index=False)
+        return path
+    return write
+
+
+def achats(directory):
+    return pd.read_csv(directory / "Achats.csv", dtype={'NumBonPese': str})
+
+
+# Tableaux normalisés écrits dans `directory`, triés (l'ordre des lignes dépend de l'ordre de chargement)
+def tables(directory):
+    result = {}
+    for name in ["Achats", "AchatsBP", "AchatsJour", "AchatsBPJour", "Produits", "Fournisseurs"]:
+        df = pd.read_csv(directory / f"{name}.csv", dtype=str)
+        result[name] = df.sort_values(list(df.columns)).reset_index(drop=True)
+    return result
+
+
+# Colonnes numériques converties (les sommes mises à jour par différence peuvent différer à l'arrondi près)
+def numbers(df):
+    for col in df.columns:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except ValueError:
+            pass
+    return df
+
+
+# Les tableaux d'un chargement incrémental sont ceux d'un chargement complet du dernier fichier
+def assert_same_as_full(out, rawPath, tmp_path):
+    full = tmp_path / "complet"
+    full.mkdir(exist_ok=True)
+    normalizeDF(rawPath, full)
+    expected = tables(full)
+    for name, df in tables(out).items():
+        pd.testing.assert_frame_equal(numbers(df), numbers(expected[name]), obj=name)
+    return expected
+
+
+def test_incremental_load_twice(raw, tmp_path):
+    out = tmp_path / "normalized"
+    out.mkdir()
+    supabase = FakeSupabase()
+    first = normalizeDFIncremental(raw(400), out, upload=True, supabase=supabase)
+    rawPath = raw(1000)
+    second = normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+    again = normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+
+    # Des bons de pesée sont répartis entre les deux fichiers : ils sont repris en entier au second chargement
+    split = set(first['NumBonPese']) & set(second['NumBonPese'])
+    assert split
+    assert again.empty
+    expected = assert_same_as_full(out, rawPath, tmp_path)
+    assert achats(out)[achats(out)['NumBonPese'].isin(split)].shape[0] > first['NumBonPese'].isin(split).sum()
+    # Supabase contient les mêmes lignes que les fichiers
+    assert len(supabase.tables["Achats"]) == len(expected["Achats"])
+    assert len(supabase.tables["AchatsBP"]) == len(expected["AchatsBP"])
+    assert len(supabase.tables["AchatsJour"]) == len(expected["AchatsJour"])
+    ca = {row["DesignationArticle"]: row["CA"] for row in supabase.tables["Produits"]}
+    for article, value in expected["Produits"].set_index("DesignationArticle")["CA"].items():
+        assert ca[article] == pytest.approx(float(value))
+
+
+def test_incremental_replaces_changed_ticket(raw, tmp_path):
+    out = tmp_path / "normalized"
+    out.mkdir()
+    supabase = FakeSupabase()
+    rawPath = raw(1000)
+    normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+
+    # Un bon de pesée déjà chargé, seul de son fournisseur ce jour-là, change : montant d'une ligne, et bon
+    # déplacé à une autre date
+    df = pd.read_csv(rawPath, dtype=str)
+    bons = df.groupby(['DateBR', 'CodeFournisseur'])['NumBonPese'].transform('nunique')
+    bon = df.loc[bons.idxmin(), 'NumBonPese']
+    lines = df.index[df['NumBonPese'] == bon]
+    day, supplier = pd.to_datetime(df.loc[lines[0], 'DateBR']).date().isoformat(), df.loc[lines[0], 'CodeFournisseur']
+    df.loc[lines[0], 'MontantAchat'] = '123456.5'
+    df.loc[lines, 'DateBR'] = '12/31/2019'
+    df.to_csv(rawPath, index=False)
+    changed = normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+
+    assert set(changed['NumBonPese']) == {bon}
+    expected = assert_same_as_full(out, rawPath, tmp_path)
+    assert len(supabase.tables["Achats"]) == len(expected["Achats"])
+    # Les agrégats journaliers de l'ancienne date du bon, qui n'ont plus de ventes, sont supprimés
+    for table in ["AchatsJour", "AchatsBPJour"]:
+        assert len(supabase.tables[table]) == len(expected[table])
+        assert not [row for row in supabase.tables[table] if (row["DateBR"], row["CodeFournisseur"]) == (day, supplier)]
+
+
+def test_incremental_upload_failure_is_retried(raw, tmp_path):
+    out = tmp_path / "normalized"
+    out.mkdir()
+    supabase = FakeSupabase()
+    normalizeDFIncremental(raw(400), out, upload=True, supabase=supabase)
+    before = achats(out)
+    produits = pd.read_csv(out / "Produits.csv")
+
+    # L'envoi échoue après celui des lignes Achats : rien n'est marqué comme chargé
+    supabase.fail_table = "AchatsBP"
+    rawPath = raw(1000)
+    with pytest.raises(ConnectionError):
+        normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+    pd.testing.assert_frame_equal(achats(out), before)
+    pd.testing.assert_frame_equal(pd.read_csv(out / "Produits.csv"), produits)
+
+    # Nouvelle tentative : les bons sont repris et envoyés sans doublons
+    supabase.fail_table = None
+    normalizeDFIncremental(rawPath, out, upload=True, supabase=supabase)
+    expected = assert_same_as_full(out, rawPath, tmp_path)
+    assert len(supabase.tables["Achats"]) == len(expected["Achats"])
+    bons = [row["NumBonPese"] for row in supabase.tables["AchatsBP"]]
+    assert len(bons) == len(set(bons)) == len(expected["AchatsBP"])
@@ -0,0 +1,41 @@
+from collections import Counter
+import pytest
+from app.filters import FILTER_KEYS
+from app.listing import AchatsPage, parse_cursor
+
+NO_FILTERS = {key: None for key in FILTER_KEYS} | {"exact": False}
+
+
+def all_rows(supabase):
+    rows = supabase.table('Achats').select('*').order('DateBR').order('NumBonPese').order('DesignationArticle')
+    return rows.execute().data
+
+
+# Parcours complet page par page ; lots de 3 lignes : les bons de pesée (2 lignes ou plus) sont coupés entre lots
+def test_pages_do_not_split_tickets(supabase):
+    pages, after = [], None
+    while True:
+        page = AchatsPage(supabase, NO_FILTERS, after=after, size=7, chunk=3)
+        pages.append(list(page))
+        if page.next_cursor is None:
+            break
+        after = parse_cursor(page.next_cursor)
+
+    rows = [row for page in pages for row in page]
+    assert Counter(tuple(row.items()) for row in rows) == Counter(tuple(row.items()) for row in all_rows(supabase))
+    tickets = [{(row["DateBR"], row["NumBonPese"]) for row in page} for page in pages]
+    for previous, following in zip(tickets, tickets[1:]):
+        assert not previous & following
+
+
+@pytest.mark.parametrize("cursor", ["2019-01-03", "03/01/2019|BP052550", "2019-01-03|",
+                                    "2019-01-03|BP1,DateBR.gte.1900-01-01", "2019-01-03|BP1)"])
+def test_invalid_cursor_is_rejected(client, cursor):
+    assert client.get("/api/achats", query_string={"after": cursor}).status_code == 400
+
+
+def test_cursor_resumes_after_ticket(client):
+    first = client.get("/api/achats", query_string={"limit": 5}).get_json()
+    second = client.get("/api/achats", query_string={"limit": 5, "after": first["next"]}).get_json()
+    assert first["next"] is not None
+    assert (second["data"][0]["DateBR"], second["data"][0]["NumBonPese"]) > tuple(first["next"].split("|"))
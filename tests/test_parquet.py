@@ -0,0 +1,49 @@
+import os
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from scripts.parquetData import achatsFilters, achatsParquetPath, loadAchats, saveAchatsParquet
+
+
+def save_sample(directory):
+    dates = pd.date_range("2018-11-01", "2019-03-31", freq="D")
+    df = pd.DataFrame({
+        "NumBonPese": [f"B{i}" for i in range(len(dates))],
+        "DateBR": dates,
+        "CodeFournisseur": "F1",
+        "DesignationArticle": "SARDINE",
+        "NomBateau": "BATEAU",
+        "Qualite": "A",
+        "MontantAchat": 1.0,
+    })
+    saveAchatsParquet(df, str(directory))
+    return df
+
+
+# Partitions (année, mois) lues pour les filtres de la période
+def read_partitions(directory, dateFrom, dateTo):
+    dataset = ds.dataset(achatsParquetPath(str(directory)), partitioning="hive")
+    fragments = dataset.get_fragments(filter=pq.filters_to_expression(achatsFilters(dateFrom, dateTo)))
+    return sorted({os.path.basename(os.path.dirname(os.path.dirname(f.path))) + "/" +
+                   os.path.basename(os.path.dirname(f.path)) for f in fragments})
+
+
+def test_period_within_a_year_reads_only_its_months(tmp_path):
+    save_sample(tmp_path)
+    assert read_partitions(tmp_path, "2019-02-10", "2019-03-05") == ["Annee=2019/Mois=2", "Annee=2019/Mois=3"]
+
+
+def test_period_across_years_reads_only_its_months(tmp_path):
+    save_sample(tmp_path)
+    assert read_partitions(tmp_path, "2018-12-15", "2019-01-10") == ["Annee=2018/Mois=12", "Annee=2019/Mois=1"]
+    assert len(read_partitions(tmp_path, "2018-12-15", None)) == 4
+    assert read_partitions(tmp_path, None, "2018-12-01") == ["Annee=2018/Mois=11", "Annee=2018/Mois=12"]
+
+
+def test_load_keeps_only_period_rows(tmp_path):
+    df = save_sample(tmp_path)
+    loaded = loadAchats(str(tmp_path), columns=["NumBonPese", "DateBR"], dateFrom="2018-12-15", dateTo="2019-01-10")
+    expected = df[(df["DateBR"] >= "2018-12-15") & (df["DateBR"] <= "2019-01-10")]
+    assert sorted(loaded["NumBonPese"]) == sorted(expected["NumBonPese"])
+    assert list(loaded.columns) == ["NumBonPese", "DateBR"]
+    assert achatsFilters() is None
@@ -0,0 +1,15 @@
+from collections import Counter
+from datetime import date
+from rapport.scheduleRapport import iter_achats
+
+
+# Lignes du rapport lues par petits lots (bons de pesée coupés entre lots) : mêmes lignes qu'une seule requête
+def test_iter_achats_matches_single_query(supabase):
+    date_from, date_to = date(2019, 1, 1), date(2019, 3, 31)
+    expected = (supabase.table('Achats').select('*').gte('DateBR', date_from.isoformat())
+                .lte('DateBR', date_to.isoformat()).eq('CodeFournisseur', 'FO001').execute().data)
+    rows = list(iter_achats(date_from, date_to, 'FO001', chunk=3))
+    assert expected
+    assert Counter(tuple(row.items()) for row in rows) == Counter(tuple(row.items()) for row in expected)
+    keys = [(row["DateBR"], row["NumBonPese"]) for row in rows]
+    assert keys == sorted(keys)